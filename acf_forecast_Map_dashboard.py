@@ -2,8 +2,8 @@
 import streamlit as st
 import pandas as pd
 import geopandas as gpd
-import io
 import math
+import hashlib
 import altair as alt
 from streamlit_folium import st_folium
 import folium
@@ -11,6 +11,16 @@ from pathlib import Path
 from io import StringIO
 import numpy as np
 
+from chart_data import MAX_SERIES, band_chart, chart_data, downsample_series
+from geolocation import BOUNDARY_CACHE, available_levels, build_boundary_cache, level_for_zoom, load_boundary_level
+from map_layers import gdf_point_layer
+from name_resolver import MATCH_TABLE_PATH, WoredaResolver, load_match_table
+from panel_index import PanelIndex, end_ordinal, ordinal_to_timestamp, start_ordinal
+from prefix_cube import PrefixCube
+from range_max import RangeMax
+from rolling_stats import RollingPanel
+from upload_cache import read_upload_csv, read_upload_geojson, upload_digest
+
 # -----------------------------
 # Configuration and theme
 AAH_BLUE = "#0072CE"
@@ -32,6 +42,48 @@ def norm_name_series(s: pd.Series) -> pd.Series:
     )
 
 NAME_MAP = {"debark_town": "debark"}  # extend if you find more mismatches
+# Cleaned uploads are cached on disk under this version (with a hash of NAME_MAP);
+# bump it whenever clean_timeseries changes what it produces
+CLEAN_VERSION = 2
+
+def clean_timeseries(df: pd.DataFrame) -> pd.DataFrame:
+    """Typed, name-normalised timeseries (date, acute_cases, woreda, region).
+
+    Dates are normalised to month starts: the panel is monthly, and filters, totals and
+    peaks all work on whole months.
+    """
+    df = df.copy()
+    df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.to_period("M").dt.to_timestamp()
+    df["acute_cases"] = pd.to_numeric(df.get("acute_cases", 0), errors="coerce").fillna(0).astype(float)
+    df["woreda"] = norm_name_series(df.get("woreda", pd.Series(""))).replace(NAME_MAP)
+    df["region"] = norm_name_series(df.get("region", pd.Series("")))
+    return df
+
+def clean_names(df: pd.DataFrame) -> pd.DataFrame:
+    """Name-normalised woreda/region columns only (recent snapshot)."""
+    df = df.copy()
+    df["woreda"] = norm_name_series(df.get("woreda", pd.Series(""))).replace(NAME_MAP)
+    df["region"] = norm_name_series(df.get("region", pd.Series("")))
+    return df
+
+CLEANERS = {"timeseries": clean_timeseries, "names": clean_names}
+
+@st.cache_data
+def file_digest(path: str, mtime: float, size: int) -> str:
+    # Re-hashed only when mtime/size change, so reruns don't re-read the file
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def file_fingerprint(path: str):
+    """(content sha1, mtime) of a local file, or None if it does not exist."""
+    p = Path(path)
+    if not p.exists():
+        return None
+    stat = p.stat()
+    return file_digest(str(p), stat.st_mtime, stat.st_size), stat.st_mtime
 
 @st.cache_data
 def load_optional_csv(path: str):
@@ -43,6 +95,90 @@ def load_optional_csv(path: str):
             return None
     return None
 
+@st.cache_data
+def load_clean_csv(path: str, digest: str, mtime: float, kind: str = "timeseries"):
+    # Keyed by content hash + mtime: cleaned once per file version, not per rerun
+    try:
+        return CLEANERS[kind](pd.read_csv(path))
+    except Exception:
+        return None
+
+@st.cache_data(max_entries=8)
+def clean_uploaded_csv(digest: str, _raw: bytes):
+    # Keyed by the upload's content hash; parsed once per file across sessions (upload_cache/)
+    version = f"clean{CLEAN_VERSION}-{upload_digest(repr(sorted(NAME_MAP.items())).encode())[:8]}"
+    return read_upload_csv(_raw, clean_timeseries, digest, version=version)
+
+@st.cache_resource(max_entries=4)
+def load_uploaded_geojson(digest: str, _raw: bytes):
+    return read_upload_geojson(_raw, digest)
+
+def uploaded_digest(upload) -> str:
+    # One SHA-1 per uploaded file per session, not one per rerun
+    digests = st.session_state.setdefault("upload_digests", {})
+    if upload.file_id not in digests:
+        digests[upload.file_id] = upload_digest(upload.getvalue())
+    return digests[upload.file_id]
+
+@st.cache_data
+def embedded_sample():
+    return clean_timeseries(pd.read_csv(StringIO(SAMPLE_CSV)))
+
+def load_clean_optional(path: str, kind: str = "timeseries"):
+    """Cleaned frame for a local CSV plus its cache key, or (None, None) if missing."""
+    fp = file_fingerprint(path)
+    if fp is None:
+        return None, None
+    return load_clean_csv(path, fp[0], fp[1], kind), f"file:{fp[0]}"
+
+@st.cache_resource
+def build_panel_index(_df: pd.DataFrame, source: str):
+    # `source` identifies the timeseries (file / embedded / upload); the frame itself is not hashed
+    return PanelIndex(_df, woreda_col="woreda", date_col="date", region_col="region")
+
+@st.cache_resource
+def panel_roll3(_idx: PanelIndex, source: str) -> np.ndarray:
+    # 3-month calendar mean for every panel row, computed once per timeseries
+    if "acute_cases" not in _idx.frame.columns:
+        return np.full(len(_idx), np.nan)
+    return _idx.gather(RollingPanel.from_index(_idx, "acute_cases").mean(3, min_periods=1))
+
+@st.cache_resource
+def panel_peaks(_idx: PanelIndex, source: str) -> RangeMax:
+    # Range-max table of acute_cases: any date range's per-woreda peak in O(woredas)
+    if "acute_cases" not in _idx.frame.columns:
+        return RangeMax(np.full((_idx.n_woredas, _idx.n_months), np.nan), _idx.month_min)
+    return RangeMax.from_index(_idx, "acute_cases")
+
+@st.cache_resource
+def panel_cube(_idx: PanelIndex, source: str) -> PrefixCube:
+    # Month / woreda prefix sums of acute_cases: any date-range total is a pair of lookups
+    return PrefixCube.from_index(_idx, ("acute_cases",))
+
+@st.cache_resource
+def load_cached_boundaries(level: str, version: float):
+    return load_boundary_level(level, BOUNDARY_CACHE)
+
+def boundary_cache_version() -> float:
+    return max((p.stat().st_mtime for p in Path(BOUNDARY_CACHE).glob("*.parquet")), default=0.0)
+
+@st.cache_data
+def admin_geojson(source: str, key_col: str, _gdf: gpd.GeoDataFrame) -> str:
+    # Geometry + join key only, serialised once per boundary source/level instead of every rerun
+    out = _gdf[[key_col, "geometry"]].copy()
+    out[key_col] = norm_name_series(out[key_col])
+    return out.to_json()
+
+@st.cache_resource
+def get_resolver(gazetteer: tuple, table_mtime: float):
+    # Gazetteer + trigram index built once per boundary name set; rebuilt when the match
+    # table file changes (hand edits with method=manual)
+    return WoredaResolver(gazetteer, aliases=NAME_MAP, match_table=load_match_table(MATCH_TABLE_PATH))
+
+def match_table_mtime() -> float:
+    p = Path(MATCH_TABLE_PATH)
+    return p.stat().st_mtime if p.exists() else 0.0
+
 @st.cache_data
 def load_geojson(path: str):
     p = Path(path)
@@ -88,25 +224,14 @@ somali,west_imi,2024-07-01,0
 """
 
 # -----------------------------
-# Load data (CSV)
-df_ts = load_optional_csv(TS_PATH)
+# Load data (CSV) — cleaned and typed once per source version
+df_ts, ts_source = load_clean_optional(TS_PATH)
 df_var = load_optional_csv(VAR_PATH)
-df_recent = load_optional_csv(RECENT_PATH)
+df_recent, _ = load_clean_optional(RECENT_PATH, kind="names")
 gdf_admin_local = load_geojson(GEO_PATH_LOCAL)
 
 if df_ts is None:
-    df_ts = pd.read_csv(StringIO(SAMPLE_CSV))
-
-# Basic cleaning for timeseries
-df_ts["date"] = pd.to_datetime(df_ts["date"], errors="coerce")
-df_ts["acute_cases"] = pd.to_numeric(df_ts.get("acute_cases", 0), errors="coerce").fillna(0).astype(float)
-df_ts["woreda"] = norm_name_series(df_ts.get("woreda", pd.Series(""))).map(lambda x: NAME_MAP.get(x, x))
-df_ts["region"] = norm_name_series(df_ts.get("region", pd.Series("")))
-df_ts["date_only"] = df_ts["date"].dt.date
-
-if df_recent is not None:
-    df_recent["woreda"] = norm_name_series(df_recent.get("woreda", pd.Series(""))).map(lambda x: NAME_MAP.get(x, x))
-    df_recent["region"] = norm_name_series(df_recent.get("region", pd.Series("")))
+    df_ts, ts_source = embedded_sample(), "embedded"
 
 # -----------------------------
 # Sidebar & header
@@ -125,43 +250,53 @@ st.sidebar.markdown("Choose data and filters for the dashboard.")
 
 use_embedded = st.sidebar.checkbox("Use embedded sample (ignore CSV file)", value=False)
 if use_embedded:
-    df_ts = pd.read_csv(StringIO(SAMPLE_CSV))
-    df_ts["date"] = pd.to_datetime(df_ts["date"])
-    df_ts["acute_cases"] = pd.to_numeric(df_ts["acute_cases"], errors="coerce").fillna(0)
+    df_ts, ts_source = embedded_sample(), "embedded"
 
 uploaded_csv = st.sidebar.file_uploader("Upload timeseries CSV (optional)", type=["csv"])
 if uploaded_csv is not None:
     try:
-        df_ts = pd.read_csv(uploaded_csv)
-        df_ts["date"] = pd.to_datetime(df_ts["date"], errors="coerce")
-        df_ts["acute_cases"] = pd.to_numeric(df_ts.get("acute_cases", 0), errors="coerce").fillna(0)
-        df_ts["woreda"] = norm_name_series(df_ts.get("woreda", pd.Series(""))).map(lambda x: NAME_MAP.get(x, x))
-        df_ts["region"] = norm_name_series(df_ts.get("region", pd.Series("")))
-        df_ts["date_only"] = df_ts["date"].dt.date
+        csv_digest = uploaded_digest(uploaded_csv)
+        df_ts = clean_uploaded_csv(csv_digest, uploaded_csv.getvalue())
+        ts_source = f"upload:{csv_digest}"
         st.sidebar.success("Uploaded CSV loaded.")
     except Exception as e:
         st.sidebar.error("Failed to read uploaded CSV: " + str(e))
 
-# GeoJSON: try GitHub raw first, then local, then allow upload
+# GeoJSON: local boundary cache first (level chosen by map zoom), then local GeoJSON,
+# then upload. GitHub is only contacted on request, so startup never waits on the network.
 gdf_admin = None
 geo_msg = None
-try:
-    gdf_admin = load_geojson_from_url(GEOJSON_RAW_URL)
-    if gdf_admin is not None:
-        st.sidebar.success(f"Loaded admin GeoJSON from GitHub ({len(gdf_admin)} features)")
-    else:
-        if gdf_admin_local is not None:
-            gdf_admin = gdf_admin_local
-            st.sidebar.success(f"Loaded local GeoJSON ({len(gdf_admin)} features)")
-        else:
-            geo_msg = "No admin GeoJSON loaded from GitHub or local file."
-except Exception as e:
-    geo_msg = f"GeoJSON load failed: {e}"
+geo_source = None
+boundary_levels = available_levels(BOUNDARY_CACHE)
+map_zoom = st.session_state.get("map_zoom", 6)
+if boundary_levels:
+    boundary_level = level_for_zoom(map_zoom, boundary_levels)
+    gdf_admin = load_cached_boundaries(boundary_level, boundary_cache_version())
+    geo_source = f"cache:{boundary_level}:{boundary_cache_version()}"
+    st.sidebar.success(f"Loaded {boundary_level} admin boundaries from local cache ({len(gdf_admin)} features)")
+elif gdf_admin_local is not None:
+    gdf_admin = gdf_admin_local
+    geo_source = f"local:{Path(GEO_PATH_LOCAL).stat().st_mtime}"
+    st.sidebar.success(f"Loaded local GeoJSON ({len(gdf_admin)} features)")
+else:
+    geo_msg = "No local admin boundaries. Run `python geolocation.py <woredas.shp>` or fetch them below."
+    if st.sidebar.button("Fetch boundaries from GitHub and build local cache"):
+        try:
+            gdf_remote = load_geojson_from_url(GEOJSON_RAW_URL)
+            if gdf_remote is None:
+                geo_msg = "GeoJSON download from GitHub failed."
+            else:
+                build_boundary_cache(gdf_remote, BOUNDARY_CACHE)
+                st.rerun()
+        except Exception as e:
+            geo_msg = f"GeoJSON load failed: {e}"
 
 geo_upload = st.sidebar.file_uploader("Upload admin GeoJSON (optional)", type=["geojson", "json"])
 if geo_upload is not None:
     try:
-        gdf_admin = gpd.read_file(geo_upload)
+        geo_digest = uploaded_digest(geo_upload)
+        gdf_admin = load_uploaded_geojson(geo_digest, geo_upload.getvalue())
+        geo_source = f"upload:{geo_digest}"
         st.sidebar.success("Uploaded GeoJSON loaded")
     except Exception as e:
         st.sidebar.error("Failed to read uploaded GeoJSON: " + str(e))
@@ -171,39 +306,36 @@ if geo_msg:
 
 # -----------------------------
 # Filters
-regions = ["All"] + sorted(df_ts["region"].dropna().unique().tolist())
+panel_idx = build_panel_index(df_ts, ts_source)
+regions = ["All"] + panel_idx.region_names.tolist()
 region_sel = st.sidebar.selectbox("Region", regions, index=0)
 
-if region_sel == "All":
-    woptions = ["All"] + sorted(df_ts["woreda"].dropna().unique().tolist())
-else:
-    woptions = ["All"] + sorted(df_ts.loc[df_ts["region"] == region_sel, "woreda"].dropna().unique().tolist())
+woptions = ["All"] + sorted(set(panel_idx.woreda_names[panel_idx.woreda_ids(region_sel)].tolist()))
 woreda_sel = st.sidebar.selectbox("Woreda", woptions, index=0)
 
-date_min = df_ts["date"].min().date()
-date_max = df_ts["date"].max().date()
+date_min = ordinal_to_timestamp([panel_idx.month_min])[0].date()
+date_max = ordinal_to_timestamp([panel_idx.month_max])[0].date()
 st.sidebar.markdown("### Date range")
+st.sidebar.caption("Dates are month starts (mid-month dates in uploads count for their month); "
+                   "a range keeps the months whose 1st day falls inside it.")
 date_left = st.sidebar.date_input("Start date", value=date_min, min_value=date_min, max_value=date_max)
 date_right = st.sidebar.date_input("End date", value=date_max, min_value=date_min, max_value=date_max)
 if date_left > date_right:
     date_left, date_right = date_right, date_left
 
 # -----------------------------
-# Apply filters
-mask = (df_ts["date_only"] >= date_left) & (df_ts["date_only"] <= date_right)
-if region_sel != "All":
-    mask &= (df_ts["region"] == region_sel)
-if woreda_sel != "All":
-    mask &= (df_ts["woreda"] == woreda_sel)
-df_filt = df_ts.loc[mask].copy()
-
-# compute roll3 for plotting clarity
-if "acute_cases" in df_filt.columns:
-    df_filt["acute_cases"] = pd.to_numeric(df_filt["acute_cases"], errors="coerce").fillna(0)
-    df_filt = df_filt.sort_values(["woreda", "date"])
-    df_filt["roll3"] = df_filt.groupby("woreda")["acute_cases"].transform(lambda s: s.rolling(3, min_periods=1).mean())
-else:
-    df_filt["roll3"] = np.nan
+# Apply filters (binary-search slices on the sorted panel index)
+filt_pos = panel_idx.positions(region=region_sel, woreda=woreda_sel, start=date_left, end=date_right)
+
+# roll3 for plotting clarity: taken from the whole-panel rolling engine, so the first
+# months of the range still average over the months just before the start date
+df_filt = panel_idx.frame.iloc[filt_pos].assign(roll3=panel_roll3(panel_idx, ts_source)[filt_pos])
+
+# Per-woreda totals for the selection, read from the prefix-sum cube (KPIs, bubble and matrix heatmaps)
+view_ids = panel_idx.woreda_ids(region_sel, woreda_sel)
+view_m0, view_m1 = start_ordinal(date_left), end_ordinal(date_right)
+cube = panel_cube(panel_idx, ts_source)
+view_totals = cube.frame(view_m0, view_m1, view_ids)
 
 # prepare recent snapshot
 df_recent = None
@@ -221,37 +353,47 @@ with tab1:
     st.markdown("#### Overview")
     c1, c2, c3, c4 = st.columns(4)
     with c1:
-        st.metric("Records", str(len(df_filt)))
+        st.metric("Records", str(int(view_totals["rows"].sum())))
     with c2:
-        total_cases = int(df_filt["acute_cases"].sum()) if not df_filt.empty else 0
+        total_cases = int(cube.total("acute_cases", view_m0, view_m1, view_ids)) if cube.measures else 0
         st.metric("Total acute cases", f"{total_cases:,}")
     with c3:
-        st.metric("Regions", str(df_filt["region"].nunique()))
+        st.metric("Regions", str(view_totals["region"].nunique()))
     with c4:
-        st.metric("Woredas", str(df_filt["woreda"].nunique()))
+        st.metric("Woredas", str(view_totals["woreda"].nunique()))
 
     st.markdown("---")
 
     # Chart controls
     st.subheader("Acute cases over time")
     chart_view = st.radio("Chart view", ["Top N overlay (cleaned)", "Small multiples"], index=0)
-    top_n = st.slider("Top N woredas (by peak)", min_value=1, max_value=min(30, max(1, df_filt["woreda"].nunique() if "woreda" in df_filt.columns else 1)), value=min(6, max(1, df_filt["woreda"].nunique() if "woreda" in df_filt.columns else 1)))
+    # Peaks come from the range-max table for the selected months, not from a pass over df_filt
+    peak_table = panel_peaks(panel_idx, ts_source)
+    n_view = max(1, int(np.isfinite(peak_table.query(view_m0, view_m1, view_ids)).sum()))
+    top_n = st.slider("Top N woredas (by peak)", min_value=1, max_value=min(30, n_view), value=min(6, n_view))
 
     if df_filt.empty or not {"date", "woreda", "acute_cases"}.issubset(df_filt.columns):
         st.info("No data for the selected filters and date range.")
     else:
         # compute top woredas by raw peak
-        top_w = df_filt.groupby("woreda")["acute_cases"].max().nlargest(top_n).index.tolist()
-        df_top = df_filt[df_filt["woreda"].isin(top_w)].copy()
+        top_ids, top_peaks = peak_table.top_k(top_n, view_m0, view_m1, view_ids, panel_idx.woreda_names)
+        top_lo, top_hi = panel_idx.bounds(top_ids, view_m0, view_m1)
+        top_pos = np.concatenate([np.arange(a, b) for a, b in zip(top_lo, top_hi)] + [np.empty(0, dtype="int64")])
+        df_top = panel_idx.frame.iloc[top_pos].assign(roll3=panel_roll3(panel_idx, ts_source)[top_pos])
 
         # color palette (color-blind friendly)
         palette = ["#0072B2", "#D55E00", "#009E73", "#CC79A7", "#F0E442", "#56B4E9", "#E69F00", "#000000", "#999999"]
         unique_w = sorted(df_top["woreda"].unique())
         color_scale = alt.Scale(domain=unique_w, range=palette[: max(1, len(unique_w))])
 
-        if chart_view == "Top N overlay (cleaned)":
+        # Only reduced rows go into the chart spec: LTTB per woreda, or a median/IQR band for many woredas
+        plot_mode, df_plot = chart_data(df_top, "date", "roll3", "woreda", columns=["region", "acute_cases"])
+        if chart_view == "Top N overlay (cleaned)" and plot_mode == "band":
+            st.caption(f"More than {MAX_SERIES} woredas: median and interquartile range across them.")
+            st.altair_chart(band_chart(df_plot, "date", "Acute cases (3-mo mean)", AAH_BLUE, height=460), use_container_width=True)
+        elif chart_view == "Top N overlay (cleaned)":
             select = alt.selection_point(fields=["woreda"], empty=False)
-            base = alt.Chart(df_top).encode(
+            base = alt.Chart(df_plot).encode(
                 x=alt.X("date:T", title="Date"),
                 y=alt.Y("roll3:Q", title="Acute cases (3-mo mean)"),
                 color=alt.Color("woreda:N", scale=color_scale, legend=alt.Legend(title="Woreda")),
@@ -259,13 +401,14 @@ with tab1:
             )
             lines = base.mark_line(strokeWidth=2.6).encode(opacity=alt.condition(select, alt.value(1), alt.value(0.15)))
             points = base.mark_point(size=25, filled=True).encode(opacity=alt.condition(select, alt.value(0.9), alt.value(0.08)))
-            last_label = alt.Chart(df_top).transform_window(last_date="max(date)", groupby=["woreda"]).transform_filter("datum.date == datum.last_date").mark_text(align="left", dx=6, dy=-5, fontSize=11).encode(x="date:T", y=alt.Y("roll3:Q"), text=alt.Text("woreda:N"), color=alt.Color("woreda:N", scale=color_scale))
+            last_label = alt.Chart(df_plot).transform_window(last_date="max(date)", groupby=["woreda"]).transform_filter("datum.date == datum.last_date").mark_text(align="left", dx=6, dy=-5, fontSize=11).encode(x="date:T", y=alt.Y("roll3:Q"), text=alt.Text("woreda:N"), color=alt.Color("woreda:N", scale=color_scale))
             chart = (lines + points + last_label).add_params(select).properties(height=460, width="container")
             st.altair_chart(chart, use_container_width=True)
         else:
             # small multiples: one row per woreda (vertical) ensure consistent y scale
             y_max = df_top["roll3"].max()
-            facet = (alt.Chart(df_top).mark_line(point=False).encode(
+            df_plot = downsample_series(df_top, "date", "roll3", "woreda", columns=["region", "acute_cases"])
+            facet = (alt.Chart(df_plot).mark_line(point=False).encode(
                 x=alt.X("date:T", title="Date"),
                 y=alt.Y("roll3:Q", title="Acute cases (3-mo mean)", scale=alt.Scale(domain=[0, max(y_max, 1)])),
                 color=alt.Color("woreda:N", legend=None),
@@ -274,8 +417,7 @@ with tab1:
             st.altair_chart(facet, use_container_width=True)
 
         # Top peaks summary
-        peaks = df_top.groupby("woreda")["acute_cases"].max().sort_values(ascending=False)
-        peak_display = "; ".join([f"{w}: {int(v)}" for w, v in peaks.items()])
+        peak_display = "; ".join([f"{w}: {int(v)}" for w, v in zip(panel_idx.woreda_names[top_ids], top_peaks)])
         st.markdown("**Top peaks in view:** " + peak_display)
 
     st.markdown("---")
@@ -291,7 +433,7 @@ with tab1:
     }
 
     geo_df = (
-        df_filt.groupby(["region", "woreda"], as_index=False)["acute_cases"].sum()
+        view_totals[["region", "woreda", "acute_cases"]]
         .assign(
             lat=lambda d: d["woreda"].map(lambda w: woreda_coords.get(str(w).lower(), {}).get("lat", math.nan)),
             lon=lambda d: d["woreda"].map(lambda w: woreda_coords.get(str(w).lower(), {}).get("lon", math.nan))
@@ -318,7 +460,7 @@ with tab1:
         st.altair_chart(bubble, use_container_width=True)
 
     st.markdown("##### Matrix heatmap (region × woreda)")
-    mat_df = df_filt.groupby(["region", "woreda"], as_index=False)["acute_cases"].sum()
+    mat_df = view_totals[["region", "woreda", "acute_cases"]]
     if mat_df.empty:
         st.caption("No data to show.")
     else:
@@ -337,11 +479,11 @@ with tab1:
 
     st.markdown("---")
     st.subheader("Filtered data")
-    st.dataframe(df_filt.drop(columns=["date_only"], errors="ignore"), use_container_width=True)
+    st.dataframe(df_filt, use_container_width=True)
 
     st.download_button(
         "Download filtered CSV",
-        data=df_filt.drop(columns=["date_only"], errors="ignore").to_csv(index=False).encode("utf-8"),
+        data=df_filt.to_csv(index=False).encode("utf-8"),
         file_name="filtered_summary_forecast.csv",
         mime="text/csv"
     )
@@ -370,7 +512,7 @@ with tab2:
 
     if map_factor is None and "acute_cases" in df_filt.columns:
         # create a recent snapshot from df_filt aggregated by woreda
-        df_snapshot = df_filt.groupby("woreda", as_index=False)["acute_cases"].sum()
+        df_snapshot = view_totals.groupby("woreda", as_index=False)["acute_cases"].sum()
         df_snapshot = df_snapshot.rename(columns={"acute_cases": "acute_cases_snapshot"})
         map_factor = "acute_cases_snapshot"
     else:
@@ -378,6 +520,8 @@ with tab2:
 
     # Prepare GeoDataFrame to plot
     gdf_to_plot = None
+    name_report = None
+    right_key = None
     color_key = map_factor
 
     if df_snapshot is not None:
@@ -395,10 +539,12 @@ with tab2:
                     break
             if left_key and right_key:
                 gdf_admin_copy = gdf_admin.copy()
-                gdf_admin_copy[right_key] = norm_name_series(gdf_admin_copy[right_key].astype(str)).map(lambda x: NAME_MAP.get(x, x))
+                gdf_admin_copy[right_key] = norm_name_series(gdf_admin_copy[right_key])
+                resolver = get_resolver(tuple(gdf_admin_copy[right_key].unique().tolist()), match_table_mtime())
                 df_snapshot_copy = df_snapshot.copy()
-                if left_key in df_snapshot_copy.columns:
-                    df_snapshot_copy[left_key] = norm_name_series(df_snapshot_copy[left_key].astype(str)).map(lambda x: NAME_MAP.get(x, x))
+                df_snapshot_copy[left_key] = resolver.lookup(df_snapshot_copy[left_key])
+                resolver.save(MATCH_TABLE_PATH)
+                name_report = resolver.report(df_snapshot[left_key])
                 try:
                     gdf_to_plot = gdf_admin_copy.merge(df_snapshot_copy, left_on=right_key, right_on=left_key, how="left")
                 except Exception:
@@ -417,16 +563,22 @@ with tab2:
     if gdf_to_plot is None or color_key not in (gdf_to_plot.columns if gdf_to_plot is not None else []):
         st.warning("Map cannot be rendered because administrative boundaries or required factor column are missing. Add ethiopia_woreda.geojson or include lat/lon in the recent snapshot.")
     else:
-        m = folium.Map(location=[9.145, 40.489673], zoom_start=6, tiles="cartodbpositron")
+        m = folium.Map(location=st.session_state.get("map_center", [9.145, 40.489673]), zoom_start=map_zoom, tiles="cartodbpositron")
         first_geom = gdf_to_plot.geometry.iloc[0]
         if first_geom.geom_type in ["Polygon", "MultiPolygon"]:
             try:
-                gjson = gdf_to_plot.to_json()
+                if geo_source is not None and right_key is not None:
+                    # cached geometry GeoJSON; only the key/value table changes per rerun
+                    gjson = admin_geojson(geo_source, right_key, gdf_admin)
+                    join_col = right_key
+                else:
+                    gjson = gdf_to_plot.to_json()
+                    join_col = gdf_to_plot.columns[0]
                 folium.Choropleth(
                     geo_data=gjson,
-                    data=gdf_to_plot,
-                    columns=[gdf_to_plot.columns[0], color_key],
-                    key_on="feature.properties." + gdf_to_plot.columns[0],
+                    data=pd.DataFrame(gdf_to_plot[[join_col, color_key]]),
+                    columns=[join_col, color_key],
+                    key_on="feature.properties." + join_col,
                     fill_color="YlOrRd",
                     fill_opacity=0.7,
                     line_opacity=0.2,
@@ -434,39 +586,26 @@ with tab2:
                     legend_name=map_factor
                 ).add_to(m)
             except Exception:
-                # fallback: centroid markers
-                for _, r in gdf_to_plot.iterrows():
-                    try:
-                        val = r.get(color_key, None)
-                        pt = r.geometry.centroid
-                        folium.CircleMarker([pt.y, pt.x], radius=6, fill=True, fill_color="red", color="red", popup=str(val)).add_to(m)
-                    except Exception:
-                        pass
+                # fallback: one marker layer at polygon interior points
+                gdf_point_layer(gdf_to_plot, color_key, colors="red").add_to(m)
         else:
-            # points
-            vals = pd.to_numeric(gdf_to_plot[color_key], errors="coerce")
-            q = pd.Series(vals).quantile([0.1, 0.5, 0.9]).values if not vals.isna().all() else [0, 0, 0]
-            def color_for(v):
-                try:
-                    v = float(v)
-                except Exception:
-                    return "#bdbdbd"
-                if pd.isna(v):
-                    return "#bdbdbd"
-                if v <= q[0]:
-                    return "#ffffb2"
-                if v <= q[1]:
-                    return "#fecc5c"
-                if v <= q[2]:
-                    return "#fd8d3c"
-                return "#e31a1c"
-            for _, r in gdf_to_plot.iterrows():
-                lat = r.geometry.y
-                lon = r.geometry.x
-                val = r.get(color_key, None)
-                folium.CircleMarker([lat, lon], radius=6, fill=True, fill_color=color_for(val), color=color_for(val), popup=str(val)).add_to(m)
-
-        st_folium(m, height=600, width="stretch")
+            # points: colours computed for the whole column, emitted as one layer
+            gdf_point_layer(gdf_to_plot, color_key).add_to(m)
+
+        map_state = st_folium(m, height=600, width="stretch", returned_objects=["zoom", "center"])
+        if map_state and map_state.get("zoom"):
+            st.session_state["map_zoom"] = map_state["zoom"]
+            if map_state.get("center"):
+                st.session_state["map_center"] = [map_state["center"]["lat"], map_state["center"]["lng"]]
+            # switch boundary resolution as soon as the zoom crosses a level threshold
+            if boundary_levels and level_for_zoom(map_state["zoom"], boundary_levels) != boundary_level:
+                st.rerun()
+
+    if name_report is not None:
+        n_unmatched = int(name_report["target"].isna().sum())
+        with st.expander(f"Woreda name matching: {len(name_report) - n_unmatched} matched, {n_unmatched} unmatched"):
+            st.caption(f"Fix a wrong or missing match by editing {MATCH_TABLE_PATH} and setting method to 'manual'.")
+            st.dataframe(name_report, use_container_width=True)
 
 st.markdown("---")
 st.caption("Notes: keep zeros in your source timeseries; they represent real zero reports. Provide ethiopia_woreda.geojson (admin2) to enable choropleth plotting.")
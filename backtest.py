@@ -0,0 +1,222 @@
+# backtest.py
+# Rolling-origin backtests of the forecast models over every woreda.
+# Each origin uses only the months up to it. Origins are cut into segments of
+# `refit_every` months; parameters are fitted at the first origin of a segment and the
+# fitted state is carried forward to the next origins (ETS filters just the new months,
+# regression reuses its coefficients), so only one fit per segment is paid. Segments
+# run in parallel over a process pool on large panels.
+# Errors are kept per (model, woreda, origin, horizon) and summarised as MAE, MASE
+# (scaled by the in-sample seasonal-naive error up to the origin) and interval coverage.
+# Model sigmas come from in-sample errors and are optimistic, so each origin's interval
+# is sigma times the `level` quantile of |error| / sigma over earlier forecasts whose
+# target had been observed by that origin (out of sample).
+#
+#   python backtest.py [woreda_month_features_v2.parquet] [horizon]
+
+import hashlib
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from forecast import (CACHE_DIR, DRIVERS, ETS_ALPHAS, ETS_BETAS, ETS_GAMMAS, ETS_PHIS, FEATURES_PATH,
+                      HORIZON, LEVEL, MODELS, POOL_MIN_WORK, SEASON, TARGET, ForecastPanel,
+                      data_version, ets_filter, ets_forecast, fit_ets, fit_regression, load_regions,
+                      regions_key, regression_forecast, seasonal_naive)
+from features import read_features
+from panel_index import ordinal_to_timestamp
+
+MIN_TRAIN = 12                    # reported months of history before a woreda's first origin
+REFIT_EVERY = 6                   # origins sharing one set of fitted parameters
+MIN_CALIBRATION = 20              # earlier scored errors needed to size an interval (else the normal z)
+
+
+# -----------------------------
+# Engine
+def _backtest_segment(y: np.ndarray, X: np.ndarray, month_min: int, origins: np.ndarray,
+                      horizon: int, models) -> dict:
+    """{model: (point, sigma)} as origin x woreda x horizon arrays for one refit segment."""
+    O, W = len(origins), len(y)
+    out = {m: (np.full((O, W, horizon), np.nan), np.full((O, W, horizon), np.nan)) for m in models}
+    o0 = int(origins[0])
+    if "ets" in models:
+        params, state = fit_ets(y[:, :o0 + 1], month_min)
+        last = o0
+    if "regression" in models:
+        # Only data up to the origin: regression_design fills driver gaps with means over its input
+        coef = fit_regression(y[:, :o0 + 1], X[:, :, :o0 + 1], month_min, horizon)
+    for i, o in enumerate(origins):
+        o = int(o)
+        if "seasonal_naive" in models:
+            p, s = seasonal_naive(y[:, :o + 1], horizon)
+            out["seasonal_naive"][0][i], out["seasonal_naive"][1][i] = p, s
+        if "ets" in models:
+            if o > last:
+                state = ets_filter(y[:, last + 1:o + 1], params, state, month0=month_min + last + 1)
+                last = o
+            p, s = ets_forecast(state, params, month_min + o + 1, horizon)
+            out["ets"][0][i], out["ets"][1][i] = p, s
+        if "regression" in models:
+            p, s = regression_forecast(coef, y, X, month_min, o)
+            out["regression"][0][i], out["regression"][1][i] = p, s
+    return out
+
+
+def mase_scale(y: np.ndarray, season: int = SEASON) -> np.ndarray:
+    """W x T: mean |y_t - y_{t-season}| over months up to each t (the in-sample naive error)."""
+    W, T = y.shape
+    d = np.full((W, T), np.nan)
+    if T > season:
+        d[:, season:] = np.abs(y[:, season:] - y[:, :-season])
+    ok = np.isfinite(d)
+    with np.errstate(all="ignore"):
+        return np.cumsum(np.where(ok, d, 0.0), axis=1) / np.cumsum(ok, axis=1)
+
+
+class Backtest:
+    """Rolling-origin forecasts for every woreda, origin and horizon, with error tables."""
+
+    def __init__(self, panel: ForecastPanel, horizon: int = HORIZON, models=MODELS,
+                 min_train: int = MIN_TRAIN, refit_every: int = REFIT_EVERY,
+                 level: float = LEVEL, n_jobs: int | None = None):
+        self.panel, self.horizon = panel, horizon
+        self.models = [m for m in models if m in MODELS]
+        T = panel.n_months
+        # A woreda's origins start min_train months after its first report: the 0 / missing
+        # months before reporting began are not history, and scoring them inflates coverage
+        reported = np.isfinite(panel.y) & (panel.y != 0)
+        first = np.where(reported.any(axis=1), np.argmax(reported, axis=1), T)
+        self.first_origin = first + min_train - 1
+        # Origins with at least one target month inside the panel
+        self.origins = np.arange(int(self.first_origin.min(initial=T - 1)), T - 1)
+        segments = [self.origins[i:i + refit_every] for i in range(0, len(self.origins), refit_every)]
+        args = [(panel.y, panel.X, panel.month_min, seg, horizon, tuple(self.models)) for seg in segments]
+        n_jobs = n_jobs or os.cpu_count() or 1
+        work = panel.y.size * len(segments) * len(ETS_ALPHAS) * len(ETS_BETAS) * len(ETS_GAMMAS) * len(ETS_PHIS)
+        if n_jobs > 1 and len(segments) > 1 and work >= POOL_MIN_WORK:
+            try:
+                with ProcessPoolExecutor(max_workers=min(n_jobs, len(segments))) as pool:
+                    parts = list(pool.map(_backtest_segment, *zip(*args)))
+            except (OSError, RuntimeError):
+                parts = [_backtest_segment(*a) for a in args]
+        else:
+            parts = [_backtest_segment(*a) for a in args]
+        # model -> (point, sigma), origin x woreda x horizon
+        self.forecasts = {m: tuple(np.concatenate([p[m][k] for p in parts]) if parts
+                                   else np.empty((0, len(panel.y), horizon)) for k in (0, 1))
+                          for m in self.models}
+        self.level = level
+        self.z = NormalDist().inv_cdf(0.5 + level / 2)
+
+    def interval_scale(self, actual: np.ndarray, point: np.ndarray, sigma: np.ndarray,
+                       started: np.ndarray) -> np.ndarray:
+        """Origin x horizon multiplier of sigma from out-of-sample standardised errors.
+
+        For origin o and horizon h: the `level` quantile of |actual - point| / sigma over
+        earlier origins whose h-step target was observed by o; the normal z when fewer than
+        MIN_CALIBRATION such errors exist.
+        """
+        O, _, H = point.shape
+        with np.errstate(all="ignore"):
+            zabs = np.where(started, np.abs(actual - point) / sigma, np.nan)
+        out = np.full((O, H), self.z)
+        for h in range(H):
+            for i, o in enumerate(self.origins):
+                past = zabs[self.origins + h + 1 <= o, :, h]
+                past = past[np.isfinite(past)]
+                if len(past) >= MIN_CALIBRATION:
+                    out[i, h] = np.quantile(past, self.level)
+        return out
+
+    def errors(self) -> pd.DataFrame:
+        """One row per model, woreda, origin and horizon with an observed target (from the woreda's first origin)."""
+        p = self.panel
+        O, W, H = len(self.origins), len(p.woredas), self.horizon
+        steps = np.arange(1, H + 1)
+        tgt = self.origins[:, None] + steps[None, :]                               # O x H
+        inside = tgt < p.n_months
+        actual = np.where(inside[:, None, :], p.y[:, np.clip(tgt, None, p.n_months - 1)].transpose(1, 0, 2), np.nan)
+        scale = mase_scale(p.y)[:, self.origins].T[:, :, None]                      # O x W x 1
+        started = (self.origins[:, None] >= self.first_origin[None, :])[:, :, None]  # O x W x 1
+        base = {
+            "woreda": np.broadcast_to(p.woredas[None, :, None], (O, W, H)),
+            "region": np.broadcast_to(p.regions[None, :, None], (O, W, H)),
+            "origin": np.broadcast_to(ordinal_to_timestamp(p.month_min + self.origins).to_numpy()[:, None, None], (O, W, H)),
+            "horizon": np.broadcast_to(steps[None, None, :], (O, W, H)),
+        }
+        rows = []
+        for m, (point, sigma) in self.forecasts.items():
+            point = np.clip(point, 0, None)
+            half = self.interval_scale(actual, point, sigma, started)[:, None, :] * sigma
+            lower = np.clip(point - half, 0, None)
+            upper = point + half
+            err = np.abs(actual - point)
+            with np.errstate(all="ignore"):
+                scaled = np.where(scale > 0, err / scale, np.nan)
+            ok = np.isfinite(actual) & np.isfinite(point) & started
+            rows.append(pd.DataFrame({
+                "model": m, **{k: v[ok] for k, v in base.items()},
+                "actual": actual[ok], "forecast": point[ok], "lower": lower[ok], "upper": upper[ok],
+                "abs_error": err[ok], "scaled_error": scaled[ok],
+                "covered": (actual[ok] >= lower[ok]) & (actual[ok] <= upper[ok]),
+            }))
+        if not rows:
+            return pd.DataFrame(columns=["model", "woreda", "region", "origin", "horizon", "actual", "forecast",
+                                         "lower", "upper", "abs_error", "scaled_error", "covered"])
+        return pd.concat(rows, ignore_index=True)
+
+
+def backtest_metrics(errors: pd.DataFrame, by=("horizon",), baseline: str = "seasonal_naive") -> pd.DataFrame:
+    """MAE, MASE, interval coverage and n per model and `by` group; rel_MAE is MAE over the baseline's."""
+    keys = ["model"] + [k for k in by if k != "model"]
+    out = errors.groupby(keys, sort=True).agg(
+        MAE=("abs_error", "mean"), MASE=("scaled_error", "mean"),
+        coverage=("covered", "mean"), n=("abs_error", "size"),
+    ).reset_index()
+    if baseline in set(out["model"]):
+        ref = out[out["model"] == baseline].drop(columns=["model", "MASE", "coverage", "n"])
+        ref = ref.rename(columns={"MAE": "_ref"})
+        out = out.merge(ref, on=keys[1:], how="left") if keys[1:] else out.assign(_ref=float(ref["_ref"].iloc[0]))
+        with np.errstate(all="ignore"):
+            out["rel_MAE"] = np.where(out["_ref"] > 0, out["MAE"] / out["_ref"], np.nan)
+        out = out.drop(columns="_ref")
+    return out
+
+
+# -----------------------------
+# Cached entry point
+def run_backtest(path=FEATURES_PATH, horizon: int = HORIZON, models=MODELS, min_train: int = MIN_TRAIN,
+                 refit_every: int = REFIT_EVERY, regions: dict | None = None, n_jobs: int | None = None,
+                 cache_dir: str | None = CACHE_DIR) -> pd.DataFrame:
+    """Backtest error table for a feature file, cached per data version and settings."""
+    models = tuple(models)
+    regions = load_regions(regions)
+    key = hashlib.blake2b(f"{data_version(path)}|{TARGET}|{','.join(DRIVERS)}|{horizon}|{','.join(models)}|"
+                          f"{min_train}|{refit_every}|{regions_key(regions)}".encode(), digest_size=8).hexdigest()
+    cached = Path(cache_dir) / f"{Path(path).stem}.backtest.{key}.parquet" if cache_dir else None
+    if cached is not None and cached.exists():
+        return pd.read_parquet(cached)
+    panel = ForecastPanel(read_features(path), regions=regions)
+    errors = Backtest(panel, horizon, models, min_train, refit_every, n_jobs=n_jobs).errors()
+    if cached is not None:
+        try:
+            cached.parent.mkdir(parents=True, exist_ok=True)
+            errors.to_parquet(cached, index=False)
+        except OSError:
+            pass
+    return errors
+
+
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else FEATURES_PATH
+    horizon = int(sys.argv[2]) if len(sys.argv) > 2 else HORIZON
+    errors = run_backtest(src, horizon, cache_dir=None)
+    for by in (("horizon",), ("region",), ("woreda",)):
+        backtest_metrics(errors, by).to_csv(f"backtest_metrics_by_{by[0]}.csv", index=False)
+    print(backtest_metrics(errors, ()).round(3).to_string(index=False))
+    print(f"✅ {errors['origin'].nunique()} origins × {errors['woreda'].nunique()} woredas × {horizon} horizons "
+          f"-> backtest_metrics_by_{{horizon,region,woreda}}.csv")
@@ -0,0 +1,101 @@
+# chart_data.py
+# Server-side reduction of time-series rows before they are embedded in a Vega-Lite spec.
+# Altair inlines every row it is given, so the dashboards hand it this instead of the
+# filtered panel:
+#   lines  up to MAX_SERIES series, each downsampled with Largest-Triangle-Three-Buckets
+#          to about one point per horizontal pixel (peaks and troughs survive)
+#   band   more series than that: one median line and an interquartile band across
+#          series per date (dates bucketed to the chart width), so the payload depends
+#          on the chart width, not on the number of woredas
+# Only the columns the chart encodes are kept.
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+CHART_WIDTH = 1200                # px; the dashboards use the wide layout
+MAX_SERIES = 12                   # above this many series, draw a median / IQR band
+
+
+def lttb(x, y, n_out: int) -> np.ndarray:
+    """Positions of the points kept by Largest-Triangle-Three-Buckets (first and last always kept).
+
+    x must be sorted; points with a missing x or y are dropped first.
+    """
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    ok = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+    n = len(ok)
+    if n_out >= n or n_out < 3:
+        return ok
+    x, y = x[ok], y[ok]
+    edges = np.linspace(1, n - 1, n_out - 1).astype("int64")      # n_out - 2 inner buckets
+    keep = np.empty(n_out, dtype="int64")
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        if i == n_out - 3:
+            nx, ny = x[-1], y[-1]
+        else:
+            nhi = max(edges[i + 2], hi + 1)
+            nx, ny = x[hi:nhi].mean(), y[hi:nhi].mean()
+        area = np.abs((x[a] - nx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (ny - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return ok[keep]
+
+
+def downsample_series(df: pd.DataFrame, x: str, y: str, series: str, width: int = CHART_WIDTH,
+                      columns=None) -> pd.DataFrame:
+    """Rows of df with each series reduced to at most `width` points by LTTB."""
+    cols = list(dict.fromkeys([series, x, y] + list(columns or [])))
+    data = df[[c for c in cols if c in df.columns]].sort_values([series, x], kind="stable")
+    xs = pd.to_datetime(data[x]).to_numpy().astype("int64") if np.issubdtype(data[x].dtype, np.datetime64) \
+        else data[x].to_numpy(dtype="float64")
+    ys = pd.to_numeric(data[y], errors="coerce").to_numpy(dtype="float64")
+    starts = np.flatnonzero(np.r_[True, data[series].to_numpy()[1:] != data[series].to_numpy()[:-1]])
+    ends = np.append(starts[1:], len(data))
+    if (ends - starts).max(initial=0) <= width:
+        return data.reset_index(drop=True)
+    keep = np.concatenate([s + lttb(xs[s:e], ys[s:e], width) for s, e in zip(starts, ends)])
+    return data.iloc[keep].reset_index(drop=True)
+
+
+def series_band(df: pd.DataFrame, x: str, y: str, series: str, width: int = CHART_WIDTH) -> pd.DataFrame:
+    """Median, quartiles and series count of y across series per x (x bucketed to `width` bins)."""
+    data = df[[x, y, series]].copy()
+    data[y] = pd.to_numeric(data[y], errors="coerce")
+    uniq = np.sort(data[x].dropna().unique())
+    if len(uniq) > width:
+        # Pixel buckets: each bucket is shown at its first date
+        bucket = np.minimum((np.arange(len(uniq)) * width) // len(uniq), width - 1)
+        first = uniq[np.searchsorted(bucket, np.arange(width))]
+        data[x] = first[bucket[np.searchsorted(uniq, data[x].to_numpy())]]
+    g = data.groupby(x, sort=True)[y]
+    out = pd.DataFrame({
+        "median": g.median(),
+        "q25": g.quantile(0.25),
+        "q75": g.quantile(0.75),
+        "series": data.groupby(x, sort=True)[series].nunique(),
+    }).reset_index()
+    return out
+
+
+def chart_data(df: pd.DataFrame, x: str, y: str, series: str, width: int = CHART_WIDTH,
+               max_series: int = MAX_SERIES, columns=None) -> tuple:
+    """("lines", downsampled rows) for up to max_series series, else ("band", series_band(...))."""
+    if df[series].nunique() > max_series:
+        return "band", series_band(df, x, y, series, width)
+    return "lines", downsample_series(df, x, y, series, width, columns)
+
+
+def band_chart(band: pd.DataFrame, x: str, y_title: str, color: str, height: int = 300) -> alt.Chart:
+    """Median line over a shaded interquartile band (the "band" output of chart_data)."""
+    base = alt.Chart(band).encode(x=alt.X(f"{x}:T", title="Date"))
+    area = base.mark_area(opacity=0.25, color=color).encode(
+        y=alt.Y("q25:Q", title=y_title), y2="q75:Q",
+        tooltip=[alt.Tooltip(f"{x}:T", title="Date"), "median:Q", "q25:Q", "q75:Q",
+                 alt.Tooltip("series:Q", title="Woredas")])
+    line = base.mark_line(color=color, strokeWidth=2.2).encode(y="median:Q")
+    return (area + line).properties(height=height)
@@ -1,8 +1,15 @@
 import streamlit as st
+import altair as alt
 import pandas as pd
 import numpy as np
 from pathlib import Path
 
+from event_study import EventStudy
+from lag_corr import LAG_DRIVERS, LagCorrelations
+from master_loader import LOAD_LOG, load_master
+from missingness import PROFILE_PATH, MissingnessProfile, profile_snapshot, source_of
+from panel_tensor import PanelTensor
+
 st.set_page_config(page_title="Nutrition Dashboard", layout="wide")
 st.title("📊 Nutrition Dashboard")
 
@@ -11,158 +18,150 @@ st.title("📊 Nutrition Dashboard")
 # -------------------------------------------------------------------
 BASE = Path("D:/dash_outputs/missingness")
 master_file = BASE / "processed/master_integrated_dhis_conflict_ipc_wrsi.20251014T054322Z.csv"  # update to latest
+# Pages (tabs) whose declared columns are read from the master file
+PAGES = ["overlay", "retrospective", "quality"]
+
+def add_tfp(df: pd.DataFrame) -> pd.DataFrame:
+    """Build TFP_total / TFP_rate_per10k from SAM + MAM if needed."""
+    if {"SAM", "MAM"}.issubset(df.columns):
+        df["TFP_total"] = df[["SAM", "MAM"]].sum(axis=1)
+        if "population" in df.columns and (df["population"] > 0).any():
+            df["TFP_rate_per10k"] = (df["TFP_total"] / df["population"]) * 10000
+        elif "TFP_rate_per10k" not in df.columns:
+            # Use total as proxy when population missing
+            df["TFP_rate_per10k"] = df["TFP_total"]
+    return df
+
+@st.cache_resource(max_entries=2)
+def load_panel_tensor(path: str, version: str, pages: tuple):
+    """Read the pages' columns once per file version and keep only the compact tensor.
+
+    The CSV is typed and normalised once into a Parquet snapshot next to it; later loads
+    read only the projected columns. Returns (tensor, load report).
+    """
+    df, report = load_master(path, pages=pages, log=str(Path(path).parent / LOAD_LOG))
+    panel = PanelTensor.from_frame(add_tfp(df))
+    report["key_collisions"] = panel.n_collisions
+    return panel, report
 
 # Guarded load with clear error
 try:
-    df = pd.read_csv(master_file, parse_dates=["ym_ts"])
+    # Cache key for everything derived from the panel: changes whenever the file is rewritten
+    PANEL_VERSION = f"{master_file.name}:{master_file.stat().st_mtime_ns}"
+    panel, load_report = load_panel_tensor(str(master_file), PANEL_VERSION, tuple(PAGES))
 except FileNotFoundError:
     st.error(f"File not found: {master_file}. Please update the path/filename to your latest integrated CSV.")
     st.stop()
 
-# Normalize required keys if present
-for col in ["ADM2_PCODE", "ADM2_PCODE_final2"]:
-    if col in df.columns:
-        df[col] = df[col].astype(str).str.strip().str.upper()
 # Canonical ADM2 column
-ADM2_COL = "ADM2_PCODE" if "ADM2_PCODE" in df.columns else ("ADM2_PCODE_final2" if "ADM2_PCODE_final2" in df.columns else None)
+ADM2_COL = panel.key_col
 if ADM2_COL is None:
     st.warning("ADM2 key not found (expected ADM2_PCODE or ADM2_PCODE_final2). Some retrospective outputs will be limited.")
-
-# Ensure ym_ts is datetime
-if "ym_ts" in df.columns and not np.issubdtype(df["ym_ts"].dtype, np.datetime64):
-    df["ym_ts"] = pd.to_datetime(df["ym_ts"], errors="coerce")
-
-# Build TFP_rate_per10k if needed
-if {"SAM", "MAM"}.issubset(df.columns):
-    df["TFP_total"] = df[["SAM", "MAM"]].sum(axis=1)
-    if "population" in df.columns and (df["population"] > 0).any():
-        df["TFP_rate_per10k"] = (df["TFP_total"] / df["population"]) * 10000
-    elif "TFP_rate_per10k" not in df.columns:
-        # Use total as proxy when population missing
-        df["TFP_rate_per10k"] = df["TFP_total"]
-elif "TFP_rate_per10k" not in df.columns:
+if "TFP_rate_per10k" not in panel:
     st.warning("TFP_rate_per10k not found and SAM/MAM unavailable. Retrospective targets may be limited.")
 
 # -------------------------------------------------------------------
 # HELPER FUNCTIONS — robust to sparse coverage and minimal columns
 # -------------------------------------------------------------------
-def overlay_table(data: pd.DataFrame, rows: int = 24, woreda: str | None = None) -> pd.DataFrame:
-    """Tabular snapshot of key variables over time for a woreda (or pooled)."""
-    if "ym_ts" in data.columns:
-        out = data.copy().sort_values("ym_ts")
-    else:
-        out = data.copy()
-
-    if woreda and ADM2_COL and ADM2_COL in out.columns:
-        out = out[out[ADM2_COL] == woreda]
-
-    cols = [c for c in ["ADM2_PCODE", "ym_ts", "TFP_rate_per10k", "conflict_events_zone", "wrsi_value_leap", "ipc_value"] if c in out.columns]
-    if not cols:
-        # Minimal fallback: show what exists
-        cols = [c for c in ["year", "TFP_rate_per10k", "conflict_events_zone", "wrsi_value_leap", "ipc_value"] if c in out.columns]
-    return out[cols].head(rows) if cols else out.head(rows)
-
-def safe_corr(x: pd.Series, y: pd.Series) -> float | float:
-    """Compute Pearson corr only if both series have >2 valid and non-constant values."""
-    mask = x.notna() & y.notna()
-    if mask.sum() > 2 and x[mask].nunique() > 1 and y[mask].nunique() > 1:
-        return x[mask].corr(y[mask])
-    return np.nan
-
-def lagged_corr_table(data: pd.DataFrame,
+def overlay_table(data: PanelTensor, rows: int = 24, woredas=None, start=None, end=None) -> pd.DataFrame:
+    """Tabular snapshot of key variables over time for selected woredas (or pooled)."""
+    cols = [c for c in ["TFP_rate_per10k", "conflict_events_zone", "wrsi_value_leap", "ipc_value"] if c in data]
+    out = data.to_frame(cols, woredas=woredas, start=start, end=end)
+    return out.sort_values("ym_ts", kind="stable").head(rows)
+
+@st.cache_data(max_entries=16)
+def lag_correlations(_data: PanelTensor, version: str, target: str, features: tuple, max_lag: int) -> LagCorrelations:
+    """Pooled and per-woreda correlations for every (feature, lag), cached per panel version."""
+    return LagCorrelations(_data, target, features, max_lag)
+
+def lagged_corr_table(data: PanelTensor,
                       features=("conflict_events_zone", "wrsi_value_leap"),
-                      lags=range(0, 4)) -> pd.DataFrame:
-    """Table of correlations between TFP and lagged features across all woredas pooled."""
-    if "TFP_rate_per10k" not in data.columns:
+                      lags=range(0, 4),
+                      version: str = PANEL_VERSION) -> pd.DataFrame:
+    """Table of correlations between TFP and lagged features across all woredas pooled.
+
+    Lags are calendar months within each woreda; a pair counts when both values exist
+    and needs >2 pairs and non-constant series, as before.
+    """
+    if "TFP_rate_per10k" not in data:
         return pd.DataFrame({"Note": ["TFP_rate_per10k missing; cannot compute correlations"]})
 
-    # If ADM2/time missing, return NaNs honestly
-    if ADM2_COL is None or "ym_ts" not in data.columns:
+    lags = list(lags)
+    # If ADM2 missing, return NaNs honestly
+    if ADM2_COL is None:
         return pd.DataFrame({feat: [np.nan for _ in lags] for feat in features},
                             index=[f"Lag {l}" for l in lags])
 
-    out = {}
-    for feat in features:
-        vals = []
-        for lag in lags:
-            shifted = data.groupby(ADM2_COL)[feat].shift(lag) if feat in data.columns else pd.Series(index=data.index, dtype="float64")
-            vals.append(safe_corr(data["TFP_rate_per10k"], shifted))
-        out[feat] = vals
-    return pd.DataFrame(out, index=[f"Lag {l}" for l in lags])
+    res = lag_correlations(data, version, "TFP_rate_per10k", tuple(features), max(lags))
+    return res.pooled_table().reindex(index=[f"Lag {l}" for l in lags], columns=list(features))
 
-def event_study_table(data: pd.DataFrame,
+@st.cache_data(max_entries=32)
+def event_study_results(_data: PanelTensor, version: str, feature: str, targets: tuple,
+                        shock_type: str, threshold_value, window: tuple, n_boot: int) -> pd.DataFrame:
+    """Event-study table for one driver and its shocks, cached per panel version."""
+    study = EventStudy(_data, feature, targets, shock_type, threshold_value, window)
+    if study.n_shocks and n_boot:
+        study.bootstrap(n_boot)
+    return study.table() if study.n_shocks else pd.DataFrame()
+
+def event_study_table(data: PanelTensor,
                       feature="conflict_events_zone",
                       target="TFP_rate_per10k",
                       shock_type="high",
                       threshold_value=None,
-                      window=(-1, 2)) -> pd.DataFrame:
-    """Average target trajectory around shocks (pooled across woredas)."""
-    needed = {"ym_ts", target, feature}
-    if ADM2_COL is None:
-        # Still allow pooled event-study without ADM2, but quality is lower
-        needed = {"ym_ts", target, feature}
-    else:
-        needed = {"ym_ts", target, feature, ADM2_COL}
-
+                      window=(-1, 2),
+                      n_boot: int = 0,
+                      version: str = PANEL_VERSION) -> pd.DataFrame:
+    """Average target trajectory around shocks (pooled across woredas).
+
+    `target` may be a list for several targets at once; with n_boot > 0 the table also
+    carries bootstrap bands (<target>_lo / <target>_hi) from resampling woredas.
+    """
+    targets = (target,) if isinstance(target, str) else tuple(target)
+    needed = {feature, *targets}
     if not needed.issubset(set(data.columns)):
-        return pd.DataFrame({"Months_relative": [], f"Avg_{target}": []})
+        return pd.DataFrame({"Months_relative": [], f"Avg_{targets[0]}": []})
 
-    df2 = data.copy().sort_values([ADM2_COL, "ym_ts"]) if ADM2_COL else data.copy().sort_values("ym_ts")
+    out = event_study_results(data, version, feature, targets, shock_type, threshold_value, tuple(window), n_boot)
+    if out.empty:
+        return pd.DataFrame({"Months_relative": [], f"Avg_{targets[0]}": []})
+    return out
 
-    # Inclusive thresholds for sparse data
-    if threshold_value is None:
-        threshold_value = 0 if shock_type == "high" else df2[feature].median()
+@st.cache_resource(max_entries=2)
+def missingness_profile(path: str, version: str):
+    """Validity bitmaps for every master column, updated from the saved profile for new snapshots.
 
-    if shock_type == "high":
-        shocks = df2.loc[df2[feature] > threshold_value, [ADM2_COL, "ym_ts"]] if ADM2_COL else df2.loc[df2[feature] > threshold_value, ["ym_ts"]]
-    else:
-        shocks = df2.loc[df2[feature] < threshold_value, [ADM2_COL, "ym_ts"]] if ADM2_COL else df2.loc[df2[feature] < threshold_value, ["ym_ts"]]
-
-    if shocks.empty:
-        return pd.DataFrame({"Months_relative": [], f"Avg_{target}": []})
-
-    before, after = window
-    windows = []
-    for _, row in shocks.iterrows():
-        if ADM2_COL:
-            woreda, t = row[ADM2_COL], row["ym_ts"]
-            sub = df2[df2[ADM2_COL] == woreda].set_index("ym_ts")
-        else:
-            t = row["ym_ts"]
-            sub = df2.set_index("ym_ts")
-        rel_index = list(range(before, after + 1))
-        vals = []
-        for rel in rel_index:
-            dt = t + pd.DateOffset(months=rel)
-            vals.append(sub.at[dt, target] if dt in sub.index else np.nan)
-        s = pd.Series(vals, index=rel_index)
-        if s.notna().any():
-            windows.append(s)
-
-    if not windows:
-        return pd.DataFrame({"Months_relative": [], f"Avg_{target}": []})
-
-    avg = pd.concat(windows, axis=1).mean(axis=1)
-    return avg.rename(f"Avg_{target}").reset_index().rename(columns={"index": "Months_relative"})
-
-def coverage_tables(data: pd.DataFrame):
-    """Return compact coverage summaries (overall and by year)."""
-    vars_interest = [c for c in ["TFP_rate_per10k", "conflict_events_zone", "wrsi_value_leap", "ipc_value"] if c in data.columns]
-    if not vars_interest:
-        return pd.DataFrame({"note": ["No variables available for coverage"]}), pd.DataFrame()
+    Returns (profile, months rewritten for this snapshot).
+    """
+    return profile_snapshot(path, str(Path(path).parent / PROFILE_PATH))
 
-    overall = data[vars_interest].notna().mean().to_frame("coverage_fraction").T.round(3)
+def coverage_tables(prof: MissingnessProfile, by: str = "year"):
+    """Return coverage per variable (overall) and variable x `by`, from the profile's precomputed counts."""
+    if not prof.current:
+        return pd.DataFrame({"note": ["No variables available for coverage"]}), pd.DataFrame()
 
-    if "year" in data.columns:
-        by_year = data.groupby("year")[vars_interest].apply(lambda x: x.notna().mean()).round(3)
-    elif "ym_ts" in data.columns:
-        tmp = data.copy()
-        tmp["year"] = tmp["ym_ts"].dt.year
-        by_year = tmp.groupby("year")[vars_interest].apply(lambda x: x.notna().mean()).round(3)
+    overall = prof.coverage(by=("variable",)).set_index("variable")
+    overall = overall.sort_values("coverage", ascending=False).round(3)
+    if by == "source":
+        grouped = prof.coverage(by=("source", "year")).pivot(index="source", columns="year", values="coverage")
     else:
-        by_year = pd.DataFrame()
-
-    return overall, by_year
+        grouped = prof.matrix(by)
+        if by == "month":
+            grouped.columns = grouped.columns.strftime("%Y-%m")
+    return overall, grouped.round(3)
+
+def coverage_heatmap(prof: MissingnessProfile) -> alt.Chart:
+    """Variable x month coverage for the whole panel (grey where no woreda has a row)."""
+    cov = prof.coverage(by=("variable", "month"))
+    cov["source"] = cov["variable"].map(source_of)
+    order = cov.groupby("variable")["coverage"].mean().sort_values(ascending=False).index.tolist()
+    return alt.Chart(cov).mark_rect().encode(
+        x=alt.X("yearmonth(month):O", title="Month"),
+        y=alt.Y("variable:N", sort=order, title=None),
+        color=alt.Color("coverage:Q", scale=alt.Scale(domain=[0, 1], scheme="viridis"), title="Coverage"),
+        tooltip=["variable", "source", alt.Tooltip("yearmonth(month):T", title="month"),
+                 "valid", "rows", alt.Tooltip("coverage:Q", format=".0%")],
+    ).properties(height=max(200, 12 * len(order)))
 
 # -------------------------------------------------------------------
 # LAYOUT — three tabs: Overlay, Retrospective, Data Quality
@@ -172,51 +171,62 @@ tab1, tab2, tab3 = st.tabs(["Overlay", "Retrospective", "Data Quality"])
 with tab1:
     st.subheader("Overlay")
     # Woreda filter if available
-    if ADM2_COL and ADM2_COL in df.columns:
-        woredas = sorted(df[ADM2_COL].dropna().unique().tolist())
+    if ADM2_COL:
+        woredas = panel.woreda_names.tolist()
         sel_woredas = st.multiselect("Select woredas", woredas, default=woredas[:min(5, len(woredas))])
-        # Date filter if ym_ts available
-        if "ym_ts" in df.columns:
-            default_range = [df["ym_ts"].min().date(), df["ym_ts"].max().date()]
-            start, end = st.date_input("Date range", default_range)
-            mask = (df[ADM2_COL].isin(sel_woredas)) & (df["ym_ts"].dt.date.between(start, end))
-            d = df.loc[mask].copy()
-        else:
-            d = df[df[ADM2_COL].isin(sel_woredas)].copy()
-        st.dataframe(overlay_table(d, rows=24))
+        default_range = [panel.months[0].date(), panel.months[-1].date()]
+        start, end = st.date_input("Date range", default_range)
+        st.dataframe(overlay_table(panel, rows=24, woredas=sel_woredas, start=start, end=end))
     else:
         st.info("ADM2 key not available; showing pooled overlay.")
-        st.dataframe(overlay_table(df, rows=24))
+        st.dataframe(overlay_table(panel, rows=24))
 
 with tab2:
     st.subheader("Retrospective analysis")
     # Lagged correlations
-    st.write("Lagged correlations (TFP vs conflict/WRSI, pooled):")
-    lag_table = lagged_corr_table(df, features=("conflict_events_zone", "wrsi_value_leap"), lags=range(0, 4))
+    drivers = [c for c in LAG_DRIVERS if c in panel]
+    sel_drivers = st.multiselect("Drivers", drivers, default=[c for c in ("conflict_events_zone", "wrsi_value_leap") if c in drivers])
+    max_lag = st.slider("Max lag (months)", 0, 12, 3)
+    st.write("Lagged correlations (TFP vs selected drivers, pooled):")
+    lag_table = lagged_corr_table(panel, features=tuple(sel_drivers), lags=range(0, max_lag + 1))
     st.dataframe(lag_table)
+    if ADM2_COL and "TFP_rate_per10k" in panel and sel_drivers:
+        with st.expander("Per-woreda lagged correlations"):
+            res = lag_correlations(panel, PANEL_VERSION, "TFP_rate_per10k", tuple(sel_drivers), max_lag)
+            feat = st.selectbox("Driver", res.features)
+            st.dataframe(res.woreda_table(feat).dropna(how="all"))
+            st.write("Strongest lag per woreda:")
+            st.dataframe(res.best_lags())
 
     # Event-study
+    targets = [c for c in ["TFP_rate_per10k", "SAM", "MAM", "GAM"] if c in panel] or ["TFP_rate_per10k"]
+    c1, c2, c3 = st.columns(3)
+    sel_targets = c1.multiselect("Event-study targets", targets, default=targets[:1]) or targets[:1]
+    months_before, months_after = c2.slider("Window (months around shock)", -12, 12, (-1, 2))
+    n_boot = c3.selectbox("Bootstrap resamples (bands)", [0, 200, 1000], index=0)
     st.write("Event-study: Average TFP around conflict shocks (threshold >0):")
-    evt_conf = event_study_table(df, feature="conflict_events_zone", target="TFP_rate_per10k",
-                                 shock_type="high", threshold_value=None, window=(-1, 2))
+    evt_conf = event_study_table(panel, feature="conflict_events_zone", target=sel_targets,
+                                 shock_type="high", threshold_value=None,
+                                 window=(months_before, months_after), n_boot=n_boot)
     if evt_conf.empty:
         st.info("No valid conflict shocks found in current dataset (or target lacks variation).")
     else:
         st.dataframe(evt_conf)
 
     st.write("Event-study: Average TFP around WRSI low shocks (threshold below median):")
-    evt_wrsi = event_study_table(df, feature="wrsi_value_leap", target="TFP_rate_per10k",
-                                 shock_type="low", threshold_value=None, window=(-1, 2))
+    evt_wrsi = event_study_table(panel, feature="wrsi_value_leap", target=sel_targets,
+                                 shock_type="low", threshold_value=None,
+                                 window=(months_before, months_after), n_boot=n_boot)
     if evt_wrsi.empty:
         st.info("No valid WRSI low shocks found in current dataset (or target lacks variation).")
     else:
         st.dataframe(evt_wrsi)
 
     # Honest notes based on coverage/variation
-    tfp_var = df["TFP_rate_per10k"].nunique() if "TFP_rate_per10k" in df.columns else 0
-    conf_var = df["conflict_events_zone"].nunique() if "conflict_events_zone" in df.columns else 0
-    wrsi_var = df["wrsi_value_leap"].nunique() if "wrsi_value_leap" in df.columns else 0
-    ipc_cov = df["ipc_value"].notna().mean() if "ipc_value" in df.columns else 0
+    tfp_var = panel.nunique("TFP_rate_per10k") if "TFP_rate_per10k" in panel else 0
+    conf_var = panel.nunique("conflict_events_zone") if "conflict_events_zone" in panel else 0
+    wrsi_var = panel.nunique("wrsi_value_leap") if "wrsi_value_leap" in panel else 0
+    ipc_cov = panel.coverage(["ipc_value"]).iloc[0, 0] if "ipc_value" in panel else 0
     notes = []
     if tfp_var <= 1:
         notes.append("TFP is constant in this subset, so correlations/event-studies are uninformative.")
@@ -231,14 +241,31 @@ with tab2:
 
 with tab3:
     st.subheader("Data quality")
-    overall_cov, by_year_cov = coverage_tables(df)
+    profile, changed_months = missingness_profile(str(master_file), PANEL_VERSION)
+    st.caption(f"Loaded {load_report['columns']}/{load_report['columns_available']} columns × {load_report['rows']} rows "
+               f"in {load_report['load_s']:.2f} s ({load_report['memory_mb']:.2f} MB typed). Panel in memory: {panel.n_woredas} woredas × {panel.n_months} months × "
+               f"{len(panel.features)} features, {panel.nbytes / 1e6:.2f} MB (float32 + validity bitmasks).")
+    if load_report.get("key_collisions"):
+        st.caption(f"{load_report['key_collisions']} row(s) shared an ADM2 code and month with another row "
+                   "(e.g. placeholder codes) and were combined: counts summed, flags maxed, measures averaged.")
+    st.caption(f"Missingness profile: {len(profile.current)} columns × {len(profile.woredas)} woredas × {profile.n_months} months "
+               f"over {len(profile.snapshots)} snapshot(s); {len(changed_months)} month(s) re-profiled for this one.")
+
+    st.write("Coverage heatmap (fraction of woreda-months with a value):")
+    if profile.n_months:
+        st.altair_chart(coverage_heatmap(profile), use_container_width=True)
+    else:
+        st.info("No dated rows to profile; the heatmap needs 'ym_ts' timestamps.")
+
+    cov_by = st.selectbox("Group coverage by", ["year", "region", "woreda", "source", "month"], index=0)
+    overall_cov, grouped_cov = coverage_tables(profile, cov_by)
+    st.write(f"Coverage by {cov_by}:")
+    if grouped_cov.empty:
+        st.info("Grouped coverage requires 'ym_ts' timestamps and ADM2 codes.")
+    else:
+        st.dataframe(grouped_cov)
     st.write("Overall coverage (fraction non-missing):")
     st.dataframe(overall_cov)
-    st.write("Coverage by year:")
-    if by_year_cov.empty:
-        st.info("Yearly coverage requires a 'year' column or 'ym_ts' timestamps.")
-    else:
-        st.dataframe(by_year_cov)
 
 # -------------------------------------------------------------------
 # FOOTER
@@ -0,0 +1,222 @@
+# dhis_ingest.py
+# Streaming ingestion of DHIS2 facility-month exports into the woreda-month panel.
+# Exports (one row per facility and period, one column per data element) are read in
+# chunks and folded into fixed accumulators: measure sums per woreda x month and a
+# facility x month "reported" bitmap. Memory depends on the number of woredas,
+# facilities and months, never on the number of rows, so multi-GB exports stream
+# through. At the end the accumulators give the measure totals, GAM = MAM + SAM,
+# n_facilities_reporting, reporting completeness and the low_reporting flag, which are
+# written to the feature store as a patch version (derived lags are re-derived there).
+#
+#   python dhis_ingest.py export_2024.csv [more exports ...]
+
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from features import DATE_COL, KEY_COL, STORE_PATH, append_months, store_versions
+from name_resolver import norm_names
+from panel_index import month_ordinal, ordinal_to_timestamp
+
+CHUNK_ROWS = 500_000
+# panel column -> export column
+MEASURES = {
+    "MAM": "MAM",
+    "SAM": "SAM",
+    "MAMadmitted.otp": "MAMadmitted.otp",
+    "SAMadmitted.otp": "SAMadmitted.otp",
+    "X_2017.5screened.acute.malnutrition": "X_2017.5screened.acute.malnutrition",
+}
+FACILITY_COLS = ("facility_pcode", "orgunitid", "organisationunitid", "orgunit", "facility")
+PERIOD_COLS = ("periodid", "period", "ym", "month")
+WOREDA_COLS = ("woreda_key", "woreda", "Woreda", "orgunitlevel4")
+# A woreda-month is low reporting below this share of its facilities (those that ever report)
+LOW_REPORTING = 0.8
+# A file is reported as suspect when more than this share of its rows is skipped
+SKIP_WARN = 0.05
+
+
+def _first(columns, candidates) -> str:
+    for c in candidates:
+        if c in columns:
+            return c
+    raise KeyError(f"none of {candidates} found in columns")
+
+
+def period_ordinal(periods: pd.Series) -> np.ndarray:
+    """Month ordinals for DHIS2 monthly periods ("202401", "2024-01", "2024/01") or dates; -1 if unparseable."""
+    s = periods.astype("string").str.strip()
+    parts = s.str.extract(r"^(\d{4})[-/.]?(\d{2})$")
+    compact = parts[0].notna().to_numpy()
+    out = np.full(len(s), -1, dtype="int32")
+    if compact.any():
+        year = parts[0][compact].astype("int64").to_numpy()
+        month = parts[1][compact].astype("int64").to_numpy()
+        out[compact] = np.where((month >= 1) & (month <= 12), year * 12 + month - 1, -1)
+    if (~compact).any():
+        out[~compact] = month_ordinal(s[~compact])
+    return out
+
+
+def iter_chunks(path, columns, chunk_rows: int = CHUNK_ROWS):
+    """DataFrames of the wanted columns (those present) for each chunk of a CSV or Parquet export."""
+    if str(path).lower().endswith(".parquet"):
+        pf = pq.ParquetFile(path)
+        cols = [c for c in pf.schema_arrow.names if c in set(columns)]
+        for batch in pf.iter_batches(batch_size=chunk_rows, columns=cols):
+            yield batch.to_pandas()
+    else:
+        wanted = set(columns)
+        yield from pd.read_csv(path, usecols=lambda c: c in wanted, chunksize=chunk_rows, dtype=str)
+
+
+class DHISAccumulator:
+    """Woreda x month measure sums and facility x month reporting, grown as keys arrive."""
+
+    def __init__(self, measures: dict = MEASURES, facility_woreda: dict | None = None):
+        self.measures = dict(measures)
+        self.facility_woreda = None if facility_woreda is None else {
+            str(k).strip(): v for k, v in zip(facility_woreda, norm_names(pd.Series(list(facility_woreda.values()))))}
+        self.woredas, self.facilities = {}, {}
+        self.month_min = 0
+        M = len(self.measures)
+        self.sums = np.zeros((M, 0, 0))
+        self.has = np.zeros((M, 0, 0), dtype=bool)
+        self.reported = np.zeros((0, 0), dtype=bool)        # facility x month
+        self.seen = np.zeros(M, dtype=bool)                 # source column present in some chunk
+        self.fac_woreda = np.zeros(0, dtype="int64")
+        self.n_rows = self.n_skipped = 0
+        self.file_skips = {}                                # path -> (rows, skipped)
+
+    @property
+    def n_months(self) -> int:
+        return self.sums.shape[2]
+
+    def _ids(self, table: dict, values: np.ndarray) -> np.ndarray:
+        codes, uniq = pd.factorize(values)
+        return np.array([table.setdefault(u, len(table)) for u in uniq], dtype="int64")[codes]
+
+    def _grow(self, lo: int, hi: int) -> None:
+        """Pad to the current woreda / facility counts and months lo..hi."""
+        if self.n_months == 0:
+            self.month_min, before, after = lo, 0, hi - lo + 1
+        else:
+            before = max(self.month_min - lo, 0)
+            after = max(hi - (self.month_min + self.n_months - 1), 0)
+            self.month_min -= before
+        dw = len(self.woredas) - self.sums.shape[1]
+        df = len(self.facilities) - self.reported.shape[0]
+        if before or after or dw:
+            self.sums = np.pad(self.sums, ((0, 0), (0, dw), (before, after)))
+            self.has = np.pad(self.has, ((0, 0), (0, dw), (before, after)))
+        if before or after or df:
+            self.reported = np.pad(self.reported, ((0, df), (before, after)))
+            self.fac_woreda = np.pad(self.fac_woreda, (0, df), constant_values=-1)
+
+    def add(self, chunk: pd.DataFrame) -> None:
+        fac_col = _first(chunk.columns, FACILITY_COLS)
+        facility = chunk[fac_col].astype("string").str.strip()
+        if self.facility_woreda is not None:
+            woreda = facility.map(self.facility_woreda)
+        else:
+            raw = chunk[_first(chunk.columns, WOREDA_COLS)]
+            woreda = norm_names(raw).where(raw.notna())
+        months = period_ordinal(chunk[_first(chunk.columns, PERIOD_COLS)])
+        ok = (months >= 0) & facility.notna().to_numpy() & woreda.notna().to_numpy()
+        self.n_rows += len(chunk)
+        self.n_skipped += int((~ok).sum())
+        if not ok.any():
+            return
+        f = self._ids(self.facilities, facility.to_numpy(dtype=object)[ok])
+        w = self._ids(self.woredas, woreda.to_numpy(dtype=object)[ok])
+        t = months[ok]
+        self._grow(int(t.min()), int(t.max()))
+        t = t - self.month_min
+        W, T = self.sums.shape[1], self.n_months
+        flat = w * T + t
+        any_value = np.zeros(len(flat), dtype=bool)
+        for i, src in enumerate(self.measures.values()):
+            if src not in chunk.columns:
+                continue
+            self.seen[i] = True
+            v = pd.to_numeric(chunk[src], errors="coerce").to_numpy(dtype="float64")[ok]
+            fin = np.isfinite(v)
+            any_value |= fin
+            self.sums[i] += np.bincount(flat, weights=np.where(fin, v, 0.0), minlength=W * T).reshape(W, T)
+            self.has[i] |= np.bincount(flat[fin], minlength=W * T).reshape(W, T) > 0
+        self.reported[f[any_value], t[any_value]] = True
+        self.fac_woreda[f] = w
+
+    def add_file(self, path, chunk_rows: int = CHUNK_ROWS) -> "DHISAccumulator":
+        columns = list(FACILITY_COLS) + list(PERIOD_COLS) + list(WOREDA_COLS) + list(self.measures.values())
+        rows, skipped = self.n_rows, self.n_skipped
+        for chunk in iter_chunks(path, columns, chunk_rows):
+            self.add(chunk)
+        self.file_skips[str(path)] = (self.n_rows - rows, self.n_skipped - skipped)
+        return self
+
+    def suspect_files(self, share: float = SKIP_WARN) -> dict:
+        """path -> skipped share for files where more than `share` of the rows were skipped."""
+        return {p: k / n for p, (n, k) in self.file_skips.items() if n and k / n > share}
+
+    def panel_rows(self) -> pd.DataFrame:
+        """One row per woreda x month with totals, facility reporting and completeness.
+
+        Only measures whose source column appeared in an export are emitted, so a patch
+        never blanks store columns the exports did not carry.
+        """
+        names = np.array(list(self.woredas), dtype=object)
+        W, T = len(names), self.n_months
+        values = np.where(self.has, self.sums, np.nan)
+        out = {
+            KEY_COL: np.repeat(names, T),
+            DATE_COL: np.tile(ordinal_to_timestamp(self.month_min + np.arange(T)).to_numpy(), W),
+        }
+        for i, col in enumerate(self.measures):
+            if self.seen[i]:
+                out[col] = values[i].ravel()
+        if "MAM" in self.measures and "SAM" in self.measures:
+            m, s = list(self.measures).index("MAM"), list(self.measures).index("SAM")
+            if self.seen[m] or self.seen[s]:
+                out["GAM"] = np.where(self.has[m] | self.has[s], self.sums[m] + self.sums[s], np.nan).ravel()
+        reporting = np.zeros((W, T), dtype="int64")
+        np.add.at(reporting, self.fac_woreda, self.reported.astype("int64"))
+        expected = np.bincount(self.fac_woreda[self.reported.any(axis=1)], minlength=W)
+        with np.errstate(all="ignore"):
+            completeness = np.where(expected[:, None] > 0, reporting / expected[:, None], np.nan)
+        out["n_facilities_reporting"] = reporting.ravel()
+        out["reporting_completeness"] = completeness.ravel()
+        out["low_reporting"] = (completeness < LOW_REPORTING).ravel()
+        return pd.DataFrame(out)
+
+
+def accumulate(paths, chunk_rows: int = CHUNK_ROWS, facility_woreda: dict | None = None) -> DHISAccumulator:
+    acc = DHISAccumulator(facility_woreda=facility_woreda)
+    for p in paths:
+        acc.add_file(p, chunk_rows)
+    return acc
+
+
+def ingest(paths, root: str = STORE_PATH, chunk_rows: int = CHUNK_ROWS, facility_woreda: dict | None = None) -> tuple:
+    """Stream every export into one accumulator and patch the feature store; (version, rows)."""
+    rows = accumulate(paths, chunk_rows, facility_woreda).panel_rows()
+    if rows.empty:
+        return store_versions(root)[-1], 0
+    return append_months(rows, root, patch=True)
+
+
+if __name__ == "__main__":
+    acc = accumulate(sys.argv[1:])
+    print(f"{acc.n_rows} rows read ({acc.n_skipped} without facility, woreda or period), "
+          f"{len(acc.facilities)} facilities in {len(acc.woredas)} woredas × {acc.n_months} months")
+    for path, share in acc.suspect_files().items():
+        print(f"⚠️ {path}: {share:.0%} of rows skipped; check its period and organisation-unit columns")
+    rows = acc.panel_rows()
+    if store_versions(STORE_PATH):
+        v, n = append_months(rows, STORE_PATH, patch=True)
+        print(f"✅ {STORE_PATH} version {v}: {n} rows")
+    else:
+        rows.to_csv("dhis_woreda_month.csv", index=False)
+        print(f"✅ {len(rows)} woreda-months -> dhis_woreda_month.csv")
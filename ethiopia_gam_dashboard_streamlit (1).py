@@ -4,7 +4,6 @@
 
 import streamlit as st
 import pandas as pd
-import numpy as np
 import json
 from pathlib import Path
 
@@ -14,6 +13,8 @@ from shapely.geometry import Point
 from streamlit_folium import st_folium
 import folium
 
+from map_layers import gdf_point_layer
+
 st.set_page_config(page_title="Ethiopia GAM Dashboard", layout="wide")
 
 @st.cache_data
@@ -39,10 +40,10 @@ def load_geodata():
     return None
 
 # DataFrames
- df_ts = load_csv(TS_PATH)
- df_var = load_csv(VAR_PATH)
- df_recent = load_csv(RECENT_PATH)
- gdf_admin = load_geodata()
+df_ts = load_csv(TS_PATH)
+df_var = load_csv(VAR_PATH)
+df_recent = load_csv(RECENT_PATH)
+gdf_admin = load_geodata()
 
 st.title("Ethiopia GAM Dashboard")
 
@@ -174,35 +175,11 @@ else:
                 legend_name=factor
             ).add_to(m)
         except Exception:
-            # Fallback to centroid markers
-            for _, r in gdf_to_plot.iterrows():
-                try:
-                    val = r[color_key]
-                    geom = r.geometry
-                    pt = geom.centroid
-                    folium.CircleMarker([pt.y, pt.x], radius=6, fill=True, fill_color="red", color="red", popup=str(val)).add_to(m)
-                except Exception:
-                    pass
+            # Fallback to one marker layer at polygon interior points
+            gdf_point_layer(gdf_to_plot, color_key, colors="red").add_to(m)
     else:
-        # Points layer
-        # Normalize color intensity by quantiles
-        vals = gdf_to_plot[color_key].astype(float)
-        q = np.nanquantile(vals, [0.1, 0.5, 0.9]) if np.isfinite(vals).any() else [0, 0, 0]
-        def color_for(v):
-            if pd.isna(v):
-                return "#bdbdbd"
-            if v <= q[0]:
-                return "#ffffb2"
-            if v <= q[1]:
-                return "#fecc5c"
-            if v <= q[2]:
-                return "#fd8d3c"
-            return "#e31a1c"
-        for _, r in gdf_to_plot.iterrows():
-            lat = r.geometry.y
-            lon = r.geometry.x
-            val = r[color_key]
-            folium.CircleMarker([lat, lon], radius=6, fill=True, fill_color=color_for(val), color=color_for(val), popup=str(val)).add_to(m)
+        # Points layer, coloured by quantile band in one vectorised pass
+        gdf_point_layer(gdf_to_plot, color_key).add_to(m)
 
     st_folium(m, height=600, width=None)
 
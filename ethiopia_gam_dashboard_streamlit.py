@@ -2,6 +2,11 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
+from pathlib import Path
+
+from backtest import MIN_CALIBRATION, backtest_metrics, run_backtest
+from forecast import FEATURES_PATH, HORIZON, MODELS, RECONCILE, data_version, region_map, run_forecasts
+from reconcile import METHODS
 
 st.set_page_config(page_title='Ethiopia GAM Dashboard', layout='wide')
 
@@ -18,9 +23,28 @@ def load_csv(path):
 TS = load_csv('dhis_woreda_month_timeseries.csv')
 VAR = load_csv('dhis_variability_summary.csv')
 RET = load_csv('dhis_recent12m_retrospective.csv')
-WF = load_csv('forecasts_woreda_2025_11_12.csv')
-RF = load_csv('forecasts_region_2025_11_12.csv')
-NF = load_csv('forecasts_national_2025_11_12.csv')
+
+@st.cache_data(max_entries=8)
+def load_forecasts(path, version, horizon, regions, method):
+    """Coherent woreda / region / national forecasts, refit once per feature-file version."""
+    return run_forecasts(path, horizon, regions=regions, method=method)
+
+@st.cache_data(max_entries=8)
+def load_backtest(path, version, horizon, regions):
+    """Rolling-origin backtest errors for every woreda, origin and horizon, once per file version."""
+    return run_backtest(path, horizon, regions=regions)
+
+# Forecasts are fitted from the feature panel; the frozen CSVs are only a fallback
+if Path(FEATURES_PATH).exists():
+    horizon = st.sidebar.slider('Forecast horizon (months)', 1, 12, HORIZON)
+    method = st.sidebar.selectbox('Reconciliation', list(METHODS), index=METHODS.index(RECONCILE),
+                                  help='How woreda, region and national forecasts are made to add up.')
+    FC = load_forecasts(FEATURES_PATH, data_version(FEATURES_PATH), horizon, region_map(TS), method)
+    WF, RF, NF = FC['woreda'], FC['region'], FC['national']
+else:
+    WF = load_csv('forecasts_woreda_2025_11_12.csv')
+    RF = load_csv('forecasts_region_2025_11_12.csv')
+    NF = load_csv('forecasts_national_2025_11_12.csv')
 
 st.title('Ethiopia GAM Forecasting Dashboard')
 st.caption('Powered by Julius (https://julius.ai). Data shown: DHIS-derived summaries and forecasts.')
@@ -57,7 +81,24 @@ if RET is not None and 'woreda' in RET.columns:
 else:
     st.info('Retrospective not available.')
 
-st.header('Forecasts Nov-Dec 2025')
+# Backtest errors (Performance Metrics); models without scored rows had too little history
+BT = load_backtest(FEATURES_PATH, data_version(FEATURES_PATH), horizon, region_map(TS)) if Path(FEATURES_PATH).exists() else None
+UNTESTED = [m for m in MODELS if BT is not None and m not in set(BT['model'])]
+
+if NF is not None and 'model' in NF.columns:
+    months = pd.to_datetime(NF['date'])
+    st.header(f"Forecasts {months.min():%b %Y} - {months.max():%b %Y}")
+    model_sel = st.selectbox('Model', [m for m in MODELS if m in set(NF['model'])])
+    if model_sel in UNTESTED:
+        st.caption(f"{model_sel}: not enough history to backtest, so its accuracy and intervals are unchecked; "
+                   "series it cannot fit show the seasonal naive forecast.")
+    WF, RF, NF = (f[f['model'] == model_sel] for f in (WF, RF, NF))
+    if woreda_sel and woreda_sel != 'All':
+        WF = WF[WF['woreda'] == woreda_sel]
+    elif region_sel and region_sel != 'All':
+        WF = WF[WF['region'] == region_sel]
+else:
+    st.header('Forecasts Nov-Dec 2025')
 cols = st.columns(3)
 with cols[0]:
     st.subheader('Woreda level')
@@ -85,9 +126,27 @@ else:
     st.info('Variability file not available.')
 
 st.header('Performance Metrics')
-st.markdown('- Fit: Average difference between predicted and actual GAM rates (requires backtests).')
-st.markdown('- Accuracy: Match between predicted IPC classification and observed (if available).')
-st.markdown('- Stability: Performance across woredas and time (rolling).')
-st.markdown('- Benchmarking: Compare to naive/seasonal mean baselines.')
+if BT is not None and not BT.empty:
+    st.caption(f"Rolling-origin backtest: {BT['origin'].nunique()} origins "
+               f"({pd.to_datetime(BT['origin']).min():%b %Y} - {pd.to_datetime(BT['origin']).max():%b %Y}) × "
+               f"{BT['woreda'].nunique()} woredas × {BT['horizon'].max()} horizons. MASE is scaled by the in-sample "
+               "seasonal-naive error; rel_MAE compares with the seasonal naive baseline; coverage is for 80% intervals "
+               f"sized from earlier origins' out-of-sample errors (until {MIN_CALIBRATION} such errors exist, the model's "
+               "in-sample sigma is used, which is optimistic and under-covers).")
+    st.dataframe(backtest_metrics(BT, ()).round(3))
+    if UNTESTED:
+        st.caption(f"Not enough history to backtest: {', '.join(UNTESTED)} (no origin has enough training rows).")
+    by_h = backtest_metrics(BT, ('horizon',))
+    chart = alt.Chart(by_h).mark_line(point=True).encode(
+        x='horizon:O', y='MASE:Q', color='model:N', tooltip=['model', 'horizon', 'MAE', 'MASE', 'coverage', 'n']
+    ).properties(height=250)
+    st.altair_chart(chart, use_container_width=True)
+    perf_by = st.selectbox('Break down by', ['horizon', 'region', 'woreda'])
+    st.dataframe(backtest_metrics(BT, (perf_by,)).round(3))
+else:
+    st.markdown('- Fit: Average difference between predicted and actual GAM rates (requires backtests).')
+    st.markdown('- Accuracy: Match between predicted IPC classification and observed (if available).')
+    st.markdown('- Stability: Performance across woredas and time (rolling).')
+    st.markdown('- Benchmarking: Compare to naive/seasonal mean baselines.')
 
 st.caption('Add LEAP, climate, demographics, and conflict by dropping CSVs here and extending the model join in code.')
@@ -0,0 +1,137 @@
+# event_study.py
+# Event studies on a dense woreda x month panel.
+# Shocks are (woreda id, month offset) pairs found with one comparison over the
+# driver array; every target window around every shock comes out of a single fancy-
+# index gather on a NaN-padded copy of the target. Bootstrap bands reweight shocks
+# (or whole woredas) with multinomial counts, in chunks spread over a process pool.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from panel_index import PanelIndex, ordinal_to_timestamp
+
+# Below this many (resample x shock) cells the bootstrap runs in-process
+POOL_MIN_WORK = 2_000_000
+BOOT_CHUNK = 100
+
+
+def find_shocks(x: np.ndarray, shock_type: str = "high", threshold: float | None = None):
+    """(woreda ids, month offsets) where x is above ("high") or below ("low") the threshold.
+
+    Default threshold as in the dashboards: 0 for high shocks, the median for low shocks.
+    """
+    if threshold is None:
+        threshold = 0.0 if shock_type == "high" else float(np.nanmedian(x)) if np.isfinite(x).any() else np.nan
+    with np.errstate(invalid="ignore"):
+        hit = x > threshold if shock_type == "high" else x < threshold
+    w, t = np.nonzero(hit)
+    return w, t, threshold
+
+
+def event_windows(y: np.ndarray, w: np.ndarray, t: np.ndarray, before: int, after: int) -> np.ndarray:
+    """Shock x relative-month array: y[w, t + rel] for rel in before..after (NaN off the panel)."""
+    pad_l, pad_r = max(-before, 0), max(after, 0)
+    padded = np.pad(y, ((0, 0), (pad_l, pad_r)), constant_values=np.nan)
+    rel = np.arange(before, after + 1)
+    return padded[w[:, None], t[:, None] + pad_l + rel[None, :]]
+
+
+def _bootstrap_chunk(sums: np.ndarray, counts: np.ndarray, groups: np.ndarray,
+                     n_groups: int, n_boot: int, seed: int) -> np.ndarray:
+    """Resampled means (n_boot x targets x rel) from multinomial weights over groups."""
+    rng = np.random.default_rng(seed)
+    out = np.empty((n_boot,) + sums.shape[1:])
+    for b0 in range(0, n_boot, BOOT_CHUNK):
+        nb = min(BOOT_CHUNK, n_boot - b0)
+        weights = rng.multinomial(n_groups, np.full(n_groups, 1.0 / n_groups), size=nb)[:, groups].astype("float64")
+        with np.errstate(all="ignore"):
+            out[b0:b0 + nb] = (np.tensordot(weights, sums, axes=(1, 0))
+                               / np.tensordot(weights, counts, axes=(1, 0)))
+    return out
+
+
+class EventStudy:
+    """Average target trajectories around driver shocks, for one or more targets.
+
+    `idx` is a PanelIndex or a PanelTensor (anything with dense(), columns and woreda_names).
+    """
+
+    def __init__(self, idx: PanelIndex, feature: str, targets, shock_type: str = "high",
+                 threshold: float | None = None, window=(-1, 2)):
+        self.before, self.after = window
+        self.rel = np.arange(self.before, self.after + 1)
+        self.targets = [t for t in ([targets] if isinstance(targets, str) else list(targets)) if t in idx.columns]
+        w, t, self.threshold = find_shocks(idx.dense(feature), shock_type, threshold)
+
+        ys = np.stack([event_windows(idx.dense(tg), w, t, self.before, self.after) for tg in self.targets]) \
+            if self.targets else np.empty((0, len(w), len(self.rel)))
+        # Keep shocks with at least one observed value in any target window
+        keep = np.isfinite(ys).any(axis=(0, 2)) if len(w) else np.zeros(0, dtype=bool)
+        self.windows = ys[:, keep]                               # targets x shocks x rel
+        self.shock_woreda = w[keep]
+        self.shock_month = t[keep] + idx.month_min                # month ordinals
+        self.woredas = idx.woreda_names
+        self.ci = None
+
+    def shocks(self) -> pd.DataFrame:
+        """Woreda and month of every shock kept in the study."""
+        return pd.DataFrame({"woreda": self.woredas[self.shock_woreda],
+                             "ym_ts": ordinal_to_timestamp(self.shock_month)})
+
+    @property
+    def n_shocks(self) -> int:
+        return self.windows.shape[1]
+
+    def means(self) -> np.ndarray:
+        """targets x rel average over shocks (NaN-aware)."""
+        ok = np.isfinite(self.windows)
+        with np.errstate(all="ignore"):
+            return np.where(ok, self.windows, 0.0).sum(axis=1) / ok.sum(axis=1)
+
+    def bootstrap(self, n_boot: int = 500, level: float = 0.95, cluster: bool = True,
+                  seed: int = 0, n_jobs: int | None = None) -> np.ndarray:
+        """Percentile bands (2 x targets x rel), resampling woredas (cluster) or single shocks."""
+        if self.n_shocks == 0:
+            self.ci = np.full((2, len(self.targets), len(self.rel)), np.nan)
+            return self.ci
+        if cluster:
+            groups_u, groups = np.unique(self.shock_woreda, return_inverse=True)
+            n_groups = len(groups_u)
+        else:
+            groups, n_groups = np.arange(self.n_shocks), self.n_shocks
+        ok = np.isfinite(self.windows)
+        sums = np.where(ok, self.windows, 0.0).transpose(1, 0, 2)   # shocks x targets x rel
+        counts = ok.transpose(1, 0, 2).astype("float64")
+
+        n_jobs = n_jobs or os.cpu_count() or 1
+        parts = [len(c) for c in np.array_split(np.arange(n_boot), n_jobs) if len(c)]
+        seeds = np.random.SeedSequence(seed).generate_state(len(parts))
+        args = [(sums, counts, groups, n_groups, nb, int(s)) for nb, s in zip(parts, seeds)]
+        if len(parts) > 1 and n_boot * self.n_shocks >= POOL_MIN_WORK:
+            try:
+                with ProcessPoolExecutor(max_workers=len(parts)) as pool:
+                    draws = list(pool.map(_bootstrap_chunk, *zip(*args)))
+            except (OSError, RuntimeError):
+                draws = [_bootstrap_chunk(*a) for a in args]
+        else:
+            draws = [_bootstrap_chunk(*a) for a in args]
+        draws = np.concatenate(draws)
+        alpha = (1 - level) / 2
+        with np.errstate(all="ignore"):
+            self.ci = np.nanquantile(draws, [alpha, 1 - alpha], axis=0)
+        return self.ci
+
+    def table(self) -> pd.DataFrame:
+        """Months_relative, Avg_<target> and, after bootstrap(), <target>_lo / <target>_hi."""
+        out = pd.DataFrame({"Months_relative": self.rel})
+        means = self.means()
+        for i, tg in enumerate(self.targets):
+            out[f"Avg_{tg}"] = means[i]
+            if self.ci is not None:
+                out[f"{tg}_lo"] = self.ci[0, i]
+                out[f"{tg}_hi"] = self.ci[1, i]
+        out["n_shocks"] = self.n_shocks
+        return out
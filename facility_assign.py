@@ -0,0 +1,152 @@
+# facility_assign.py
+# Health facility -> ADM2 pcode assignment against the admin boundaries.
+# All new facilities go through one bulk STRtree point-in-polygon query (spatial_join);
+# points just outside every polygon (GPS drift, simplified borders) fall back to the
+# nearest polygon within MAX_DISTANCE. Every decision is kept in a cache table keyed by
+# facility and rounded coordinates, saved to CSV, so re-runs only touch facilities that
+# are new or have moved; rows can be hand-corrected (method="manual") and reloaded.
+# fill_pcodes() then replaces placeholder codes such as ET05XX in the master panel.
+#
+#   python facility_assign.py dhis_facility_map_51.html [ethiopia_woreda.geojson] [master.csv]
+
+import hashlib
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from spatial_join import BOUNDARY_PATH, PolygonIndex
+
+CACHE_PATH = "facility_adm2_cache.csv"
+CACHE_COLUMNS = ["facility", "lat", "lon", "ADM2_PCODE", "method", "distance_deg", "boundaries"]
+MAX_DISTANCE = 0.05               # degrees (~5 km) for the nearest-polygon fallback
+COORD_DECIMALS = 5                # ~1 m; a facility that moves further is reassigned
+PLACEHOLDER = r"^ET\d{2}XX$"      # region known, woreda not
+
+
+def boundary_key(index: PolygonIndex) -> str:
+    """Short hash of the polygon codes and extents; cached rows from other boundaries are redone."""
+    h = hashlib.blake2b(digest_size=6)
+    h.update("|".join(map(str, index.codes if index.codes is not None else index.keys)).encode())
+    h.update(np.round(np.asarray([g.bounds for g in index.geoms], dtype="float64"), 6).tobytes())
+    return h.hexdigest()
+
+
+class FacilityAssigner:
+    """Facility coordinates -> ADM2 pcode, with a persistent decision table."""
+
+    def __init__(self, index: PolygonIndex, cache: pd.DataFrame | None = None, max_distance: float = MAX_DISTANCE):
+        if index.codes is None:
+            raise KeyError("boundaries have no ADM2 pcode column")
+        self.index, self.max_distance = index, max_distance
+        self.boundaries = boundary_key(index)
+        self.table = pd.DataFrame(columns=CACHE_COLUMNS) if cache is None else cache[CACHE_COLUMNS].copy()
+        self._dirty = False
+
+    @staticmethod
+    def _normalise(df: pd.DataFrame) -> pd.DataFrame:
+        out = df[["facility", "lat", "lon"]].copy()
+        out["facility"] = out["facility"].astype(str).str.strip()
+        out[["lat", "lon"]] = out[["lat", "lon"]].apply(pd.to_numeric, errors="coerce").round(COORD_DECIMALS)
+        return out
+
+    def assign(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Decision rows for the facilities in df (facility, lat, lon); only unseen ones are computed."""
+        keys = self._normalise(df).drop_duplicates().reset_index(drop=True)
+        current = self.table[(self.table["boundaries"] == self.boundaries) | (self.table["method"] == "manual")]
+        known = keys.merge(current, on=["facility", "lat", "lon"], how="left", indicator=True)
+        todo = keys[(known["_merge"] == "left_only").to_numpy()]
+        if len(todo):
+            lon, lat = todo["lon"].to_numpy(), todo["lat"].to_numpy()
+            pos = self.index.locate(lon, lat)
+            dist = np.where(pos >= 0, 0.0, np.inf)
+            miss = np.flatnonzero(pos < 0)
+            if len(miss):
+                near, d = self.index.nearest(lon[miss], lat[miss], self.max_distance)
+                pos[miss], dist[miss] = near, d
+            method = np.where(dist == 0, "within", np.where(pos >= 0, "nearest", "unassigned"))
+            new = todo.assign(
+                ADM2_PCODE=np.where(pos >= 0, self.index.codes[np.clip(pos, 0, None)], None),
+                method=method,
+                distance_deg=np.where(np.isfinite(dist), np.round(dist, 6), np.nan),
+                boundaries=self.boundaries,
+            )
+            stale = self.table.set_index(["facility", "lat", "lon"]).index.isin(
+                new.set_index(["facility", "lat", "lon"]).index)
+            kept = self.table[~stale]
+            self.table = pd.concat([kept, new], ignore_index=True) if len(kept) else new.reset_index(drop=True)
+            self._dirty = True
+        out = keys.merge(self.table, on=["facility", "lat", "lon"], how="left")
+        return out.drop_duplicates(["facility", "lat", "lon"], keep="last").reset_index(drop=True)
+
+    def lookup(self, df: pd.DataFrame) -> pd.Series:
+        """ADM2 pcode for each row of df (NaN if unassigned)."""
+        codes = self.assign(df).set_index(["facility", "lat", "lon"])["ADM2_PCODE"]
+        probe = pd.MultiIndex.from_frame(self._normalise(df))
+        return pd.Series(codes.reindex(probe).to_numpy(), index=df.index, name="ADM2_PCODE")
+
+    def report(self) -> pd.DataFrame:
+        return self.table.groupby("method").size().rename("facilities").reset_index()
+
+    def save(self, path: str = CACHE_PATH) -> bool:
+        """Write the decision table if it changed; returns False if the path is not writable."""
+        if not self._dirty:
+            return True
+        try:
+            self.table.to_csv(path, index=False)
+        except OSError:
+            return False
+        self._dirty = False
+        return True
+
+
+def load_cache(path: str = CACHE_PATH) -> pd.DataFrame | None:
+    p = Path(path)
+    if not p.exists():
+        return None
+    try:
+        return pd.read_csv(p, dtype={"facility": str, "ADM2_PCODE": str, "method": str, "boundaries": str})
+    except Exception:
+        return None
+
+
+def fill_pcodes(df: pd.DataFrame, facilities: pd.DataFrame, code_col: str = "ADM2_PCODE",
+                facility_col: str = "facility_pcode", out_col: str = "ADM2_PCODE_filled") -> pd.DataFrame:
+    """Replace missing or placeholder codes (ET05XX) with the facility's assigned pcode.
+
+    `facilities` holds facility and ADM2_PCODE (the assign() output). A placeholder is
+    only replaced by a pcode in the same region (ET05XX -> ET05...).
+    """
+    out = df.copy()
+    code = out[code_col].astype("string").str.strip().str.upper()
+    assigned = out[facility_col].astype("string").str.strip().map(
+        facilities.dropna(subset=["ADM2_PCODE"]).drop_duplicates("facility", keep="last")
+                  .set_index("facility")["ADM2_PCODE"])
+    placeholder = code.str.match(PLACEHOLDER).fillna(False)
+    same_region = assigned.str[:4] == code.str[:4]
+    use = assigned.notna() & (code.isna() | (placeholder & same_region.fillna(False)))
+    out[out_col] = code.mask(use, assigned)
+    return out
+
+
+if __name__ == "__main__":
+    src = sys.argv[1]
+    boundaries = sys.argv[2] if len(sys.argv) > 2 else BOUNDARY_PATH
+    if src.lower().endswith(".html"):
+        from facility_map_export import read_plotly_facility_html
+        facilities = read_plotly_facility_html(src)[0]
+    else:
+        facilities = pd.read_csv(src)
+    assigner = FacilityAssigner(PolygonIndex.from_file(boundaries), load_cache())
+    rows = assigner.assign(facilities)
+    assigner.save()
+    print(assigner.report().to_string(index=False))
+    print(f"✅ {len(rows)} facilities -> {CACHE_PATH}")
+    if len(sys.argv) > 3:
+        master = pd.read_csv(sys.argv[3])
+        filled = fill_pcodes(master, rows)
+        out = Path(sys.argv[3]).with_suffix(".filled.csv")
+        filled.to_csv(out, index=False)
+        changed = (filled["ADM2_PCODE_filled"] != master["ADM2_PCODE"].astype("string").str.strip().str.upper()).sum()
+        print(f"✅ {changed} rows with a filled pcode -> {out}")
@@ -0,0 +1,187 @@
+# facility_map_export.py
+# Compact facility maps: each facility (name, lat, lon) is stored once and the monthly
+# values as base64 Float32Arrays; a month slider restyles the one marker trace in the
+# browser instead of shipping a separate point per facility-month.
+#
+# Convert an existing Plotly export:
+#   python facility_map_export.py dhis_facility_map_SAM.html dhis_facility_map_SAM_compact.html
+
+import base64
+import html
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PLOTLY_CDN = "https://cdn.plot.ly/plotly-3.1.0.min.js"
+
+
+# -----------------------------
+# Encoding
+def b64_array(a, dtype="<f4") -> str:
+    return base64.b64encode(np.ascontiguousarray(a, dtype=dtype).tobytes()).decode("ascii")
+
+
+def encode_facilities(df: pd.DataFrame, value_cols: list,
+                      facility_col: str = "facility", lat_col: str = "lat",
+                      lon_col: str = "lon", month_col: str = "month") -> dict:
+    """Dictionary-encode facilities and pack values as month-major (month x facility) float32 arrays.
+
+    A facility is a (name, lat, lon) triple: same-named facilities at different places
+    keep their own markers.
+    """
+    keys = [facility_col, lat_col, lon_col]
+    data = df.dropna(subset=keys)
+    fac = data[keys].drop_duplicates().sort_values(keys, ignore_index=True)
+    fac_code = pd.MultiIndex.from_frame(fac).get_indexer(pd.MultiIndex.from_frame(data[keys]))
+    months = sorted(data[month_col].dropna().unique().tolist())
+    month_code = pd.Categorical(data[month_col], categories=months).codes
+    ok = (fac_code >= 0) & (month_code >= 0)
+
+    values = {}
+    for col in value_cols:
+        grid = np.full((len(months), len(fac)), np.nan, dtype="float32")
+        grid[month_code[ok], fac_code[ok]] = pd.to_numeric(data[col], errors="coerce").to_numpy()[ok]
+        values[col] = b64_array(grid)
+    return {
+        "names": fac[facility_col].astype(str).tolist(),
+        "lat": b64_array(fac[lat_col].to_numpy()),
+        "lon": b64_array(fac[lon_col].to_numpy()),
+        "months": [str(pd.Timestamp(m).strftime("%Y-%m")) if isinstance(m, (pd.Timestamp, np.datetime64)) else str(m) for m in months],
+        "values": values,
+    }
+
+
+def boundary_outline(boundary, tolerance: float = 0.01) -> dict | None:
+    """Simplified, grid-snapped admin outline as a GeoJSON dict (geometry only)."""
+    if boundary is None:
+        return None
+    import geopandas as gpd
+    from geolocation import simplify_boundaries
+
+    gdf = boundary if isinstance(boundary, gpd.GeoDataFrame) else gpd.GeoDataFrame.from_features(boundary["features"])
+    gdf = simplify_boundaries(gdf[["geometry"]], tolerance)
+    return json.loads(gdf.to_json(drop_id=True))
+
+
+# -----------------------------
+# HTML
+_PAGE = """<html>
+<head><meta charset="utf-8" /><title>{title}</title><script charset="utf-8" src="{cdn}"></script></head>
+<body style="margin:0; font-family:sans-serif;">
+<div style="padding:6px 10px; display:flex; gap:12px; align-items:center;">
+  <b>{title}</b>
+  <select id="measure"></select>
+  <button id="play">&#9654;</button>
+  <input id="month" type="range" min="0" value="0" style="flex:1;" />
+  <span id="label"></span>
+</div>
+<div id="map" style="height:calc(100vh - 44px); width:100%;"></div>
+<script>
+const D = {payload};
+function f32(b) {{ const s = atob(b), u = new Uint8Array(s.length); for (let i = 0; i < s.length; i++) u[i] = s.charCodeAt(i); return new Float32Array(u.buffer); }}
+const nF = D.names.length, nM = D.months.length, V = {{}};
+for (const k in D.values) V[k] = f32(D.values[k]);
+const measure = document.getElementById("measure"), month = document.getElementById("month"), label = document.getElementById("label");
+Object.keys(V).forEach(k => measure.add(new Option(k, k)));
+month.max = nM - 1; month.value = nM - 1;
+function column() {{ const m = +month.value; return V[measure.value].subarray(m * nF, (m + 1) * nF); }}
+function lim(k) {{ let hi = 0; for (const v of V[k]) if (v > hi) hi = v; return hi || 1; }}
+const trace = {{type: "scattermap", mode: "markers", lat: f32(D.lat), lon: f32(D.lon), hovertext: D.names,
+  marker: {{size: 9, color: column(), colorscale: "Reds", cmin: 0, cmax: lim(measure.value), showscale: true}},
+  hovertemplate: "<b>%{{hovertext}}</b><br>%{{marker.color}}<extra></extra>"}};
+const layout = {{margin: {{r: 0, t: 0, l: 0, b: 0}}, map: {{style: "open-street-map", center: {{lat: D.center[0], lon: D.center[1]}}, zoom: 5,
+  layers: D.boundary ? [{{source: D.boundary, type: "line", color: "black", line: {{width: 1}}}}] : []}}}};
+Plotly.newPlot("map", [trace], layout, {{responsive: true}});
+function update() {{ label.textContent = D.months[+month.value] || "";
+  Plotly.restyle("map", {{"marker.color": [column()], "marker.cmax": lim(measure.value)}}); }}
+month.oninput = update; measure.onchange = update; update();
+let timer = null;
+document.getElementById("play").onclick = () => {{
+  if (timer) {{ clearInterval(timer); timer = null; return; }}
+  timer = setInterval(() => {{ month.value = (+month.value + 1) % nM; update(); }}, 800);
+}};
+</script>
+</body>
+</html>
+"""
+
+
+def export_facility_map(df: pd.DataFrame, path: str, value_cols: list,
+                        facility_col: str = "facility", lat_col: str = "lat",
+                        lon_col: str = "lon", month_col: str = "month",
+                        boundary=None, title: str = "Facility map") -> int:
+    """Write a self-contained facility map with a month slider; returns the file size in bytes."""
+    payload = encode_facilities(df, value_cols, facility_col, lat_col, lon_col, month_col)
+    payload["center"] = [float(df[lat_col].mean()), float(df[lon_col].mean())]
+    payload["boundary"] = boundary_outline(boundary)
+    # Facility names go inside <script>: escape what could close the tag or start markup
+    data = (json.dumps(payload, separators=(",", ":"))
+            .replace("<", "\\u003c").replace(">", "\\u003e").replace("&", "\\u0026"))
+    page = _PAGE.format(title=html.escape(title), cdn=PLOTLY_CDN, payload=data)
+    Path(path).write_text(page, encoding="utf-8")
+    return Path(path).stat().st_size
+
+
+# -----------------------------
+# Reading the older Plotly exports
+def _decode(v):
+    """Plotly typed-array dict ({'dtype', 'bdata'}) or plain list -> numpy array."""
+    if isinstance(v, dict) and "bdata" in v:
+        return np.frombuffer(base64.b64decode(v["bdata"]), dtype=np.dtype(v["dtype"]).newbyteorder("<"))
+    return np.asarray(v)
+
+
+def read_plotly_facility_html(path: str):
+    """Facility points from a Plotly scattermapbox export, as a long frame, plus any boundary GeoJSON.
+
+    Points repeated for the same facility (name and coordinates) and measure are taken as
+    consecutive months (period 1, 2, ...), which is how the facility-month exports were written.
+    """
+    text = Path(path).read_text(encoding="utf-8")
+    start = text.index("[", text.index("Plotly.newPlot("))
+    decoder = json.JSONDecoder()
+    traces, end = decoder.raw_decode(text[start:])
+    rest = text[start + end:]
+    layout, _ = decoder.raw_decode(rest[rest.index("{"):])
+
+    frames, boundary = [], None
+    default_measure = layout.get("coloraxis", {}).get("colorbar", {}).get("title", {}).get("text", "value")
+    for t in traces:
+        if "geojson" in t and t.get("geojson"):
+            boundary = t["geojson"]
+            continue
+        if "lat" not in t:
+            continue
+        labels = t.get("hovertext") or t.get("text") or []
+        names = [str(x).split("<br>")[0] for x in labels]
+        color = t.get("marker", {}).get("color")
+        frames.append(pd.DataFrame({
+            "facility": names,
+            "lat": _decode(t["lat"]).astype("float64"),
+            "lon": _decode(t["lon"]).astype("float64"),
+            "measure": t.get("name") or default_measure,
+            "value": _decode(color).astype("float64") if color is not None else np.nan,
+        }))
+    long = pd.concat(frames, ignore_index=True)
+    long["month"] = long.groupby(["facility", "lat", "lon", "measure"]).cumcount() + 1
+    return long, boundary
+
+
+def convert_plotly_html(src: str, dst: str) -> int:
+    """Re-export an older Plotly facility map in the compact format."""
+    long, boundary = read_plotly_facility_html(src)
+    wide = long.pivot_table(index=["facility", "lat", "lon", "month"], columns="measure",
+                            values="value", aggfunc="first").reset_index()
+    measures = sorted(long["measure"].unique().tolist())
+    wide["month"] = "P" + wide["month"].astype(str).str.zfill(2)
+    return export_facility_map(wide, dst, measures, boundary=boundary, title=Path(src).stem)
+
+
+if __name__ == "__main__":
+    src = sys.argv[1]
+    dst = sys.argv[2] if len(sys.argv) > 2 else str(Path(src).with_name(Path(src).stem + "_compact.html"))
+    size = convert_plotly_html(src, dst)
+    print(f"✅ {src} ({Path(src).stat().st_size / 1e3:.0f} kB) -> {dst} ({size / 1e3:.0f} kB)")
@@ -0,0 +1,277 @@
+# features.py
+# Declarative, incremental derived features for the woreda-month feature panel.
+# Each derived column declares its input, operation and window in DERIVED_FEATURES.
+# The feature panel lives in a versioned Parquet store (version=N/ partitions): appending
+# a month reads only the last `lookback` months of inputs, recomputes the derived
+# columns for the affected tail rows of every woreda at once, and writes them as a new
+# version. Earlier versions are never rewritten; readers keep the newest version of each
+# (woreda, month) row.
+# SPI columns use the gamma climatology saved by spi.py (fitted at init from the full
+# history), so appends only run the CDF transform on the tail months.
+#
+#   python features.py init woreda_month_features_v2.parquet [store]
+#   python features.py append new_month.parquet [store]
+#   python features.py export out.parquet [store]
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from panel_index import PanelIndex, month_ordinal
+from spi import CLIM_PATH, SPIClimatology
+
+STORE_PATH = "woreda_month_features"
+KEY_COL = "woreda_key"
+DATE_COL = "ym"
+VERSION_SCHEMA = pa.schema([("version", pa.int32())])
+
+# derived column -> (operation, input column, window)
+#   lag   value `window` calendar months earlier
+#   sum   sum over the last `window` months (all must be present)
+#   mean  mean over the last `window` months (all must be present)
+#   spi   standardised precipitation index of the `window`-month total (see spi.py)
+DERIVED_FEATURES = {
+    "GAM_lag1": ("lag", "GAM", 1),
+    "GAM_lag2": ("lag", "GAM", 2),
+    "MAM_lag1": ("lag", "MAM", 1),
+    "MAM_lag2": ("lag", "MAM", 2),
+    "SAM_lag1": ("lag", "SAM", 1),
+    "SAM_lag2": ("lag", "SAM", 2),
+    "wrsI_lag1": ("lag", "monthly_rangeland_wrsI", 1),
+    "wrsI_roll3": ("mean", "monthly_rangeland_wrsI", 3),
+    "monthly_rain_3m": ("sum", "monthly_rain", 3),
+    "conflict_events_3m": ("sum", "conflict_events", 3),
+    "events_3m_sum": ("sum", "conflict_events_zone", 3),
+    "SPI_1": ("spi", "monthly_rain", 1),
+    "SPI_3": ("spi", "monthly_rain", 3),
+    "SPI_6": ("spi", "monthly_rain", 6),
+    "SPI_12": ("spi", "monthly_rain", 12),
+}
+
+
+# -----------------------------
+# Operations on woreda x month arrays
+def lookback(op: str, window: int) -> int:
+    """Months before t that feature(t) reads."""
+    return window if op == "lag" else window - 1
+
+
+def derive(x: np.ndarray, op: str, window: int) -> np.ndarray:
+    """Apply one declared operation along the month axis of a woreda x month array."""
+    W, T = x.shape
+    if op == "lag":
+        out = np.full_like(x, np.nan)
+        if window < T:
+            out[:, window:] = x[:, :T - window]
+        return out
+    if op in ("sum", "mean"):
+        ok = np.isfinite(x)
+        cs = np.concatenate([np.zeros((W, 1)), np.cumsum(np.where(ok, x, 0.0), axis=1)], axis=1)
+        cn = np.concatenate([np.zeros((W, 1)), np.cumsum(ok, axis=1)], axis=1)
+        lo = np.clip(np.arange(1, T + 1) - window, 0, None)
+        s = cs[:, 1:] - cs[:, lo]
+        n = cn[:, 1:] - cn[:, lo]
+        full = (n == window)
+        with np.errstate(all="ignore"):
+            return np.where(full, s if op == "sum" else s / window, np.nan)
+    raise ValueError(f"unknown feature operation: {op}")
+
+
+class FeaturePipeline:
+    """Derived columns computed from their declared inputs for every woreda in one pass."""
+
+    def __init__(self, specs: dict = DERIVED_FEATURES, key_col: str = KEY_COL, date_col: str = DATE_COL,
+                 clim_path: str | None = CLIM_PATH):
+        self.specs, self.key_col, self.date_col = dict(specs), key_col, date_col
+        self.clim_path = clim_path
+        self._clim = {}
+
+    def climatology(self, src: str, idx: PanelIndex, windows) -> SPIClimatology:
+        """SPI climatology for an input column: in memory, else the saved one, else fitted on idx (not saved).
+
+        Woredas the climatology does not cover get NaN SPI; it is never refitted on idx when
+        one exists, since during an append idx is only the lookback tail.
+        """
+        clim = self._clim.get(src)
+        if clim is None or not set(windows) <= set(clim.windows):
+            saved = SPIClimatology.load(self.clim_path) if self.clim_path else None
+            if saved is not None and saved.rain_col == src and set(windows) <= set(saved.windows):
+                clim = saved
+            else:
+                clim = SPIClimatology.fit(idx.dense(src), idx.month_min, idx.woreda_names, windows, rain_col=src)
+            self._clim[src] = clim
+        return clim
+
+    def fit_climatology(self, df: pd.DataFrame) -> int:
+        """Fit (and save) the SPI climatology of every spi input from full history; returns cells fitted."""
+        idx = PanelIndex(df, woreda_col=self.key_col, date_col=self.date_col, region_col=None)
+        fitted = 0
+        for src, windows in self._spi_windows(idx).items():
+            clim = SPIClimatology.fit(idx.dense(src), idx.month_min, idx.woreda_names, windows, rain_col=src)
+            if self.clim_path:
+                clim.save(self.clim_path)
+            self._clim[src] = clim
+            fitted += int(np.isfinite(clim.shape).sum())
+        return fitted
+
+    def _spi_windows(self, idx: PanelIndex) -> dict:
+        out = {}
+        for op, src, window in self.specs.values():
+            if op == "spi" and src in idx.frame.columns:
+                out.setdefault(src, []).append(window)
+        return {src: tuple(sorted(set(w))) for src, w in out.items()}
+
+    @property
+    def lookback(self) -> int:
+        return max((lookback(op, w) for op, _, w in self.specs.values()), default=0)
+
+    def inputs(self) -> list:
+        return list(dict.fromkeys(src for _, src, _ in self.specs.values()))
+
+    def apply(self, df: pd.DataFrame, months=None) -> pd.DataFrame:
+        """Rows of df (sorted by woreda, month) with derived columns recomputed.
+
+        If `months` (month ordinals) is given, only rows in those months are returned.
+        Specs whose input column is absent leave their output column untouched.
+        """
+        idx = PanelIndex(df, woreda_col=self.key_col, date_col=self.date_col, region_col=None)
+        out = idx.frame.copy()
+        spi = {}
+        for src, windows in self._spi_windows(idx).items():
+            clim = self.climatology(src, idx, windows)
+            spi[src] = dict(zip(windows, clim.transform(idx.dense(src), idx.month_min, idx.woreda_names, windows)))
+        for name, (op, src, window) in self.specs.items():
+            if src not in out.columns:
+                continue
+            if op == "spi":
+                out[name] = idx.gather(spi[src][window])
+            else:
+                out[name] = idx.gather(derive(idx.dense(src), op, window))
+        if months is not None:
+            out = out[np.isin(idx.month, np.asarray(list(months)))].reset_index(drop=True)
+        return out
+
+    def affected(self, new_months) -> np.ndarray:
+        """Month ordinals whose derived values can change when `new_months` change."""
+        new = np.unique(np.asarray(list(new_months), dtype="int64"))
+        return np.unique((new[:, None] + np.arange(self.lookback + 1)[None, :]).ravel())
+
+
+# -----------------------------
+# Versioned store
+def store_versions(root: str = STORE_PATH) -> list:
+    return sorted(int(p.name.split("=", 1)[1]) for p in Path(root).glob("version=*") if p.is_dir())
+
+
+def store_version(root: str = STORE_PATH) -> str:
+    """Cache key that changes whenever a version is added."""
+    v = store_versions(root)
+    return f"{Path(root).name}:v{v[-1] if v else 0}"
+
+
+def _open(root: str) -> ds.Dataset:
+    partitioning = ds.partitioning(VERSION_SCHEMA, flavor="hive")
+    dataset = ds.dataset(root, format="parquet", partitioning=partitioning)
+    # Patch versions can add columns: read with the union of every file's schema
+    schema = pa.unify_schemas([f.physical_schema for f in dataset.get_fragments()] + [VERSION_SCHEMA])
+    return ds.dataset(root, format="parquet", partitioning=partitioning, schema=schema)
+
+
+def read_features(path=STORE_PATH, start=None, columns=None) -> pd.DataFrame:
+    """Feature panel from a flat Parquet file or a versioned store (newest version of each row wins).
+
+    `start` (a date) pushes a month filter into the scan, so appends read only the history they need.
+    """
+    path = Path(path)
+    if not path.is_dir():
+        df = pd.read_parquet(path, columns=columns)
+        return df if start is None else df[df[DATE_COL] >= pd.Timestamp(start)].reset_index(drop=True)
+    dataset = _open(str(path))
+    flt = ds.field(DATE_COL) >= pa.scalar(pd.Timestamp(start).to_pydatetime(), type=dataset.schema.field(DATE_COL).type) \
+        if start is not None else None
+    cols = None if columns is None else list(dict.fromkeys(list(columns) + [KEY_COL, DATE_COL, "version"]))
+    df = dataset.to_table(filter=flt, columns=cols).to_pandas()
+    df = df.sort_values("version", kind="stable").drop_duplicates([KEY_COL, DATE_COL], keep="last")
+    df = df.sort_values([KEY_COL, DATE_COL], ignore_index=True).drop(columns="version")
+    return df if columns is None else df[[c for c in columns if c in df.columns]]
+
+
+def _write_version(df: pd.DataFrame, root: str, version: int, schema: pa.Schema | None = None) -> int:
+    table = pa.Table.from_pandas(df.assign(version=np.int32(version)), preserve_index=False)
+    if schema is not None:
+        for f in schema:
+            if f.name not in table.column_names:
+                table = table.append_column(f.name, pa.nulls(table.num_rows, f.type))
+        extra = [n for n in table.column_names if n not in schema.names]
+        table = table.select(schema.names + extra).cast(pa.schema(list(schema) + [table.schema.field(n) for n in extra]))
+    ds.write_dataset(table, root, format="parquet",
+                     partitioning=ds.partitioning(VERSION_SCHEMA, flavor="hive"),
+                     basename_template=f"part-{version:05d}-{{i}}.parquet",
+                     existing_data_behavior="overwrite_or_ignore")
+    return table.num_rows
+
+
+def init_store(src, root: str = STORE_PATH, pipeline: FeaturePipeline | None = None) -> int:
+    """Seed the store (version 1) from a flat feature file, recomputing the derived columns."""
+    if store_versions(root):
+        raise FileExistsError(f"feature store already exists: {root}")
+    pipeline = pipeline or FeaturePipeline()
+    df = pd.read_parquet(src)
+    pipeline.fit_climatology(df)
+    return _write_version(pipeline.apply(df), root, 1)
+
+
+def append_months(new_rows: pd.DataFrame, root: str = STORE_PATH, pipeline: FeaturePipeline | None = None,
+                  patch: bool = False) -> tuple:
+    """Add (or revise) woreda-months and write the affected rows as a new version.
+
+    Only the months from `lookback` before the first new month onward are read; derived
+    columns are recomputed for the new months and the months whose windows reach them.
+    With patch=True only the columns present in new_rows are overwritten on existing rows.
+    Returns (version, rows written).
+    """
+    pipeline = pipeline or FeaturePipeline()
+    versions = store_versions(root)
+    if not versions:
+        raise FileNotFoundError(f"no feature store at {root}; run init first")
+    new_rows = new_rows.copy()
+    new_rows[DATE_COL] = pd.to_datetime(new_rows[DATE_COL])
+    new_months = month_ordinal(new_rows[DATE_COL])
+    first = int(new_months.min())
+    since = pd.Timestamp(year=(first - pipeline.lookback) // 12, month=(first - pipeline.lookback) % 12 + 1, day=1)
+    hist = read_features(root, start=since)
+    if patch:
+        cols = [c for c in new_rows.columns if c not in (KEY_COL, DATE_COL)]
+        combined = hist.merge(new_rows, on=[KEY_COL, DATE_COL], how="outer", suffixes=("", "_new"), indicator=True)
+        has_new = combined.pop("_merge").to_numpy() != "left_only"
+        for c in cols:
+            if c + "_new" in combined.columns:
+                combined[c] = combined.pop(c + "_new").where(has_new, combined[c])
+    else:
+        combined = pd.concat([hist, new_rows], ignore_index=True)
+        combined = combined.drop_duplicates([KEY_COL, DATE_COL], keep="last")
+    tail = pipeline.apply(combined, months=pipeline.affected(new_months))
+    schema = _open(root).schema
+    version = versions[-1] + 1
+    return version, _write_version(tail, root, version, schema)
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1]
+    root = sys.argv[3] if len(sys.argv) > 3 else STORE_PATH
+    if cmd == "init":
+        n = init_store(sys.argv[2], root)
+        print(f"✅ {root} version 1: {n} rows")
+    elif cmd == "append":
+        src = sys.argv[2]
+        new = pd.read_csv(src) if src.lower().endswith(".csv") else pd.read_parquet(src)
+        v, n = append_months(new, root)
+        print(f"✅ {root} version {v}: {n} rows (new months and the tail rows they affect)")
+    elif cmd == "export":
+        df = read_features(root)
+        df.to_parquet(sys.argv[2], index=False)
+        print(f"✅ {len(df)} rows -> {sys.argv[2]}")
@@ -0,0 +1,469 @@
+# forecast.py
+# Batch forecasts for every woreda at once from woreda_month_features.
+# The target and drivers are laid out as dense woreda x month arrays; each model fits
+# all woredas together:
+#   seasonal_naive  same calendar month last year (last value if there is no year of history)
+#   ets             damped-trend, additive-seasonal exponential smoothing; parameters picked
+#                   per woreda from a grid evaluated for all woredas and grid points in one pass
+#   regression      direct per-horizon ridge regression on lagged target, drivers and season,
+#                   solved as a batch of small normal-equation systems
+# Every series of the woreda -> region -> national hierarchy gets base forecasts, which
+# are then reconciled into coherent totals (reconcile.py).
+# Large panels are split into woreda chunks over a process pool. Results are cached on
+# disk per data version, and the CLI rewrites the forecasts_{woreda,region,national}_<stamp>.csv
+# files the dashboard used to ship.
+#
+#   python forecast.py [woreda_month_features_v2.parquet] [horizon] [bottom_up|top_down|mint]
+
+import copy
+import hashlib
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from features import STORE_PATH, read_features, store_version
+from panel_index import PanelIndex, ordinal_to_timestamp
+from reconcile import METHODS, Hierarchy
+
+# -----------------------------
+# Settings
+# Versioned feature store (features.py) when it has been built, else the flat file
+FEATURES_PATH = STORE_PATH if Path(STORE_PATH).is_dir() else "woreda_month_features_v2.parquet"
+REGIONS_CSV = "summary data _forcast.csv"
+CACHE_DIR = "forecast_cache"
+TARGET = "GAM"
+DRIVERS = ("X_2017.5screened.acute.malnutrition", "n_facilities_reporting", "low_reporting",
+           "monthly_rain", "rfq_mean", "conflict_events")
+MODELS = ("seasonal_naive", "ets", "regression")
+HORIZON = 2
+SEASON = 12
+LEVEL = 0.8                       # prediction interval coverage
+RECONCILE = "mint"                # bottom_up, top_down or mint (see reconcile.py)
+
+# ETS grid: level smoothing, share of the level correction passed to the trend, seasonal
+# smoothing, damping
+ETS_ALPHAS = np.round(np.arange(0.05, 1.0, 0.1), 2)
+ETS_BETAS = (0.0, 0.05, 0.1, 0.2)
+ETS_GAMMAS = (0.0, 0.1, 0.3)
+ETS_PHIS = (0.8, 0.9, 0.98)
+RIDGE = 1.0
+MIN_TRAIN = 12                    # regression rows needed per woreda and horizon beyond its fitted columns
+
+# Below this many woreda x month x grid cells everything runs in-process
+POOL_MIN_WORK = 5_000_000
+
+
+# -----------------------------
+# Panel
+class ForecastPanel:
+    """Target and drivers as dense woreda x month arrays over a common month axis."""
+
+    def __init__(self, df: pd.DataFrame, target: str = TARGET, drivers=DRIVERS,
+                 woreda_col: str = "woreda_key", date_col: str = "ym", regions: dict | None = None,
+                 trim_unreported: bool = True):
+        data = df.copy()
+        data[woreda_col] = data[woreda_col].astype("string").str.strip().str.lower()
+        idx = PanelIndex(data, woreda_col=woreda_col, date_col=date_col, region_col=None)
+        self.woredas = idx.woreda_names
+        self.month_min, self.n_months = idx.month_min, idx.n_months
+        self.target = target
+        self.y = idx.dense(target)                                             # W x T
+        # Drivers with no values at all would only add dead columns to the regression
+        self.drivers = [d for d in drivers if d in idx.columns
+                        and pd.to_numeric(idx.frame[d], errors="coerce").notna().any()]
+        self.X = np.stack([idx.dense(d) for d in self.drivers]) if self.drivers \
+            else np.empty((0,) + self.y.shape)                                  # D x W x T
+        if trim_unreported:
+            # Leading / trailing months where every woreda's target is 0 or missing are before
+            # reporting started or not reported yet
+            reported = np.flatnonzero((np.nan_to_num(self.y) != 0).any(axis=0))
+            lo, hi = (int(reported[0]), int(reported[-1]) + 1) if len(reported) else (0, self.n_months)
+            self.y, self.X = self.y[:, lo:hi], self.X[:, :, lo:hi]
+            self.month_min, self.n_months = self.month_min + lo, hi - lo
+            # A woreda's zeros before its own first report are missing, not observed
+            started = np.cumsum(np.nan_to_num(self.y) != 0, axis=1) > 0
+            self.y = np.where(started, self.y, np.nan)
+        self.regions = self._regions(idx, regions or {})
+
+    def _regions(self, idx: PanelIndex, regions: dict) -> np.ndarray:
+        """Region per woreda: explicit mapping, else ADM1 prefix of ADM2_PCODE, else 'unassigned'."""
+        out = np.array([regions.get(w) for w in self.woredas], dtype=object)
+        if "ADM2_PCODE" in idx.columns:
+            codes = idx.frame["ADM2_PCODE"].astype("string").str.strip().str.upper()
+            codes = codes.mask(codes.isin(["", "NAN", "NONE"]))
+            first = codes.groupby(idx.row_woreda).first().reindex(range(len(self.woredas)))
+            pref = first.str[:4].to_numpy(dtype=object)
+            out = np.where(pd.isna(out), pref, out)
+        return np.where(pd.isna(out), "unassigned", out).astype(object)
+
+    @property
+    def months(self) -> pd.DatetimeIndex:
+        return ordinal_to_timestamp(np.arange(self.month_min, self.month_min + self.n_months))
+
+    def future_months(self, horizon: int) -> pd.DatetimeIndex:
+        return ordinal_to_timestamp(np.arange(self.month_min + self.n_months, self.month_min + self.n_months + horizon))
+
+    def hierarchy(self) -> Hierarchy:
+        return Hierarchy(self.woredas, self.regions)
+
+    def stacked(self, hier: Hierarchy) -> "ForecastPanel":
+        """Copy with one series per hierarchy row (national, regions, woredas): target sums, driver means."""
+        out = copy.copy(self)
+        out.y = hier.aggregate(self.y)
+        out.X = np.stack([hier.aggregate(x, how="mean") for x in self.X]) if len(self.X) \
+            else np.empty((0,) + out.y.shape)
+        out.woredas, out.regions = hier.names, hier.region_of
+        return out
+
+
+def region_map(df: pd.DataFrame | None) -> dict:
+    """woreda -> region from any frame with 'woreda' and 'region' columns (lower-cased)."""
+    if df is None or not {"woreda", "region"} <= set(df.columns):
+        return {}
+    pairs = df[["woreda", "region"]].dropna().astype(str)
+    return dict(zip(pairs["woreda"].str.strip().str.lower(), pairs["region"].str.strip().str.lower()))
+
+
+# -----------------------------
+# Models (all woredas at once; y is W x T)
+def seasonal_naive(y: np.ndarray, horizon: int, season: int = SEASON):
+    """Point forecasts (W x H) and one-step scale (W) from the same month one season back."""
+    W, T = y.shape
+    last = _last_observed(y)
+    steps = np.arange(1, horizon + 1)
+    src = T - season + (steps - 1) % season
+    point = np.where(src >= 0, y[:, np.clip(src, 0, None)], np.nan)
+    point = np.where(np.isfinite(point), point, last[:, None])
+    with np.errstate(all="ignore"):
+        diff = y[:, season:] - y[:, :-season] if T > season else np.diff(y, axis=1)
+        scale = np.sqrt(np.nanmean(diff ** 2, axis=1)) if diff.size else np.full(W, np.nan)
+    # Error grows with the number of seasons ahead
+    sigma = scale[:, None] * np.sqrt((steps - 1) // season + 1)[None, :]
+    return point, sigma
+
+
+def _last_observed(y: np.ndarray) -> np.ndarray:
+    ok = np.isfinite(y)
+    pos = np.where(ok.any(axis=1), y.shape[1] - 1 - np.argmax(ok[:, ::-1], axis=1), -1)
+    return np.where(pos >= 0, y[np.arange(len(y)), np.clip(pos, 0, None)], np.nan)
+
+
+def ets_filter(y: np.ndarray, params: dict, state: dict | None = None, month0: int = 0) -> dict:
+    """Run damped-trend, additive-seasonal smoothing over y (W x T); returns the end state.
+
+    `params` holds alpha / beta / gamma / phi, per woreda (W) or per woreda and grid
+    point (W x G, or 1 x G to share a grid). Missing months carry the state forward; a
+    woreda's first observation initialises its level. Passing the returned state back in
+    (with month0 = the month ordinal of y's first column) continues the filter.
+    """
+    alpha, beta, gamma, phi = (np.asarray(params[k], dtype="float64") for k in ("alpha", "beta", "gamma", "phi"))
+    nd = max(alpha.ndim, beta.ndim, gamma.ndim, phi.ndim, 1)
+    shape = np.broadcast_shapes(alpha.shape, beta.shape, gamma.shape, phi.shape, (len(y),) + (1,) * (nd - 1))
+    if state is None:
+        season0 = ets_init_season(y, month0)[(slice(None),) + (None,) * (len(shape) - 1)]
+        state = {"level": np.full(shape, np.nan), "trend": np.zeros(shape),
+                 "season": np.broadcast_to(season0, shape + (SEASON,)),
+                 "sse": np.zeros(shape), "n": np.zeros(shape)}
+    level, trend, sse, n = (state[k].copy() for k in ("level", "trend", "sse", "n"))
+    season = state["season"].copy()
+    col = (slice(None),) + (None,) * (len(shape) - 1)
+    for t in range(y.shape[1]):
+        m = (month0 + t) % SEASON
+        yt = y[:, t][col]
+        seen = np.isfinite(yt)
+        start = seen & ~np.isfinite(level)
+        base = level + phi * trend
+        e = np.where(seen & ~start, yt - base - season[..., m], 0.0)
+        level = np.where(start, yt - season[..., m], np.where(np.isfinite(level), base + alpha * e, level))
+        trend = np.where(start, 0.0, phi * trend + alpha * beta * e)
+        season[..., m] += gamma * (1 - alpha) * e
+        sse += e * e
+        n += seen & ~start
+    return {"level": level, "trend": trend, "season": season, "sse": sse, "n": n}
+
+
+def ets_init_season(y: np.ndarray, month0: int = 0, n_seasons: int = 2) -> np.ndarray:
+    """Starting seasonal offsets (W x 12): mean deviation from the woreda mean per calendar
+    month over the first `n_seasons` years, centred; 0 where a month was never seen."""
+    head = y[:, :SEASON * n_seasons]
+    with np.errstate(all="ignore"):
+        dev = head - np.nanmean(head, axis=1, keepdims=True)
+    out = np.zeros((len(y), SEASON))
+    cnt = np.zeros((len(y), SEASON))
+    months = (month0 + np.arange(head.shape[1])) % SEASON
+    ok = np.isfinite(dev)
+    np.add.at(out.T, months, np.where(ok, dev, 0.0).T)
+    np.add.at(cnt.T, months, ok.T)
+    with np.errstate(all="ignore"):
+        out = np.where(cnt > 0, out / cnt, 0.0)
+    return out - out.mean(axis=1, keepdims=True)
+
+
+def ets_forecast(state: dict, params: dict, month_next: int, horizon: int):
+    """Point forecasts and h-step standard deviations (W x H) from a filtered state.
+
+    month_next is the month ordinal of the first forecast month.
+    """
+    alpha, beta, phi = params["alpha"][:, None], params["beta"][:, None], params["phi"][:, None]
+    steps = np.arange(1, horizon + 1)
+    damp = np.cumsum(phi ** steps[None, :], axis=1)                            # phi + ... + phi^h
+    point = state["level"][:, None] + damp * state["trend"][:, None] \
+        + state["season"][:, (month_next + steps - 1) % SEASON]
+    with np.errstate(all="ignore"):
+        sigma1 = np.sqrt(state["sse"] / np.maximum(state["n"] - 1, 1))
+        # Variance multiplier 1 + sum_{j<h} c_j^2, c_j = alpha (1 + beta (phi + ... + phi^j))
+        c = alpha * (1 + beta * damp)
+        mult = 1 + np.concatenate([np.zeros((len(point), 1)), np.cumsum(c ** 2, axis=1)[:, :-1]], axis=1)
+    return point, sigma1[:, None] * np.sqrt(mult)
+
+
+def fit_ets(y: np.ndarray, month0: int) -> tuple:
+    """Grid-search the smoothing parameters for every woreda at once by one-step SSE.
+
+    Returns (params, state), each a dict of per-woreda arrays.
+    """
+    grid = [g.ravel()[None, :] for g in np.meshgrid(ETS_ALPHAS, ETS_BETAS, ETS_GAMMAS, ETS_PHIS, indexing="ij")]
+    names = ("alpha", "beta", "gamma", "phi")
+    state = ets_filter(y, dict(zip(names, grid)), month0=month0)
+    best = np.argmin(np.where(state["n"] > 0, state["sse"], np.inf), axis=1)
+    w = np.arange(len(y))
+    params = {k: g[0, best] for k, g in zip(names, grid)}
+    return params, {k: v[w, best] for k, v in state.items()}
+
+
+def _season_terms(months: np.ndarray) -> np.ndarray:
+    """sin / cos of the calendar month for month ordinals (... x 2)."""
+    ang = 2 * np.pi * (np.asarray(months) % 12) / 12
+    return np.stack([np.sin(ang), np.cos(ang)], axis=-1)
+
+
+def regression_design(y: np.ndarray, X: np.ndarray, month_min: int, h: int) -> np.ndarray:
+    """Rows for origin t (W x T x K): 1, y_t, y_{t-1}, same month a year before t+h, drivers_t, season of t+h."""
+    W, T = y.shape
+
+    def lag(a, k):
+        return np.pad(a, ((0, 0), (k, 0)), constant_values=np.nan)[:, :T]
+
+    # Drivers: fill gaps with the woreda mean so a missing driver does not drop the row
+    ok = np.isfinite(X)
+    with np.errstate(all="ignore"):
+        fill = np.where(ok, X, 0.0).sum(axis=2, keepdims=True) / ok.sum(axis=2, keepdims=True)
+    drv = np.nan_to_num(np.where(ok, X, fill), nan=0.0)
+    season = np.broadcast_to(_season_terms(month_min + np.arange(T) + h)[None], (W, T, 2))
+    cols = [np.ones((W, T)), y, lag(y, 1), lag(y, SEASON * -(-h // SEASON) - h)] + list(drv)
+    return np.concatenate([np.stack(cols, axis=-1), season], axis=-1)
+
+
+def fit_regression(y: np.ndarray, X: np.ndarray, month_min: int, horizon: int, t_end: int | None = None) -> dict:
+    """Per woreda and horizon ridge coefficients on origins before t_end (default: all usable).
+
+    Returns coef (H x W x K), column mean / scale used for standardising, residual sigma (H x W)
+    and the number of training rows. A woreda and horizon is fitted only with at least
+    MIN_TRAIN rows more than its non-constant columns; otherwise coef and sigma are NaN.
+    """
+    W, T = y.shape
+    t_end = T if t_end is None else t_end
+    H = horizon
+    K = 6 + len(X)
+    out = {"coef": np.full((H, W, K), np.nan), "mu": np.zeros((H, W, K)), "sd": np.ones((H, W, K)),
+           "sigma": np.full((H, W), np.nan), "n": np.zeros((H, W), dtype="int64")}
+    for h in range(1, H + 1):
+        Z = regression_design(y, X, month_min, h)[:, :max(t_end - h, 0)]     # origins with a target
+        target = y[:, h:t_end]
+        m = np.isfinite(target) & np.isfinite(Z).all(axis=2)
+        cnt = m.sum(axis=1)
+        with np.errstate(all="ignore"):
+            mu = (np.where(m[..., None], Z, 0.0)).sum(axis=1) / cnt[:, None]
+            var = (np.where(m[..., None], (Z - mu[:, None]) ** 2, 0.0)).sum(axis=1) / cnt[:, None]
+        sd = np.sqrt(var)
+        const = ~(sd > 1e-9)
+        mu[:, 0], sd[:, 0] = 0.0, 1.0                                          # intercept column
+        const[:, 0] = False
+        mu, sd = np.where(const, 0.0, mu), np.where(const, 1.0, sd)
+        Zs = np.where(m[..., None] & ~const[:, None, :], (np.nan_to_num(Z) - mu[:, None]) / sd[:, None], 0.0)
+        Zs[..., 0] = m
+        yv = np.where(m, target, 0.0)
+        A = np.einsum("wnk,wnl->wkl", Zs, Zs)
+        pen = np.full(K, RIDGE)
+        pen[0] = 0.0
+        A = A + pen[None, :, None] * np.eye(K)[None] + np.eye(K)[None] * 1e-9
+        coef = np.linalg.solve(A, np.einsum("wnk,wn->wk", Zs, yv)[..., None])[..., 0]
+        resid = np.where(m, yv - np.einsum("wnk,wk->wn", Zs, coef), 0.0)
+        k_eff = (~const).sum(axis=1)                                           # intercept + varying columns
+        ok = cnt >= k_eff + MIN_TRAIN
+        with np.errstate(all="ignore"):
+            sigma = np.sqrt((resid ** 2).sum(axis=1) / np.maximum(cnt - k_eff, 1))
+        out["coef"][h - 1] = np.where(ok[:, None], coef, np.nan)
+        out["mu"][h - 1], out["sd"][h - 1] = mu, sd
+        out["sigma"][h - 1] = np.where(ok, sigma, np.nan)
+        out["n"][h - 1] = cnt
+    return out
+
+
+def regression_forecast(fit: dict, y: np.ndarray, X: np.ndarray, month_min: int, origin: int):
+    """Point forecasts and sigmas (W x H) from origin month index `origin` (last observed month)."""
+    H, W, K = fit["coef"].shape
+    point = np.full((W, H), np.nan)
+    for h in range(1, H + 1):
+        z = regression_design(y[:, :origin + 1], X[:, :, :origin + 1], month_min, h)[:, origin]
+        zs = (z - fit["mu"][h - 1]) / fit["sd"][h - 1]
+        zs[:, 0] = 1.0
+        point[:, h - 1] = np.einsum("wk,wk->w", zs, fit["coef"][h - 1])
+    return point, fit["sigma"].T.copy()
+
+
+# -----------------------------
+# Batch driver
+def fit_chunk(y: np.ndarray, X: np.ndarray, month_min: int, horizon: int, models=MODELS) -> dict:
+    """All requested models for one block of woredas: {model: (point W x H, sigma W x H, state)}."""
+    out = {}
+    naive = seasonal_naive(y, horizon)
+    if "seasonal_naive" in models:
+        out["seasonal_naive"] = naive + (None,)
+    if "ets" in models:
+        params, st = fit_ets(y, month_min)
+        point, sigma = ets_forecast(st, params, month_min + y.shape[1], horizon)
+        out["ets"] = (point, sigma, {**params, **st})
+    if "regression" in models:
+        st = fit_regression(y, X, month_min, horizon)
+        point, sigma = regression_forecast(st, y, X, month_min, y.shape[1] - 1)
+        # Too little history for a regression: fall back to the seasonal naive forecast
+        short = ~(np.isfinite(point) & np.isfinite(sigma))
+        point, sigma = np.where(short, naive[0], point), np.where(short, naive[1], sigma)
+        out["regression"] = (point, sigma, st)
+    return out
+
+
+def _concat_chunks(parts: list, models) -> dict:
+    out = {}
+    for m in models:
+        pts, sig, states = zip(*[p[m] for p in parts])
+        if states[0] is None:
+            state = None
+        else:
+            # ETS state arrays are W-first; regression arrays are H x W x ...
+            axis = 0 if m == "ets" else 1
+            state = {k: np.concatenate([s[k] for s in states], axis=axis) for k in states[0]}
+        out[m] = (np.concatenate(pts), np.concatenate(sig), state)
+    return out
+
+
+def fit_all(panel: ForecastPanel, horizon: int = HORIZON, models=MODELS, n_jobs: int | None = None) -> dict:
+    """Fit every model for every woreda; woreda chunks go to a process pool on large panels."""
+    models = [m for m in models if m in MODELS]
+    W, T = panel.y.shape
+    n_jobs = n_jobs or os.cpu_count() or 1
+    work = W * T * len(ETS_ALPHAS) * len(ETS_BETAS) * len(ETS_GAMMAS) * len(ETS_PHIS)
+    chunks = [c for c in np.array_split(np.arange(W), n_jobs) if len(c)]
+    args = [(panel.y[c], panel.X[:, c], panel.month_min, horizon, tuple(models)) for c in chunks]
+    if len(chunks) > 1 and work >= POOL_MIN_WORK:
+        try:
+            with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+                parts = list(pool.map(fit_chunk, *zip(*args)))
+        except (OSError, RuntimeError):
+            parts = [fit_chunk(*a) for a in args]
+    else:
+        parts = [fit_chunk(panel.y, panel.X, panel.month_min, horizon, tuple(models))]
+    return _concat_chunks(parts, models)
+
+
+def forecast_frames(hier: Hierarchy, dates, fits: dict, level: float = LEVEL, method: str = RECONCILE,
+                    history: np.ndarray | None = None) -> dict:
+    """Long woreda / region / national tables: date, horizon, model, forecast, lower, upper.
+
+    `fits` holds base forecasts for every series of `hier` (national, regions, woredas).
+    They are reconciled so woredas add up to their region and regions to the nation
+    (mint weights are the one-step error variances); negative woreda forecasts are then
+    set to 0 and re-summed. Intervals keep each series' base sigma around the reconciled point.
+    """
+    z = NormalDist().inv_cdf(0.5 + level / 2)
+    fallback = fits["seasonal_naive"][0] if "seasonal_naive" in fits else None
+    n = len(hier)
+    rows = []
+    for model, (point, sigma, _) in fits.items():
+        H = point.shape[1]
+        # Series a model could not fit fall back to the seasonal naive forecast
+        base = np.where(np.isfinite(point), point, fallback if fallback is not None else np.nan)
+        rec = hier.reconcile(np.nan_to_num(base), method, weights=sigma[:, 0] ** 2, history=history)
+        rec = hier.S @ np.clip(rec[hier.n_aggregate:], 0, None)
+        rows.append(pd.DataFrame({
+            "level": np.repeat(hier.levels, H), "region": np.repeat(hier.region_of, H),
+            "woreda": np.repeat(hier.names, H), "date": np.tile(dates[:H], n),
+            "horizon": np.tile(np.arange(1, H + 1), n), "model": model, "forecast": rec.ravel(),
+            "lower": np.clip(rec - z * sigma, 0, None).ravel(), "upper": (rec + z * sigma).ravel(),
+        }))
+    allf = pd.concat(rows, ignore_index=True) if rows else pd.DataFrame(
+        columns=["level", "region", "woreda", "date", "horizon", "model", "forecast", "lower", "upper"])
+    allf = allf.round({"forecast": 1, "lower": 1, "upper": 1})
+    keep = {"woreda": ["region", "woreda"], "region": ["region"], "national": []}
+    return {lvl: allf.loc[allf["level"] == lvl, cols + ["date", "horizon", "model", "forecast", "lower", "upper"]]
+            .reset_index(drop=True) for lvl, cols in keep.items()}
+
+
+# -----------------------------
+# Cached entry point
+def data_version(path) -> str:
+    p = Path(path)
+    return store_version(p) if p.is_dir() else f"{p.name}:{p.stat().st_mtime_ns}"
+
+
+def regions_key(regions: dict | None) -> str:
+    """Short hash of a woreda -> region mapping, so cached results follow mapping changes."""
+    items = "\n".join(f"{w}={r}" for w, r in sorted((regions or {}).items()))
+    return hashlib.blake2b(items.encode(), digest_size=6).hexdigest()
+
+
+def load_regions(regions: dict | None = None) -> dict:
+    """The given mapping, else the one read from REGIONS_CSV (empty if there is none)."""
+    if regions:
+        return regions
+    return region_map(pd.read_csv(REGIONS_CSV)) if Path(REGIONS_CSV).exists() else {}
+
+
+def cache_path(path, horizon: int, models, method: str = RECONCILE, cache_dir: str = CACHE_DIR,
+               regions: dict | None = None) -> Path:
+    key = hashlib.blake2b(f"{data_version(path)}|{TARGET}|{','.join(DRIVERS)}|{horizon}|{','.join(models)}|{method}|"
+                          f"{regions_key(regions)}".encode(), digest_size=8).hexdigest()
+    return Path(cache_dir) / f"{Path(path).stem}.{key}.parquet"
+
+
+def run_forecasts(path=FEATURES_PATH, horizon: int = HORIZON, models=MODELS, regions: dict | None = None,
+                  method: str = RECONCILE, n_jobs: int | None = None, cache_dir: str | None = CACHE_DIR) -> dict:
+    """Coherent woreda / region / national forecast tables for a feature file, cached per data version."""
+    models = tuple(models)
+    if method not in METHODS:
+        raise ValueError(f"unknown reconciliation method: {method}")
+    regions = load_regions(regions)
+    cached = cache_path(path, horizon, models, method, cache_dir, regions) if cache_dir else None
+    if cached is not None and cached.exists():
+        allf = pd.read_parquet(cached)
+        return {lvl: g.drop(columns="level").dropna(axis=1, how="all").reset_index(drop=True)
+                for lvl, g in allf.groupby("level", sort=False)}
+    panel = ForecastPanel(read_features(path), regions=regions)
+    hier = panel.hierarchy()
+    fits = fit_all(panel.stacked(hier), horizon, models, n_jobs)
+    frames = forecast_frames(hier, panel.future_months(horizon), fits, method=method, history=panel.y)
+    if cached is not None:
+        try:
+            cached.parent.mkdir(parents=True, exist_ok=True)
+            pd.concat([f.assign(level=lvl) for lvl, f in frames.items()], ignore_index=True).to_parquet(cached, index=False)
+        except OSError:
+            pass
+    return frames
+
+
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else FEATURES_PATH
+    horizon = int(sys.argv[2]) if len(sys.argv) > 2 else HORIZON
+    method = sys.argv[3] if len(sys.argv) > 3 else RECONCILE
+    frames = run_forecasts(src, horizon, method=method, cache_dir=None)
+    stamp = pd.Timestamp.now().strftime("%Y_%m_%d")
+    for lvl, f in frames.items():
+        f.to_csv(f"forecasts_{lvl}_{stamp}.csv", index=False)
+    print(f"✅ {frames['woreda']['woreda'].nunique()} woredas × {horizon} months × "
+          f"{frames['woreda']['model'].nunique()} models -> forecasts_{{woreda,region,national}}_{stamp}.csv")
@@ -1,14 +1,80 @@
+import sys
+from pathlib import Path
+
 import geopandas as gpd
+import shapely
 
 # --- Step 1: Point this to your local shapefile (inside the unzipped folder)
 # Example: "C:/Users/PC/Downloads/ethiopia_woreda/ETH_adm3_woreda.shp"
 shapefile_path = r"D:/VS/Eth_Woreda_2013.shp"
+output_path = "D:/VS/ethiopia_woredas.geojson"
 
-# --- Step 2: Read the shapefile
-gdf = gpd.read_file(shapefile_path)
+# --- Boundary cache: pre-simplified copies of the woreda layer, one GeoParquet per level.
+# Build once with:  python geolocation.py [shapefile_or_geojson]
+BOUNDARY_CACHE = "boundary_cache"
+# level -> (simplification tolerance in degrees, lowest map zoom the level is used from)
+BOUNDARY_LEVELS = {
+    "coarse": (0.01, 0),
+    "medium": (0.002, 8),
+    "fine": (0.0005, 10),
+}
 
-# --- Step 3: Save as GeoJSON
-output_path = "D:/VS/ethiopia_woredas.geojson"
-gdf.to_file(output_path, driver="GeoJSON")
 
-print(f"✅ Saved GeoJSON to {output_path}")
+def simplify_boundaries(gdf: gpd.GeoDataFrame, tolerance: float) -> gpd.GeoDataFrame:
+    """Simplify polygons as a coverage so neighbouring woredas keep shared edges (no gaps/slivers)."""
+    out = gdf.copy()
+    try:
+        out["geometry"] = shapely.coverage_simplify(out.geometry.values, tolerance)
+    except Exception:
+        # Older GEOS or an invalid coverage: per-polygon, still topology-preserving
+        out["geometry"] = out.geometry.simplify(tolerance, preserve_topology=True)
+    # Snap to a grid well below the tolerance: shorter coordinates in the GeoJSON sent to the browser
+    out["geometry"] = shapely.set_precision(out.geometry.values, tolerance / 10)
+    return out
+
+
+def build_boundary_cache(gdf: gpd.GeoDataFrame, root: str = BOUNDARY_CACHE) -> dict:
+    """Write one simplified GeoParquet per level; returns {level: path}."""
+    gdf = gdf.to_crs(4326) if gdf.crs is not None else gdf.set_crs(4326)
+    gdf = gdf[~gdf.geometry.is_empty & gdf.geometry.notna()].reset_index(drop=True)
+    Path(root).mkdir(parents=True, exist_ok=True)
+    paths = {}
+    for level, (tolerance, _) in BOUNDARY_LEVELS.items():
+        path = Path(root) / f"woredas_{level}.parquet"
+        simplify_boundaries(gdf, tolerance).to_parquet(path, compression="zstd")
+        paths[level] = str(path)
+    return paths
+
+
+def available_levels(root: str = BOUNDARY_CACHE) -> list:
+    return [lvl for lvl in BOUNDARY_LEVELS if (Path(root) / f"woredas_{lvl}.parquet").exists()]
+
+
+def level_for_zoom(zoom: float, levels: list | None = None) -> str | None:
+    """Finest cached level whose minimum zoom is at or below the current map zoom (else the first level)."""
+    levels = levels if levels is not None else available_levels()
+    chosen = None
+    for lvl in levels:
+        if BOUNDARY_LEVELS[lvl][1] <= zoom or chosen is None:
+            chosen = lvl
+    return chosen
+
+
+def load_boundary_level(level: str, root: str = BOUNDARY_CACHE) -> gpd.GeoDataFrame:
+    return gpd.read_parquet(Path(root) / f"woredas_{level}.parquet")
+
+
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else shapefile_path
+
+    # --- Step 2: Read the shapefile
+    gdf = gpd.read_file(src)
+
+    # --- Step 3: Save as GeoJSON (only when converting the default shapefile)
+    if len(sys.argv) == 1:
+        gdf.to_file(output_path, driver="GeoJSON")
+        print(f"✅ Saved GeoJSON to {output_path}")
+
+    # --- Step 4: Build the multi-resolution boundary cache used by the dashboards
+    for level, path in build_boundary_cache(gdf).items():
+        print(f"✅ {level}: {path} ({Path(path).stat().st_size / 1e6:.2f} MB)")
@@ -0,0 +1,98 @@
+# lag_corr.py
+# Lagged correlations between a target and many drivers, for all lags at once.
+# Each driver is laid out as a dense woreda x month array; the lag axis is a strided
+# view over a NaN-padded copy (woreda x month x lag, no data copied), and Pearson
+# correlations come from per-woreda sufficient statistics summed over months, so the
+# pooled and per-woreda matrices fall out of the same pass.
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from panel_index import PanelIndex
+
+# Drivers offered for the lagged-correlation view, in display order
+LAG_DRIVERS = ("conflict_events_zone", "wrsi_value_leap", "SPI_1", "SPI_3",
+               "wrsI_roll3", "conflict_events_3m", "events_3m_sum", "ipc_value")
+
+
+def lag_tensor(x: np.ndarray, max_lag: int) -> np.ndarray:
+    """Read-only view [..., t, l] = x[..., t - l] for l = 0..max_lag (NaN before the first month)."""
+    pad = np.full(x.shape[:-1] + (max_lag,), np.nan, dtype=x.dtype)
+    windows = sliding_window_view(np.concatenate([pad, x], axis=-1), max_lag + 1, axis=-1)
+    return windows[..., ::-1]
+
+
+def _pearson(n, sx, sy, sxx, syy, sxy, min_obs: int) -> np.ndarray:
+    """Correlation from sums; NaN for fewer than min_obs pairs or a constant series."""
+    with np.errstate(all="ignore"):
+        vx = sxx - sx * sx / n
+        vy = syy - sy * sy / n
+        cov = sxy - sx * sy / n
+        r = cov / np.sqrt(vx * vy)
+    ok = (n >= min_obs) & (vx > 1e-12 * sxx) & (vy > 1e-12 * syy)
+    return np.where(ok, np.clip(r, -1.0, 1.0), np.nan)
+
+
+class LagCorrelations:
+    """Pooled (lag x feature) and per-woreda (feature x woreda x lag) correlations and pair counts.
+
+    `idx` is a PanelIndex or a PanelTensor (anything with dense(), columns and woreda_names).
+    """
+
+    def __init__(self, idx: PanelIndex, target: str, features, max_lag: int, min_obs: int = 3):
+        self.target = target
+        self.features = [f for f in features if f in idx.columns]
+        self.lags = np.arange(max_lag + 1)
+        self.woredas = idx.woreda_names
+        n_f, n_w, n_l = len(self.features), idx.n_woredas, len(self.lags)
+
+        y = idx.dense(target)
+        y = y - np.nanmean(y) if np.isfinite(y).any() else y
+        self.by_woreda = np.full((n_f, n_w, n_l), np.nan)
+        self.n_by_woreda = np.zeros((n_f, n_w, n_l), dtype="int64")
+        self.pooled = np.full((n_l, n_f), np.nan)
+        self.n_pooled = np.zeros((n_l, n_f), dtype="int64")
+
+        # One driver at a time keeps the temporaries at woreda x month x lag
+        for f, feat in enumerate(self.features):
+            x = idx.dense(feat)
+            if np.isfinite(x).any():
+                x = x - np.nanmean(x)
+            xl = lag_tensor(x, max_lag)                       # W x T x L
+            m = np.isfinite(xl) & np.isfinite(y)[..., None]
+            xv = np.where(m, xl, 0.0)
+            yv = np.where(m, y[..., None], 0.0)
+            sums = [m.sum(axis=1), xv.sum(axis=1), yv.sum(axis=1),
+                    (xv * xv).sum(axis=1), (yv * yv).sum(axis=1), (xv * yv).sum(axis=1)]
+            self.n_by_woreda[f] = sums[0]
+            self.by_woreda[f] = _pearson(*sums, min_obs=min_obs)
+            pooled = [s.sum(axis=0) for s in sums]
+            self.n_pooled[:, f] = pooled[0]
+            self.pooled[:, f] = _pearson(*pooled, min_obs=min_obs)
+
+    def pooled_table(self) -> pd.DataFrame:
+        """Lag x feature correlations pooled over all woreda-months."""
+        return pd.DataFrame(self.pooled, index=[f"Lag {l}" for l in self.lags], columns=self.features)
+
+    def woreda_table(self, feature: str) -> pd.DataFrame:
+        """Woreda x lag correlations for one feature."""
+        f = self.features.index(feature)
+        return pd.DataFrame(self.by_woreda[f], index=pd.Index(self.woredas, name="woreda"),
+                            columns=[f"Lag {l}" for l in self.lags])
+
+    def best_lags(self) -> pd.DataFrame:
+        """Per woreda and feature: the lag with the largest |r|, its r and pair count."""
+        rows = []
+        for f, feat in enumerate(self.features):
+            r = self.by_woreda[f]
+            has = np.isfinite(r).any(axis=1)
+            best = np.where(has, np.nanargmax(np.where(np.isfinite(r), np.abs(r), -1), axis=1), 0)
+            w = np.arange(len(self.woredas))
+            rows.append(pd.DataFrame({
+                "woreda": self.woredas, "feature": feat, "best_lag": self.lags[best],
+                "r": r[w, best], "n": self.n_by_woreda[f][w, best],
+            })[has])
+        if not rows:
+            return pd.DataFrame(columns=["woreda", "feature", "best_lag", "r", "n"])
+        return pd.concat(rows, ignore_index=True)
@@ -0,0 +1,81 @@
+# map_layers.py
+# Folium layers built from whole columns at once.
+# Points go out as a single GeoJSON FeatureCollection whose colour and popup live in
+# feature properties; the browser styles them with one small JS function, so there is
+# no per-marker Python object and no per-marker JS in the page.
+
+import numpy as np
+import pandas as pd
+import folium
+from folium.plugins import FastMarkerCluster
+from folium.utilities import JsCode
+
+QUANTILE_COLORS = np.array(["#ffffb2", "#fecc5c", "#fd8d3c", "#e31a1c"], dtype=object)
+MISSING_COLOR = "#bdbdbd"
+
+# Above this many points the layer switches to client-side clustering
+CLUSTER_THRESHOLD = 50_000
+
+_STYLE_JS = JsCode("function(f) { return {color: f.properties.c, fillColor: f.properties.c}; }")
+_POPUP_JS = JsCode("function(f, layer) { if (f.properties.p !== null) { layer.bindPopup(String(f.properties.p)); } }")
+_CLUSTER_JS = """
+function (row) {
+    var m = L.circleMarker(new L.LatLng(row[0], row[1]),
+        {radius: %d, color: row[2], fillColor: row[2], fillOpacity: 0.8, weight: 1});
+    m.bindPopup(String(row[3]));
+    return m;
+}
+"""
+
+
+def quantile_colors(values, quantiles=(0.1, 0.5, 0.9)) -> np.ndarray:
+    """Colour per value by quantile band (<= q10, <= q50, <= q90, above); grey for missing."""
+    vals = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype="float64")
+    out = np.full(len(vals), MISSING_COLOR, dtype=object)
+    ok = np.isfinite(vals)
+    if ok.any():
+        q = np.nanquantile(vals[ok], quantiles)
+        out[ok] = QUANTILE_COLORS[np.searchsorted(q, vals[ok], side="left")]
+    return out
+
+
+def point_layer(lat, lon, colors, popups=None, radius: int = 6,
+                name: str | None = None, cluster: bool | None = None):
+    """All points as one layer: a GeoJSON FeatureCollection, or FastMarkerCluster when very large."""
+    lat = np.asarray(lat, dtype="float64")
+    lon = np.asarray(lon, dtype="float64")
+    colors = np.broadcast_to(np.asarray(colors, dtype=object), lat.shape)
+    popups = np.full(lat.shape, None, dtype=object) if popups is None else np.asarray(popups, dtype=object)
+    ok = np.isfinite(lat) & np.isfinite(lon)
+    # 5 decimals is ~1 m; anything finer only inflates the page
+    lat, lon, colors, popups = lat[ok].round(5), lon[ok].round(5), colors[ok], popups[ok]
+    popups = [None if p is None else str(p) for p in popups.tolist()]
+
+    if cluster is None:
+        cluster = len(lat) > CLUSTER_THRESHOLD
+    if cluster:
+        data = list(zip(lat.tolist(), lon.tolist(), colors.tolist(), popups))
+        return FastMarkerCluster(data, callback=_CLUSTER_JS % radius, name=name)
+
+    features = [
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [x, y]}, "properties": {"c": c, "p": p}}
+        for y, x, c, p in zip(lat.tolist(), lon.tolist(), colors.tolist(), popups)
+    ]
+    return folium.GeoJson(
+        {"type": "FeatureCollection", "features": features},
+        name=name,
+        marker=folium.CircleMarker(radius=radius, fill=True, fill_opacity=0.8, weight=1),
+        on_each_feature=_POPUP_JS,
+        style=_STYLE_JS,
+    )
+
+
+def gdf_point_layer(gdf, value_col: str, colors=None, radius: int = 6, name: str | None = None):
+    """Point layer for a GeoDataFrame: points as-is, polygons at an interior point, coloured by quantile."""
+    geom = gdf.geometry
+    if not (geom.geom_type == "Point").all():
+        geom = geom.representative_point()  # always inside the polygon, unlike the centroid
+    vals = gdf[value_col] if value_col in gdf.columns else pd.Series(np.nan, index=gdf.index)
+    if colors is None:
+        colors = quantile_colors(vals)
+    return point_layer(geom.y.to_numpy(), geom.x.to_numpy(), colors, popups=vals.to_numpy(), radius=radius, name=name)
@@ -0,0 +1,178 @@
+# master_loader.py
+# Typed, column-projected loading of the integrated master panel.
+# The wide master CSV is converted once per snapshot into a typed Parquet file next to it
+# (codes normalised and stored as categoricals, flags as bools, measures as float32);
+# pages then read only the columns they declare. Each load is timed and measured, and
+# can be appended to a CSV log to compare snapshots.
+#
+#   python master_loader.py master_integrated_dhis_conflict_ipc_wrsi.<stamp>.csv [page]
+
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from panel_tensor import DATE_COL, FEATURE_REGISTRY, KEY_SOURCES
+
+DATE_COLS = ("ym_ts", "ym", "ym_climate")
+# ADM2 / facility codes: strip + upper, categorical
+CODE_COLS = ("ADM2_PCODE", "ADM2_PCODE_final2", "ADM2_PCODE_final", "ADM2_PCODE_filled",
+             "ADM2_PCODE_orig", "ADM2_PCODE_final2_conflict", "facility_pcode")
+# Woreda names and provenance strings: strip + lower, categorical
+TEXT_COLS = ("woreda_key", "woreda_key_norm", "woreda_key_climate", "leap_provenance")
+FLAG_COLS = ("low_reporting", "low_climate_coverage", "low_reporting_climate", "low_climate_coverage_climate",
+             "is_SAM", "is_MAM", "ipc_severe_flag", "monthly_rain_missing", "monthly_rain_avg_missing",
+             "rfq_mean_missing", "n_pixels_mean_missing")
+# Everything else numeric is a float32 measure
+
+# Features each dashboard page shows (FEATURE_REGISTRY names)
+_TFP = ["SAM", "MAM", "population", "TFP_rate_per10k"]
+PAGE_FEATURES = {
+    "overlay": _TFP + ["conflict_events_zone", "wrsi_value_leap", "ipc_value"],
+    "retrospective": _TFP + ["GAM", "conflict_events_zone", "wrsi_value_leap", "SPI_1", "SPI_3",
+                             "wrsI_roll3", "conflict_events_3m", "events_3m_sum", "ipc_value"],
+    "quality": _TFP + ["conflict_events_zone", "wrsi_value_leap", "ipc_value"],
+}
+
+
+def feature_columns(features) -> list:
+    """Columns to read for some features: the key sources, the date and every registered source."""
+    cols = list(KEY_SOURCES) + [DATE_COL]
+    for f in features:
+        cols += list(FEATURE_REGISTRY[f][1]) if f in FEATURE_REGISTRY else [f]
+    return list(dict.fromkeys(cols))
+
+
+# Columns each dashboard page reads (so near-duplicate fallbacks can be coalesced)
+PAGE_COLUMNS = {page: feature_columns(features) for page, features in PAGE_FEATURES.items()}
+
+LOAD_LOG = "master_load_log.csv"
+
+
+# -----------------------------
+# Conversion (once per snapshot)
+def snapshot_path(csv_path) -> Path:
+    p = Path(csv_path)
+    return p.with_name(p.stem + ".typed.parquet")
+
+
+def normalize_codes(s: pd.Series, upper: bool = True) -> pd.Series:
+    """Strip and case-fold each distinct value once; empty / 'nan' become missing; categorical."""
+    vals = s.astype("string")
+    uniq = pd.Series(vals.dropna().unique(), dtype="string")
+    norm = uniq.str.strip()
+    norm = norm.str.upper() if upper else norm.str.lower()
+    norm = norm.mask(norm.str.upper().isin(["", "NAN", "NONE"]))
+    cats = pd.Index(norm.dropna().unique(), dtype=object)
+    return vals.map(dict(zip(uniq, norm))).astype(pd.CategoricalDtype(cats))
+
+
+def to_bool(s: pd.Series) -> pd.Series:
+    """0/1, True/False or 'true'/'false' -> bool; nullable boolean if anything is missing."""
+    if s.dtype == object or pd.api.types.is_string_dtype(s):
+        s = s.astype("string").str.strip().str.lower().map({"true": 1, "false": 0, "1": 1, "0": 0})
+    v = pd.to_numeric(s, errors="coerce")
+    out = (v != 0).astype("boolean").mask(v.isna())
+    return out.astype(bool) if not out.isna().any() else out
+
+
+def type_master(df: pd.DataFrame) -> pd.DataFrame:
+    """Apply the master schema: dates, normalised categorical codes, bool flags, float32 measures."""
+    out = {}
+    for c in df.columns:
+        s = df[c]
+        if c in DATE_COLS:
+            out[c] = pd.to_datetime(s, errors="coerce")
+        elif c in CODE_COLS:
+            out[c] = normalize_codes(s, upper=True)
+        elif c in TEXT_COLS:
+            out[c] = normalize_codes(s, upper=False)
+        elif c in FLAG_COLS:
+            out[c] = to_bool(s)
+        elif pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            out[c] = s.astype("float32")
+        elif pd.api.types.is_bool_dtype(s):
+            out[c] = s
+        else:
+            num = pd.to_numeric(s, errors="coerce")
+            # Text column that is really numeric (all non-empty values parse) -> measure
+            out[c] = num.astype("float32") if num.notna().sum() == s.notna().sum() else normalize_codes(s, upper=False)
+    return pd.DataFrame(out, index=df.index)
+
+
+def convert_master(csv_path, out_path=None) -> Path:
+    """Read the wide CSV once, type and normalise it, and write the typed Parquet snapshot."""
+    out_path = Path(out_path) if out_path else snapshot_path(csv_path)
+    type_master(pd.read_csv(csv_path, low_memory=False)).to_parquet(out_path, index=False, compression="zstd")
+    return out_path
+
+
+def ensure_snapshot(csv_path) -> Path:
+    """Typed Parquet for a CSV, (re)converting if missing or older than the CSV."""
+    snap = snapshot_path(csv_path)
+    if not snap.exists() or snap.stat().st_mtime < Path(csv_path).stat().st_mtime:
+        convert_master(csv_path, snap)
+    return snap
+
+
+# -----------------------------
+# Loading
+def page_columns(pages) -> list:
+    """Union of the declared projections, in first-seen order."""
+    pages = [pages] if isinstance(pages, str) else list(pages)
+    return list(dict.fromkeys(c for p in pages for c in PAGE_COLUMNS[p]))
+
+
+def load_master(path, pages=None, columns=None, log: str | None = None):
+    """Projected, typed master panel; returns (frame, report dict).
+
+    `pages` (names in PAGE_COLUMNS) and/or `columns` pick the projection; neither means all
+    columns. CSV paths go through the typed Parquet snapshot (converted on first use).
+    """
+    t0 = time.perf_counter()
+    path = Path(path)
+    src = ensure_snapshot(path) if path.suffix.lower() == ".csv" else path
+    t_convert = time.perf_counter() - t0
+
+    available = pq.read_schema(src).names
+    wanted = (page_columns(pages) if pages else []) + list(columns or [])
+    cols = [c for c in dict.fromkeys(wanted) if c in available] if wanted else None
+    df = pd.read_parquet(src, columns=cols)
+
+    report = {
+        "snapshot": path.name,
+        "pages": ",".join([pages] if isinstance(pages, str) else list(pages or [])) or "all",
+        "rows": len(df),
+        "columns": df.shape[1],
+        "columns_available": len(available),
+        "convert_s": round(t_convert, 3),
+        "load_s": round(time.perf_counter() - t0, 3),
+        "memory_mb": round(df.memory_usage(deep=True).sum() / 1e6, 3),
+    }
+    if log:
+        log_load(report, log)
+    return df, report
+
+
+def log_load(report: dict, path: str = LOAD_LOG) -> bool:
+    """Append one load report to a CSV log; returns False if the path is not writable."""
+    row = pd.DataFrame([{"loaded_at": pd.Timestamp.now().isoformat(timespec="seconds"), **report}])
+    try:
+        row.to_csv(path, mode="a", header=not Path(path).exists(), index=False)
+    except OSError:
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    src = sys.argv[1]
+    pages = sys.argv[2].split(",") if len(sys.argv) > 2 else None
+    raw_t0 = time.perf_counter()
+    raw = pd.read_csv(src, low_memory=False)
+    raw_s, raw_mb = time.perf_counter() - raw_t0, raw.memory_usage(deep=True).sum() / 1e6
+    df, rep = load_master(src, pages, log=LOAD_LOG)
+    print(f"✅ raw CSV: {raw.shape[1]} columns, {raw_s:.3f} s, {raw_mb:.2f} MB")
+    print(f"✅ typed:   {rep['columns']}/{rep['columns_available']} columns, {rep['load_s']:.3f} s "
+          f"(convert {rep['convert_s']:.3f} s), {rep['memory_mb']:.2f} MB")
@@ -0,0 +1,355 @@
+# missingness.py
+# Missingness profile for every column of the master panel.
+# Validity is kept as packed bitmaps (variable x woreda x month, one bit per cell) with
+# per-(variable, woreda, year) and per-(variable, month) counts maintained next to
+# them, so coverage by year / region / woreda / source is a sum over small count arrays.
+# A new snapshot only touches the (month, column) blocks whose validity pattern changed,
+# and the profile can be saved to .npz between snapshots. Queries report the columns of
+# the latest snapshot.
+#
+#   python missingness.py master_integrated_dhis_conflict_ipc_wrsi.<stamp>.csv [profile.npz]
+
+import hashlib
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from panel_index import month_ordinal, ordinal_to_timestamp
+
+PROFILE_PATH = "missingness_profile.npz"
+KEY_SOURCES = ("ADM2_PCODE", "ADM2_PCODE_final2", "ADM2_PCODE_final", "ADM2_PCODE_filled")
+DATE_COL = "ym_ts"
+
+# Column -> data source, first matching pattern wins
+SOURCE_PATTERNS = [
+    ("keys", r"^(ADM2_PCODE|woreda_key|facility_pcode|Year$|Month$|month$|ym)"),
+    ("wrsi", r"^(wrsi_value_leap|leap_provenance)$"),
+    ("conflict", r"(conflict|Events|Fatalities|events_3m)"),
+    ("ipc", r"^ipc"),
+    ("climate", r"(rain|rfq|SPI|pixels|climate|wrsI|rangeland)"),
+    ("dhis2", r".*"),
+]
+
+
+def source_of(column: str) -> str:
+    for name, pattern in SOURCE_PATTERNS:
+        if re.search(pattern, column):
+            return name
+    return "other"
+
+
+def region_of(codes) -> np.ndarray:
+    """ADM1 code from an ADM2 p-code (ET0508 -> ET05)."""
+    return np.array([str(c)[:4] for c in codes], dtype=object)
+
+
+def _valid(col) -> np.ndarray:
+    """Non-null (and, for floats, non-NaN) mask of an Arrow column."""
+    ok = pc.is_valid(col)
+    if pa.types.is_floating(col.type):
+        ok = pc.and_(ok, pc.invert(pc.fill_null(pc.is_nan(col), True)))
+    return np.asarray(ok.to_numpy(), dtype=bool)
+
+
+def _block_hash(keys=None, valid=None) -> int:
+    """Stable (cross-process) hash of one month's row keys, or of one column's validity bits."""
+    h = hashlib.blake2b(digest_size=8)
+    if keys is not None:
+        h.update("\x00".join(keys).encode())
+    if valid is not None:
+        h.update(np.packbits(valid).tobytes())
+    return int.from_bytes(h.digest(), "little", signed=True)
+
+
+class MissingnessProfile:
+    """Validity bitmaps and coverage counts for all variables of a woreda-month panel."""
+
+    def __init__(self):
+        self.variables = []                       # V (every column seen in any snapshot)
+        self.current = []                         # columns of the latest snapshot (what queries report)
+        self.woredas = np.empty(0, dtype=object)  # W
+        self.month_min = None                     # month ordinal of column 0
+        self.n_months = 0                         # T
+        self.bits = np.zeros((0, 0, 0), dtype="uint8")      # V x W x ceil(T/8)
+        self.present = np.zeros((0, 0), dtype="uint8")      # W x ceil(T/8)
+        self.month_hash = {}                      # month ordinal -> hash of its row keys
+        self.col_hash = {}                        # (month ordinal, column) -> hash of its validity bits
+        self.snapshots = []
+        # Precomputed counts
+        self.year_values = np.empty(0, dtype=int)            # Y
+        self.valid_wy = np.zeros((0, 0, 0), dtype="int32")   # V x W x Y valid cells
+        self.present_wy = np.zeros((0, 0), dtype="int32")    # W x Y rows
+        self.valid_m = np.zeros((0, 0), dtype="int32")       # V x T valid cells
+        self.present_m = np.zeros(0, dtype="int32")          # T rows
+
+    # -- axes
+    def _years_of(self, t0: int, t1: int) -> np.ndarray:
+        return ordinal_to_timestamp(np.arange(self.month_min + t0, self.month_min + t1)).year.to_numpy() \
+            if t1 > t0 else np.empty(0, dtype=int)
+
+    def _unpacked(self):
+        bits = np.unpackbits(self.bits, axis=-1, count=self.n_months).astype(bool)
+        present = np.unpackbits(self.present, axis=-1, count=self.n_months).astype(bool)
+        return bits, present
+
+    def _rebuild(self, bits: np.ndarray, present: np.ndarray):
+        """Pack full boolean arrays and recompute every count (first snapshot / earlier months)."""
+        self.n_months = bits.shape[-1]
+        self.bits = np.packbits(bits, axis=-1)
+        self.present = np.packbits(present, axis=-1)
+        self.year_values, yi = np.unique(self._years_of(0, self.n_months), return_inverse=True)
+        onehot = np.zeros((self.n_months, len(self.year_values)), dtype="int32")
+        onehot[np.arange(self.n_months), yi] = 1
+        self.valid_wy = bits.astype("int32") @ onehot            # V x W x Y
+        self.present_wy = present.astype("int32") @ onehot       # W x Y
+        self.valid_m = bits.sum(axis=1, dtype="int32")           # V x T
+        self.present_m = present.sum(axis=0, dtype="int32")      # T
+
+    def _grow(self, variables, woredas, m_lo: int, m_hi: int):
+        """Pad the variable / woreda / month axes for a new snapshot.
+
+        New variables, woredas and later months only append zeros (packed month bytes stay
+        aligned); a snapshot reaching before month_min unpacks and rebuilds everything.
+        """
+        new_vars = [v for v in variables if v not in self.variables]
+        new_w = np.setdiff1d(np.asarray(woredas, dtype=object), self.woredas).astype(object)
+        V0, W0 = len(self.variables), len(self.woredas)
+        self.variables = self.variables + new_vars
+        self.woredas = np.concatenate([self.woredas, new_w])
+        V, W = len(self.variables), len(self.woredas)
+
+        if self.month_min is None or m_lo < self.month_min:
+            bits, present = self._unpacked()
+            lo = m_lo if self.month_min is None else min(self.month_min, m_lo)
+            shift = 0 if self.month_min is None else self.month_min - lo
+            hi = max(m_hi, lo + shift + self.n_months - 1)
+            b = np.zeros((V, W, hi - lo + 1), dtype=bool)
+            p = np.zeros((W, hi - lo + 1), dtype=bool)
+            b[:V0, :W0, shift:shift + self.n_months] = bits
+            p[:W0, shift:shift + self.n_months] = present
+            self.month_min = lo
+            self._rebuild(b, p)
+            return
+
+        T0 = self.n_months
+        T = max(T0, m_hi - self.month_min + 1)
+        self.n_months = T
+        years = np.union1d(self.year_values, self._years_of(T0, T))
+        nb = (T + 7) // 8
+        self.bits = np.pad(self.bits, ((0, V - V0), (0, W - W0), (0, nb - self.bits.shape[2])))
+        self.present = np.pad(self.present, ((0, W - W0), (0, nb - self.present.shape[1])))
+        self.valid_wy = np.pad(self.valid_wy, ((0, V - V0), (0, W - W0), (0, len(years) - len(self.year_values))))
+        self.present_wy = np.pad(self.present_wy, ((0, W - W0), (0, len(years) - len(self.year_values))))
+        self.valid_m = np.pad(self.valid_m, ((0, V - V0), (0, T - T0)))
+        self.present_m = np.pad(self.present_m, (0, T - T0))
+        self.year_values = years
+
+    def _set_month(self, t: int, v_pos: np.ndarray, w: np.ndarray, valid: np.ndarray):
+        """Overwrite month t of the variables v_pos (and the row presence) in the packed
+        bitmaps and adjust the counts by the difference; other variables are left alone."""
+        byte, mask = t // 8, np.uint8(1 << (7 - t % 8))     # packbits is big-endian within a byte
+        y = np.searchsorted(self.year_values, self._years_of(t, t + 1)[0])
+        old_b = (self.bits[v_pos, :, byte] & mask) != 0     # v x W
+        old_p = (self.present[:, byte] & mask) != 0          # W
+        new_b = np.zeros_like(old_b)
+        np.logical_or.at(new_b, (np.arange(len(v_pos))[:, None], w[None, :]), valid.T)   # duplicate rows: any valid
+        new_p = np.zeros_like(old_p)
+        new_p[w] = True
+        self.bits[v_pos, :, byte] = (self.bits[v_pos, :, byte] & ~mask) | (new_b.astype("uint8") * mask)
+        self.present[:, byte] = (self.present[:, byte] & ~mask) | (new_p.astype("uint8") * mask)
+        self.valid_wy[v_pos, :, y] += new_b.astype("int32") - old_b
+        self.present_wy[:, y] += new_p.astype("int32") - old_p
+        self.valid_m[v_pos, t] = new_b.sum(axis=1)
+        self.present_m[t] = new_p.sum()
+
+    # -- building
+    def update(self, table, snapshot: str = "") -> list:
+        """Fold in a snapshot (pyarrow Table or DataFrame); returns the months that changed.
+
+        Each month's row keys and each (month, column) validity pattern are hashed; blocks
+        matching the stored hash are skipped, so a snapshot that appends one month (or one
+        column) writes only those bits and count deltas. Columns the snapshot lacks keep
+        their bits but drop out of `current`, so queries no longer report them.
+        """
+        if isinstance(table, pd.DataFrame):
+            table = pa.Table.from_pandas(table, preserve_index=False)
+        names = table.column_names
+        key_cols = [c for c in KEY_SOURCES if c in names]
+        if key_cols:
+            key = table.column(key_cols[0]).cast(pa.string())
+            for c in key_cols[1:]:
+                key = pc.coalesce(key, table.column(c).cast(pa.string()))
+            key = pc.utf8_upper(pc.utf8_trim_whitespace(key)).to_pandas().to_numpy(dtype=object)
+        else:
+            key = np.full(table.num_rows, "ALL", dtype=object)
+        month = month_ordinal(table.column(DATE_COL).to_pandas())
+        ok = (month >= 0) & pd.notna(key) & (key != "") & (key != "NAN")
+        key, month = key[ok], month[ok]
+        variables = [c for c in names if c != DATE_COL]
+        valid = np.column_stack([_valid(table.column(c)) for c in variables])[ok] \
+            if variables else np.zeros((ok.sum(), 0), dtype=bool)
+        self.current = variables
+        if not len(month):
+            return []
+
+        # (month, column) blocks whose validity changed since the last snapshot; a month
+        # whose rows changed is rewritten for every column
+        order = np.lexsort((key, month))
+        key, month, valid = key[order], month[order], valid[order]
+        cuts = np.flatnonzero(np.diff(month)) + 1
+        changed = []                                          # (month, start, end, column positions)
+        for s, e in zip(np.append(0, cuts), np.append(cuts, len(month))):
+            m = int(month[s])
+            hk = _block_hash(keys=key[s:e].tolist())
+            fresh = self.month_hash.get(m) != hk
+            if fresh:
+                self.month_hash[m] = hk
+                self.col_hash = {k: h for k, h in self.col_hash.items() if k[0] != m}
+            cols = []
+            for j, v in enumerate(variables):
+                hv = _block_hash(valid=valid[s:e, j])
+                if fresh or self.col_hash.get((m, v)) != hv:
+                    self.col_hash[(m, v)] = hv
+                    cols.append(j)
+            if cols or fresh:
+                changed.append((m, s, e, np.array(cols, dtype="int64")))
+        # Months the new snapshot no longer has become empty blocks for every column
+        for m in sorted(set(self.month_hash) - set(np.unique(month).tolist())):
+            del self.month_hash[m]
+            self.col_hash = {k: h for k, h in self.col_hash.items() if k[0] != m}
+            changed.append((m, 0, 0, None))
+        if snapshot not in self.snapshots:
+            self.snapshots.append(snapshot)
+        if not changed:
+            return []
+
+        sel = np.concatenate([np.arange(s, e) for _, s, e, _ in changed])
+        self._grow(variables, np.unique(key[sel]), min(c[0] for c in changed), max(c[0] for c in changed))
+        w_pos = {w: i for i, w in enumerate(self.woredas)}
+        v_pos = np.array([self.variables.index(v) for v in variables], dtype="int64")
+        for m, s, e, cols in changed:
+            w = np.array([w_pos[k] for k in key[s:e]], dtype="int64")
+            if cols is None:
+                self._set_month(m - self.month_min, np.arange(len(self.variables)), w,
+                                np.zeros((0, len(self.variables)), dtype=bool))
+            else:
+                self._set_month(m - self.month_min, v_pos[cols], w, valid[s:e][:, cols])
+        return [c[0] for c in changed]
+
+    # -- queries
+    def coverage(self, by=("year",), variables=None, regions=None) -> pd.DataFrame:
+        """Valid cells, rows and coverage for any grouping of variable/source x year/month/region/woreda.
+
+        `by` may contain "variable" or "source" and at most one of "year" / "month", plus
+        "region" or "woreda" (not with "month"). Without "variable"/"source", every
+        variable is its own row group (coverage per variable is what the tab shows).
+        Defaults to the columns of the latest snapshot.
+        """
+        by = list(by)
+        var_key = "source" if "source" in by else "variable"
+        vars_sel = [v for v in (variables or self.current) if v in self.variables]
+        vi = np.array([self.variables.index(v) for v in vars_sel], dtype="int64")
+        var_labels = np.array([source_of(v) for v in vars_sel] if var_key == "source" else vars_sel, dtype=object)
+
+        if "month" in by:
+            months = ordinal_to_timestamp(np.arange(self.month_min, self.month_min + self.n_months))
+            long = pd.DataFrame({
+                var_key: np.repeat(var_labels, self.n_months),
+                "month": np.tile(months, len(vi)),
+                "valid": self.valid_m[vi].ravel(),
+                "rows": np.tile(self.present_m, len(vi)),
+            })
+            keys = [var_key, "month"]
+        else:
+            V, W, Y = len(vi), len(self.woredas), len(self.year_values)
+            long = pd.DataFrame({
+                var_key: np.repeat(var_labels, W * Y),
+                "woreda": np.tile(np.repeat(self.woredas, Y), V),
+                "year": np.tile(self.year_values, V * W),
+                "valid": self.valid_wy[vi].ravel(),
+                "rows": np.tile(self.present_wy.ravel(), V),
+            })
+            long["region"] = region_of(long["woreda"]) if len(long) else []
+            if regions:
+                long = long[long["region"].isin(regions)]
+            keys = [var_key] + [k for k in ("region", "woreda", "year") if k in by]
+        out = long.groupby(keys, sort=True)[["valid", "rows"]].sum().reset_index()
+        out["coverage"] = np.where(out["rows"] > 0, out["valid"] / out["rows"].where(out["rows"] > 0), np.nan)
+        return out
+
+    def matrix(self, by: str = "month", variables=None) -> pd.DataFrame:
+        """variable x <by> coverage table (for heatmaps); by is "month", "year", "region" or "woreda"."""
+        cov = self.coverage(by=("variable", by), variables=variables)
+        return cov.pivot(index="variable", columns=by, values="coverage")
+
+    # -- persistence
+    def save(self, path: str = PROFILE_PATH) -> bool:
+        try:
+            np.savez_compressed(
+                path, variables=np.array(self.variables, dtype=object), current=np.array(self.current, dtype=object),
+                woredas=self.woredas,
+                month_min=self.month_min if self.month_min is not None else -1, n_months=self.n_months,
+                bits=self.bits, present=self.present, year_values=self.year_values,
+                valid_wy=self.valid_wy, present_wy=self.present_wy, valid_m=self.valid_m, present_m=self.present_m,
+                hash_months=np.array(list(self.month_hash), dtype="int64"),
+                hash_values=np.array(list(self.month_hash.values()), dtype="int64"),
+                col_hash_months=np.array([m for m, _ in self.col_hash], dtype="int64"),
+                col_hash_vars=np.array([v for _, v in self.col_hash], dtype=object),
+                col_hash_values=np.array(list(self.col_hash.values()), dtype="int64"),
+                snapshots=np.array(self.snapshots, dtype=object),
+            )
+        except OSError:
+            return False
+        return True
+
+    @classmethod
+    def load(cls, path: str = PROFILE_PATH) -> "MissingnessProfile":
+        prof = cls()
+        if not Path(path).exists():
+            return prof
+        z = np.load(path, allow_pickle=True)
+        prof.variables = list(z["variables"])
+        prof.woredas = z["woredas"].astype(object)
+        prof.month_min = int(z["month_min"]) if int(z["month_min"]) >= 0 else None
+        prof.n_months = int(z["n_months"])
+        prof.bits, prof.present = z["bits"], z["present"]
+        prof.month_hash = dict(zip(z["hash_months"].tolist(), z["hash_values"].tolist()))
+        # Profiles saved before per-column hashes: every block is re-profiled once
+        prof.current = list(z["current"]) if "current" in z.files else list(prof.variables)
+        if "col_hash_values" in z.files:
+            prof.col_hash = dict(zip(zip(z["col_hash_months"].tolist(), z["col_hash_vars"].tolist()),
+                                     z["col_hash_values"].tolist()))
+        else:
+            prof.month_hash = {}
+        prof.snapshots = list(z["snapshots"])
+        for name in ("year_values", "valid_wy", "present_wy", "valid_m", "present_m"):
+            setattr(prof, name, z[name])
+        return prof
+
+
+def profile_snapshot(path, profile_path: str | None = None) -> tuple:
+    """Update (or start) the saved profile with a master snapshot; returns (profile, changed months)."""
+    from master_loader import ensure_snapshot
+
+    path = Path(path)
+    src = ensure_snapshot(path) if path.suffix.lower() == ".csv" else path
+    prof = MissingnessProfile.load(profile_path) if profile_path else MissingnessProfile()
+    seen = path.name in prof.snapshots
+    changed = prof.update(pq.read_table(src), snapshot=path.name)
+    if profile_path and (changed or not seen):
+        prof.save(profile_path)
+    return prof, changed
+
+
+if __name__ == "__main__":
+    src = sys.argv[1]
+    out = sys.argv[2] if len(sys.argv) > 2 else str(Path(src).with_name(PROFILE_PATH))
+    prof, changed = profile_snapshot(src, out)
+    print(f"✅ {len(prof.variables)} variables × {len(prof.woredas)} woredas × {prof.n_months} months; "
+          f"{len(changed)} month(s) updated -> {out}")
@@ -0,0 +1,181 @@
+# name_resolver.py
+# Woreda-name resolution against an admin2 gazetteer.
+# Exact and alias matches first, then a trigram index with edit-distance re-ranking
+# for the rest. Every decision is kept in a match table that can be saved to CSV,
+# hand-corrected (method="manual") and reloaded, so names are only fuzzed once.
+
+from pathlib import Path
+import re
+
+import numpy as np
+import pandas as pd
+
+MATCH_TABLE_PATH = "woreda_name_matches.csv"
+MATCH_COLUMNS = ["source", "target", "method", "score"]
+
+
+# -----------------------------
+# Normalisation
+def norm_names(s: pd.Series) -> pd.Series:
+    """lower, strip, drop punctuation, collapse whitespace to '_' (same rules as the dashboards)."""
+    return (
+        s.astype(str)
+         .str.lower()
+         .str.strip()
+         .str.replace(r"[^\w\s]", "", regex=True)
+         .str.replace(r"\s+", "_", regex=True)
+    )
+
+
+def norm_name(name: str) -> str:
+    return re.sub(r"\s+", "_", re.sub(r"[^\w\s]", "", str(name).lower().strip()))
+
+
+def compact(name: str) -> str:
+    """Separator-free form used for fuzzy comparison ("jana_mora" == "janamora")."""
+    return name.replace("_", "")
+
+
+def trigrams(name: str) -> set:
+    padded = f"  {compact(name)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance (two-row DP; names are short)."""
+    if len(a) < len(b):
+        a, b = b, a
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+
+# -----------------------------
+# Resolver
+class WoredaResolver:
+    """Maps free-text woreda names onto a fixed gazetteer of normalised admin2 names."""
+
+    def __init__(self, gazetteer, aliases: dict | None = None,
+                 match_table: pd.DataFrame | None = None,
+                 min_score: float = 0.75, candidates: int = 5):
+        self.names = np.array(sorted(set(norm_names(pd.Series(list(gazetteer), dtype="object")))), dtype=object)
+        self.min_score = min_score
+        self.candidates = candidates
+        self._ids = {n: i for i, n in enumerate(self.names)}
+        self._compact = {}
+        for n in self.names:
+            self._compact.setdefault(compact(n), n)
+
+        # Trigram postings: trigram -> gazetteer ids containing it
+        postings = {}
+        self._sizes = np.zeros(len(self.names), dtype="int32")
+        for i, n in enumerate(self.names):
+            grams = trigrams(n)
+            self._sizes[i] = len(grams)
+            for g in grams:
+                postings.setdefault(g, []).append(i)
+        self._postings = {g: np.asarray(ids, dtype="int32") for g, ids in postings.items()}
+
+        self.table = {}
+        for src, tgt in (aliases or {}).items():
+            tgt = norm_name(tgt)
+            if tgt in self._ids:
+                self.table[norm_name(src)] = (tgt, "alias", 1.0)
+        self.merge(match_table)
+        self._dirty = False
+
+    def merge(self, match_table: pd.DataFrame | None, manual_only: bool = False) -> None:
+        """Take rows from a saved match table (only the hand-corrected ones if manual_only)."""
+        if match_table is None or match_table.empty:
+            return
+        for r in match_table.itertuples(index=False):
+            if not isinstance(r.source, str) or (manual_only and r.method != "manual"):
+                continue
+            tgt = r.target if isinstance(r.target, str) and r.target in self._ids else None
+            if r.method == "manual" or tgt is not None:
+                self.table[r.source] = (tgt, r.method, float(r.score))
+
+    # -- matching
+    def _fuzzy(self, name: str):
+        if compact(name) in self._compact:
+            return self._compact[compact(name)], 1.0
+        query = trigrams(name)
+        grams = [g for g in query if g in self._postings]
+        if not grams:
+            return None, 0.0
+        counts = np.bincount(np.concatenate([self._postings[g] for g in grams]), minlength=len(self.names))
+        jaccard = counts / (len(query) + self._sizes - counts)
+        k = min(self.candidates, len(self.names))
+        top = np.argpartition(-jaccard, k - 1)[:k]
+        best, best_score = None, 0.0
+        for i in top[np.argsort(-jaccard[top])]:
+            cand = self.names[i]
+            a, b = compact(name), compact(cand)
+            ratio = 1 - edit_distance(a, b) / max(len(a), len(b))
+            score = 0.5 * jaccard[i] + 0.5 * ratio
+            if score > best_score:
+                best, best_score = cand, score
+        return (best, best_score) if best_score >= self.min_score else (None, best_score)
+
+    def resolve(self, names) -> dict:
+        """Resolve any names not yet in the match table; returns {normalised source: target or None}."""
+        uniq = pd.unique(norm_names(pd.Series(list(names), dtype="object").dropna()).dropna())
+        for n in uniq:
+            if n in self.table:
+                continue
+            if n in self._ids:
+                self.table[n] = (n, "exact", 1.0)
+            else:
+                tgt, score = self._fuzzy(n)
+                self.table[n] = (tgt, "fuzzy" if tgt else "unmatched", round(float(score), 3))
+            self._dirty = True
+        return {n: self.table[n][0] for n in uniq}
+
+    def lookup(self, names: pd.Series) -> pd.Series:
+        """Gazetteer key for each name (NaN if unmatched) via one vectorised dict lookup."""
+        normed = norm_names(names)
+        self.resolve(normed)
+        return normed.map({src: tgt for src, (tgt, _, _) in self.table.items()})
+
+    # -- reporting / persistence
+    def report(self, names=None) -> pd.DataFrame:
+        """Match table as a frame; restricted to `names` when given."""
+        rows = [(s, t, m, sc) for s, (t, m, sc) in self.table.items()]
+        out = pd.DataFrame(rows, columns=MATCH_COLUMNS)
+        if names is not None:
+            out = out[out["source"].isin(set(norm_names(pd.Series(list(names), dtype="object"))))]
+        return out.sort_values(["method", "source"], ignore_index=True)
+
+    def unmatched(self, names=None) -> list:
+        rep = self.report(names)
+        return rep.loc[rep["target"].isna(), "source"].tolist()
+
+    def save(self, path: str = MATCH_TABLE_PATH) -> bool:
+        """Write the match table if it changed; returns False if the path is not writable.
+
+        Manual corrections made to the file since it was loaded are merged in first, so
+        writing never drops them.
+        """
+        if not self._dirty:
+            return True
+        self.merge(load_match_table(path), manual_only=True)
+        try:
+            self.report().to_csv(path, index=False)
+        except OSError:
+            return False
+        self._dirty = False
+        return True
+
+
+def load_match_table(path: str = MATCH_TABLE_PATH) -> pd.DataFrame | None:
+    p = Path(path)
+    if not p.exists():
+        return None
+    try:
+        return pd.read_csv(p, dtype={"source": str, "target": str, "method": str})
+    except Exception:
+        return None
@@ -0,0 +1,177 @@
+# panel_index.py
+# Sorted (region, woreda, month) index over a woreda-month panel.
+# Selections become binary searches over integer month ordinals instead of
+# boolean masks over Python date objects.
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+
+# -----------------------------
+# Month ordinals
+def month_ordinal(dates) -> np.ndarray:
+    """Months since year 0 (year * 12 + month - 1) as int32; NaT becomes -1."""
+    d = pd.DatetimeIndex(pd.to_datetime(dates, errors="coerce"))
+    out = (d.year * 12 + d.month - 1).to_numpy(dtype="float64")
+    return np.where(np.isnan(out), -1, out).astype("int32")
+
+
+def ordinal_to_timestamp(ordinals) -> pd.DatetimeIndex:
+    """Inverse of month_ordinal: first day of each month."""
+    o = np.asarray(ordinals, dtype="int64")
+    return pd.DatetimeIndex(pd.to_datetime(pd.DataFrame({"year": o // 12, "month": o % 12 + 1, "day": 1})))
+
+
+def start_ordinal(d: date) -> int:
+    """First month whose 1st day falls on or after d (matches `date >= d` on month starts)."""
+    ts = pd.Timestamp(d)
+    return int(ts.year * 12 + ts.month - 1 + (1 if ts.day > 1 else 0))
+
+
+def end_ordinal(d: date) -> int:
+    """Last month whose 1st day falls on or before d (matches `date <= d` on month starts)."""
+    ts = pd.Timestamp(d)
+    return int(ts.year * 12 + ts.month - 1)
+
+
+# -----------------------------
+# Index
+class PanelIndex:
+    """Panel rows sorted by (region, woreda, month) with per-woreda offset tables.
+
+    `frame` holds the sorted rows. Woreda w owns rows woreda_start[w]:woreda_end[w];
+    region r owns woredas region_start[r]:region_end[r], which are contiguous.
+    """
+
+    def __init__(self, df: pd.DataFrame,
+                 woreda_col: str = "woreda",
+                 date_col: str = "date",
+                 region_col: str | None = "region"):
+        self.woreda_col, self.date_col, self.region_col = woreda_col, date_col, region_col
+
+        data = df.dropna(subset=[date_col, woreda_col])
+        regions = data[region_col].astype(str) if region_col else pd.Series("", index=data.index)
+        months = month_ordinal(data[date_col])
+        order = np.lexsort((months, data[woreda_col].astype(str).to_numpy(), regions.to_numpy()))
+        self.frame = data.iloc[order].reset_index(drop=True)
+        self.month = months[order]
+        regions = regions.to_numpy()[order]
+        woredas = self.frame[woreda_col].astype(str).to_numpy()
+
+        # One entry per (region, woreda) run, in sorted order
+        n = len(self.frame)
+        new_run = np.ones(n, dtype=bool)
+        if n:
+            new_run[1:] = (regions[1:] != regions[:-1]) | (woredas[1:] != woredas[:-1])
+        self.woreda_start = np.flatnonzero(new_run)
+        self.woreda_end = np.append(self.woreda_start[1:], n).astype("int64")
+        self.woreda_names = woredas[self.woreda_start]
+        self.woreda_regions = regions[self.woreda_start]
+        self.row_woreda = np.cumsum(new_run) - 1
+
+        first = np.ones(len(self.woreda_start), dtype=bool)
+        first[1:] = self.woreda_regions[1:] != self.woreda_regions[:-1]
+        self.region_start = np.flatnonzero(first)
+        self.region_end = np.append(self.region_start[1:], len(self.woreda_start))
+        self.region_names = self.woreda_regions[self.region_start]
+
+        # (woreda id, month) packed into one sorted int64 key for vectorised searchsorted
+        self.month_min = int(self.month.min()) if n else 0
+        self.month_max = int(self.month.max()) if n else 0
+        self._key = (self.row_woreda.astype("int64") << 32) | (self.month - self.month_min).astype("int64")
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @property
+    def n_woredas(self) -> int:
+        return len(self.woreda_start)
+
+    @property
+    def n_months(self) -> int:
+        return self.month_max - self.month_min + 1 if len(self.frame) else 0
+
+    @property
+    def columns(self) -> list:
+        return self.frame.columns.tolist()
+
+    def woreda_ids(self, region: str | None = None, woreda: str | None = None) -> np.ndarray:
+        """Woreda ids matching the selection; "All"/None means no constraint."""
+        if region and region != "All":
+            r = np.searchsorted(self.region_names, region)
+            if r >= len(self.region_names) or self.region_names[r] != region:
+                return np.empty(0, dtype="int64")
+            ids = np.arange(self.region_start[r], self.region_end[r])
+        else:
+            ids = np.arange(self.n_woredas)
+        if woreda and woreda != "All":
+            ids = ids[self.woreda_names[ids] == woreda]
+        return ids
+
+    def bounds(self, ids: np.ndarray, m0: int | None = None, m1: int | None = None):
+        """Row [start, end) per woreda id for months m0..m1 (inclusive), by binary search."""
+        ids = np.asarray(ids, dtype="int64")
+        if m0 is None and m1 is None:
+            return self.woreda_start[ids], self.woreda_end[ids]
+        lo_m = 0 if m0 is None else min(max(m0 - self.month_min, 0), 0xFFFFFFFF)
+        hi_m = 0xFFFFFFFF if m1 is None else m1 - self.month_min
+        if hi_m < lo_m:
+            z = self.woreda_start[ids]
+            return z, z
+        lo = np.searchsorted(self._key, (ids << 32) | lo_m, side="left")
+        hi = np.searchsorted(self._key, (ids << 32) | hi_m, side="right")
+        return lo, hi
+
+    def positions(self, region: str | None = None, woreda: str | None = None,
+                  start: date | None = None, end: date | None = None):
+        """Row positions for the selection: a slice when contiguous, else an int array."""
+        ids = self.woreda_ids(region, woreda)
+        m0 = start_ordinal(start) if start is not None else None
+        m1 = end_ordinal(end) if end is not None else None
+        lo, hi = self.bounds(ids, m0, m1)
+        keep = hi > lo
+        lo, hi = lo[keep], hi[keep]
+        if len(lo) == 0:
+            return slice(0, 0)
+        if np.array_equal(lo[1:], hi[:-1]):
+            return slice(int(lo[0]), int(hi[-1]))
+        lens = hi - lo
+        offsets = np.repeat(lo - np.cumsum(np.append(0, lens[:-1])), lens)
+        return offsets + np.arange(lens.sum())
+
+    def select(self, region: str | None = None, woreda: str | None = None,
+               start: date | None = None, end: date | None = None) -> pd.DataFrame:
+        """Rows for a region/woreda/date selection; contiguous selections are views."""
+        pos = self.positions(region, woreda, start, end)
+        return self.frame.iloc[pos]
+
+    def dense(self, col: str, dtype="float64", how: str | None = None) -> np.ndarray:
+        """Woreda x month array of `col` (NaN where a woreda has no row for a month).
+
+        Several rows in one woreda-month overwrite each other (the last one wins) unless
+        `how` is "sum", "mean" or "max", which combine their non-missing values.
+        """
+        out = np.full((self.n_woredas, self.n_months), np.nan, dtype=dtype)
+        vals = pd.to_numeric(self.frame[col], errors="coerce").to_numpy(dtype=dtype)
+        cell = (self.row_woreda, self.month - self.month_min)
+        if how is None:
+            out[cell] = vals
+        elif how == "max":
+            np.fmax.at(out, cell, vals)
+        elif how in ("sum", "mean"):
+            ok = np.isfinite(vals)
+            total = np.zeros_like(out)
+            count = np.zeros_like(out)
+            np.add.at(total, (cell[0][ok], cell[1][ok]), vals[ok])
+            np.add.at(count, (cell[0][ok], cell[1][ok]), 1)
+            with np.errstate(all="ignore"):
+                out = np.where(count > 0, total if how == "sum" else total / count, out)
+        else:
+            raise ValueError(f"unknown aggregation: {how}")
+        return out
+
+    def gather(self, arr: np.ndarray) -> np.ndarray:
+        """Inverse of dense: the value of a woreda x month array for each row of `frame`."""
+        return np.asarray(arr)[self.row_woreda, self.month - self.month_min]
@@ -0,0 +1,169 @@
+# panel_store.py
+# Woreda-month panel stored as Parquet, partitioned by region and year.
+# Build (or rebuild) the store from a summary CSV with:
+#   python panel_store.py "summary data _forcast.csv" panel_store
+
+import sys
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from panel_index import PanelIndex
+from rolling_stats import rolling_columns
+
+# -----------------------------
+# Paths and schema
+STORE_PATH = "panel_store"
+SEED_CSV = "summary data _forcast.csv"
+
+PARTITION_SCHEMA = pa.schema([
+    ("region", pa.string()),
+    ("year", pa.int16()),
+])
+
+PANEL_SCHEMA = pa.schema([
+    ("woreda", pa.string()),
+    ("date", pa.timestamp("ms")),
+    ("acute_cases", pa.float64()),
+    ("roll_mean", pa.float32()),
+    ("roll_std", pa.float32()),
+    ("variability_factor", pa.float32()),
+]).append(PARTITION_SCHEMA.field("region")).append(PARTITION_SCHEMA.field("year"))
+
+MEASURE_COLS = ["acute_cases", "roll_mean", "roll_std", "variability_factor"]
+
+
+# -----------------------------
+# Writing
+def to_panel_table(df: pd.DataFrame) -> pa.Table:
+    """Clean a raw region/woreda/date frame and cast it to PANEL_SCHEMA."""
+    out = df.copy()
+    out["region"] = out["region"].astype(str).str.strip().str.lower()
+    out["woreda"] = out["woreda"].astype(str).str.strip().str.lower()
+    out["date"] = pd.to_datetime(out["date"], errors="coerce")
+    out = out.dropna(subset=["date"])
+    for c in MEASURE_COLS:
+        out[c] = pd.to_numeric(out[c], errors="coerce") if c in out.columns else float("nan")
+    out["year"] = out["date"].dt.year
+    out = out.sort_values(["region", "woreda", "date"], ignore_index=True)
+    if not {"roll_mean", "roll_std", "variability_factor"} <= set(df.columns):
+        # Raw case counts only: derive the rolling columns for the whole panel in one pass
+        idx = PanelIndex(out)
+        out = idx.frame
+        out[["roll_mean", "roll_std", "variability_factor"]] = rolling_columns(idx, "acute_cases")
+    return pa.Table.from_pandas(out[PANEL_SCHEMA.names], schema=PANEL_SCHEMA, preserve_index=False)
+
+
+def write_store(df: pd.DataFrame, root: str = STORE_PATH) -> int:
+    """Write the panel as region=/year= partitions, replacing any partitions it touches."""
+    table = to_panel_table(df)
+    ds.write_dataset(
+        table,
+        root,
+        format="parquet",
+        partitioning=ds.partitioning(PARTITION_SCHEMA, flavor="hive"),
+        existing_data_behavior="delete_matching",
+    )
+    return table.num_rows
+
+
+def build_store(csv_path: str = SEED_CSV, root: str = STORE_PATH) -> int:
+    """Read a summary CSV (region, woreda, date, acute_cases, ...) and write it to the store."""
+    return write_store(pd.read_csv(csv_path), root)
+
+
+def ensure_store(root: str = STORE_PATH, seed_csv: str = SEED_CSV) -> bool:
+    """Build the store from the seed CSV if it does not exist yet."""
+    if store_exists(root):
+        return True
+    if Path(seed_csv).exists():
+        build_store(seed_csv, root)
+        return True
+    return False
+
+
+# -----------------------------
+# Reading
+def store_exists(root: str = STORE_PATH) -> bool:
+    return Path(root).is_dir() and any(Path(root).rglob("*.parquet"))
+
+
+def store_version(root: str = STORE_PATH) -> float:
+    """Latest partition mtime; use as a cache key so rebuilt stores are picked up."""
+    return max((p.stat().st_mtime for p in Path(root).rglob("*.parquet")), default=0.0)
+
+
+def open_store(root: str = STORE_PATH) -> ds.Dataset:
+    return ds.dataset(
+        root,
+        format="parquet",
+        partitioning=ds.partitioning(PARTITION_SCHEMA, flavor="hive"),
+    )
+
+
+def scan_filter(region: str | None = None,
+                woreda: str | None = None,
+                start: date | None = None,
+                end: date | None = None) -> ds.Expression | None:
+    """Dataset filter for the sidebar selection; "All"/None means no constraint.
+
+    Region and year are partition keys, so those terms prune whole directories
+    before any file is opened; woreda and date are pushed into the row-group scan.
+    """
+    terms = []
+    if region and region != "All":
+        terms.append(ds.field("region") == region)
+    if woreda and woreda != "All":
+        terms.append(ds.field("woreda") == woreda)
+    if start is not None:
+        start = pd.Timestamp(start)
+        terms.append(ds.field("year") >= start.year)
+        terms.append(ds.field("date") >= pa.scalar(start.to_pydatetime(), type=pa.timestamp("ms")))
+    if end is not None:
+        end = pd.Timestamp(end)
+        terms.append(ds.field("year") <= end.year)
+        terms.append(ds.field("date") <= pa.scalar(end.to_pydatetime(), type=pa.timestamp("ms")))
+    if not terms:
+        return None
+    expr = terms[0]
+    for t in terms[1:]:
+        expr = expr & t
+    return expr
+
+
+def load_panel(root: str = STORE_PATH,
+               region: str | None = None,
+               woreda: str | None = None,
+               start: date | None = None,
+               end: date | None = None,
+               columns: list[str] | None = None) -> pd.DataFrame:
+    """Read only the partitions and rows matching the selection, in panel order."""
+    cols = columns or ["region", "woreda", "date"] + MEASURE_COLS
+    table = open_store(root).to_table(columns=cols, filter=scan_filter(region, woreda, start, end))
+    out = table.to_pandas()
+    sort_cols = [c for c in ["region", "woreda", "date"] if c in out.columns]
+    if sort_cols:
+        out = out.sort_values(sort_cols, ignore_index=True)
+    return out
+
+
+def store_catalog(root: str = STORE_PATH) -> dict:
+    """Regions, woredas per region and the date extent, read from the key columns only."""
+    keys = open_store(root).to_table(columns=["region", "woreda", "date"]).to_pandas()
+    pairs = keys[["region", "woreda"]].drop_duplicates()
+    return {
+        "regions": sorted(pairs["region"].unique().tolist()),
+        "woredas": {r: sorted(g["woreda"].tolist()) for r, g in pairs.groupby("region")},
+        "date_min": keys["date"].min().date(),
+        "date_max": keys["date"].max().date(),
+    }
+
+
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else SEED_CSV
+    root = sys.argv[2] if len(sys.argv) > 2 else STORE_PATH
+    n = build_store(csv_path, root)
+    print(f"✅ Wrote {n} rows to {root}")
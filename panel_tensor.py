@@ -0,0 +1,260 @@
+# panel_tensor.py
+# Compact in-memory form of the integrated master panel.
+# One float32 array per feature, laid out feature x woreda x month, plus packed validity
+# bitmasks (one bit per woreda-month) and a registry that folds near-duplicate source
+# columns (MAM / MAM_climate, ADM2_PCODE / ADM2_PCODE_final2, ...) into one feature.
+# Keys and months are stored once; everything else is numeric. Rows that share a key and
+# month (e.g. placeholder codes used by several woredas) are combined by feature kind, and
+# rates are rebuilt from the combined counts.
+
+import numpy as np
+import pandas as pd
+
+from panel_index import PanelIndex, ordinal_to_timestamp, start_ordinal, end_ordinal
+
+# ADM2 key: first non-missing of these per row
+KEY_SOURCES = ("ADM2_PCODE", "ADM2_PCODE_final2", "ADM2_PCODE_final", "ADM2_PCODE_filled")
+DATE_COL = "ym_ts"
+
+# feature -> (kind, source columns in priority order; first non-missing value wins)
+# kind: "measure" (float), "count" (integer-valued) or "flag" (0/1)
+# How rows sharing a key and month combine, per kind
+KIND_AGG = {"measure": "mean", "count": "sum", "flag": "max"}
+# Rates rebuilt from their summed counts where rows were combined: rate -> (numerator, denominator, scale)
+RATES = {"TFP_rate_per10k": ("TFP_total", "population", 10000)}
+FEATURE_REGISTRY = {
+    "TFP_rate_per10k": ("measure", ("TFP_rate_per10k",)),
+    "TFP_total": ("count", ("TFP_total",)),
+    "SAM": ("count", ("SAM", "SAM_climate")),
+    "MAM": ("count", ("MAM", "MAM_climate")),
+    "GAM": ("count", ("GAM", "GAM_climate")),
+    "SAM_lag1": ("count", ("SAM_lag1",)),
+    "SAM_lag2": ("count", ("SAM_lag2",)),
+    "MAM_lag1": ("count", ("MAM_lag1",)),
+    "MAM_lag2": ("count", ("MAM_lag2",)),
+    "GAM_lag1": ("count", ("GAM_lag1",)),
+    "GAM_lag2": ("count", ("GAM_lag2",)),
+    "screened": ("count", ("X..5screened.acute.malnutrition", "X_2017.5screened.acute.malnutrition")),
+    "MAMadmitted.otp": ("count", ("MAMadmitted.otp", "MAMadmitted.otp_climate")),
+    "SAMadmitted.otp": ("count", ("SAMadmitted.otp", "SAMadmitted.otp_climate")),
+    "n_facilities_reporting": ("count", ("n_facilities_reporting", "n_facilities_reporting_climate")),
+    "population": ("count", ("population",)),
+    "low_reporting": ("flag", ("low_reporting", "low_reporting_climate")),
+    "low_climate_coverage": ("flag", ("low_climate_coverage", "low_climate_coverage_climate")),
+    "is_SAM": ("flag", ("is_SAM",)),
+    "is_MAM": ("flag", ("is_MAM",)),
+    "monthly_rain": ("measure", ("monthly_rain", "monthly_rain_climate")),
+    "monthly_rain_avg": ("measure", ("monthly_rain_avg", "monthly_rain_avg_climate")),
+    "monthly_rain_clim": ("measure", ("monthly_rain_clim",)),
+    "monthly_rain_3m": ("measure", ("monthly_rain_3m",)),
+    "rfq_mean": ("measure", ("rfq_mean", "rfq_mean_climate")),
+    "SPI_1": ("measure", ("SPI_1",)),
+    "SPI_3": ("measure", ("SPI_3",)),
+    "wrsi_value_leap": ("measure", ("wrsi_value_leap",)),
+    "monthly_rangeland_wrsI": ("measure", ("monthly_rangeland_wrsI",)),
+    "wrsI_lag1": ("measure", ("wrsI_lag1",)),
+    "wrsI_roll3": ("measure", ("wrsI_roll3",)),
+    "conflict_events": ("count", ("conflict_events", "Events")),
+    "conflict_fatalities": ("count", ("conflict_fatalities", "Fatalities")),
+    "conflict_events_3m": ("count", ("conflict_events_3m",)),
+    "conflict_events_zone": ("count", ("conflict_events_zone",)),
+    "conflict_fatalities_zone": ("count", ("conflict_fatalities_zone",)),
+    "events_3m_sum": ("count", ("events_3m_sum",)),
+    "ipc_value": ("measure", ("ipc_value",)),
+    "ipc_severe_flag": ("flag", ("ipc_severe_flag",)),
+}
+
+# Bookkeeping columns that are keys, copies of the date, or per-source QA counters
+_SKIP = {
+    DATE_COL, "Year", "Month", "month", "year", "ym", "ym_climate", "woreda_key", "woreda_key_norm",
+    "woreda_key_climate", "facility_pcode", "ADM2_PCODE_orig", "ADM2_PCODE_final2_conflict",
+    "n_pixels_mean", "n_pixels_mean_climate", "n_pixels_mean_clim", "monthly_rain_avg_clim", "rfq_mean_clim",
+    "monthly_rain_missing", "monthly_rain_avg_missing", "rfq_mean_missing", "n_pixels_mean_missing",
+}
+
+
+def coalesce(df: pd.DataFrame, sources) -> pd.Series | None:
+    """First non-missing value across `sources` (those present in df), or None if none are."""
+    cols = [c for c in sources if c in df.columns]
+    if not cols:
+        return None
+    out = _numeric(df[cols[0]])
+    for c in cols[1:]:
+        out = out.fillna(_numeric(df[c]))
+    return out
+
+
+def _numeric(s: pd.Series) -> pd.Series:
+    """float64 view of a measure or (nullable) bool flag column."""
+    if pd.api.types.is_bool_dtype(s):
+        return s.astype("float64")
+    return pd.to_numeric(s, errors="coerce").astype("float64")
+
+
+def normalize_key(s: pd.Series) -> pd.Series:
+    """Upper-case, stripped ADM2 codes; missing stays missing."""
+    out = s.astype("string").str.strip().str.upper()
+    return out.mask(out.isin(["", "NAN", "NONE"]))
+
+
+class PanelTensor:
+    """Woreda x month x feature panel as float32 arrays with validity bitmasks.
+
+    values[f] is a woreda x month array (NaN where missing); valid[f] packs one bit per
+    woreda-month along the month axis; present packs which woreda-months had a row.
+    """
+
+    def __init__(self, woredas, month_min: int, features: list, kinds: list,
+                 values: np.ndarray, present: np.ndarray, key_col: str | None = None,
+                 n_collisions: int = 0):
+        self.woreda_names = np.asarray(woredas, dtype=object)
+        self.month_min = int(month_min)
+        self.features = list(features)
+        self.kinds = dict(zip(self.features, kinds))
+        self._pos = {f: i for i, f in enumerate(self.features)}
+        self.values = values                                         # F x W x T float32
+        self.n_months = values.shape[2] if values.ndim == 3 else present.shape[1]
+        self.valid = np.packbits(np.isfinite(values), axis=-1)      # F x W x ceil(T/8)
+        self.present = np.packbits(present, axis=-1)                 # W x ceil(T/8)
+        self.key_col = key_col
+        self.n_collisions = int(n_collisions)                        # rows merged into another row's key-month
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, registry: dict = FEATURE_REGISTRY,
+                   date_col: str = DATE_COL, key_sources=KEY_SOURCES,
+                   extra: bool = True) -> "PanelTensor":
+        """Build from the long master table; unregistered numeric columns are kept as measures if `extra`.
+
+        Rows sharing a key and month are combined per feature kind (KIND_AGG); their number
+        is kept in n_collisions.
+        """
+        key_cols = [c for c in key_sources if c in df.columns]
+        data = pd.DataFrame({date_col: pd.to_datetime(df[date_col], errors="coerce")}, index=df.index)
+        if key_cols:
+            key = normalize_key(df[key_cols[0]])
+            for c in key_cols[1:]:
+                key = key.fillna(normalize_key(df[c]))
+            data["_key"] = key
+        else:
+            data["_key"] = "ALL"
+
+        features, kinds, used = [], [], set(key_cols)
+        for name, (kind, sources) in registry.items():
+            col = coalesce(df, sources)
+            used.update(sources)
+            if col is not None:
+                data[name] = col
+                features.append(name)
+                kinds.append(kind)
+        if extra:
+            for c in df.columns:
+                if c in used or c in _SKIP or c in data.columns:
+                    continue
+                if pd.api.types.is_numeric_dtype(df[c]) or pd.api.types.is_bool_dtype(df[c]):
+                    data[c] = _numeric(df[c])
+                    features.append(c)
+                    kinds.append("measure")
+
+        idx = PanelIndex(data, woreda_col="_key", date_col=date_col, region_col=None)
+        values = np.full((len(features), idx.n_woredas, idx.n_months), np.nan, dtype="float32")
+        for i, f in enumerate(features):
+            values[i] = idx.dense(f, dtype="float32", how=KIND_AGG[kinds[i]])
+        rows = np.zeros((idx.n_woredas, idx.n_months), dtype="int32")
+        np.add.at(rows, (idx.row_woreda, idx.month - idx.month_min), 1)
+        present = rows > 0
+        for rate, (num, den, scale) in RATES.items():
+            if {rate, num, den}.issubset(features):
+                # Averaging the rate would not match the summed counts it is made from
+                n, d = values[features.index(num)], values[features.index(den)]
+                combined = (rows > 1) & (d > 0)
+                values[features.index(rate)][combined] = (n[combined] / d[combined]) * scale
+        return cls(idx.woreda_names, idx.month_min, features, kinds, values, present,
+                   key_col=key_cols[0] if key_cols else None, n_collisions=len(idx) - int(present.sum()))
+
+    # -- shape / registry
+    @property
+    def n_woredas(self) -> int:
+        return len(self.woreda_names)
+
+    @property
+    def columns(self) -> list:
+        return self.features
+
+    def __contains__(self, feature: str) -> bool:
+        return feature in self._pos
+
+    @property
+    def months(self) -> pd.DatetimeIndex:
+        return ordinal_to_timestamp(np.arange(self.month_min, self.month_min + self.n_months))
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.valid.nbytes + self.present.nbytes
+
+    # -- access
+    def feature(self, name: str) -> np.ndarray:
+        """Woreda x month float32 view of one feature."""
+        return self.values[self._pos[name]]
+
+    def dense(self, name: str, dtype="float64") -> np.ndarray:
+        """Woreda x month copy of one feature (same contract as PanelIndex.dense)."""
+        return self.values[self._pos[name]].astype(dtype)
+
+    def valid_mask(self, name: str) -> np.ndarray:
+        return np.unpackbits(self.valid[self._pos[name]], axis=-1, count=self.n_months).astype(bool)
+
+    def present_mask(self) -> np.ndarray:
+        return np.unpackbits(self.present, axis=-1, count=self.n_months).astype(bool)
+
+    def woreda_ids(self, woredas=None) -> np.ndarray:
+        if woredas is None:
+            return np.arange(self.n_woredas)
+        pos = {w: i for i, w in enumerate(self.woreda_names)}
+        return np.array([pos[w] for w in woredas if w in pos], dtype="int64")
+
+    def month_range(self, start=None, end=None) -> slice:
+        """Month-axis slice for a date range (inclusive, month starts)."""
+        m0 = 0 if start is None else max(start_ordinal(start) - self.month_min, 0)
+        m1 = self.n_months if end is None else min(end_ordinal(end) - self.month_min + 1, self.n_months)
+        return slice(m0, max(m1, m0))
+
+    def to_frame(self, features=None, woredas=None, start=None, end=None) -> pd.DataFrame:
+        """Long table (key, ym_ts, features) for the woreda-months that had a row, in panel order."""
+        features = [f for f in (features or self.features) if f in self]
+        ids = self.woreda_ids(woredas)
+        ms = self.month_range(start, end)
+        present = self.present_mask()[ids, ms]
+        w, t = np.nonzero(present)
+        out = pd.DataFrame({
+            self.key_col or "ADM2_PCODE": self.woreda_names[ids[w]],
+            DATE_COL: ordinal_to_timestamp(t + ms.start + self.month_min),
+        })
+        for f in features:
+            out[f] = self.values[self._pos[f]][ids[w], t + ms.start]
+        return out
+
+    # -- summaries
+    def coverage(self, features=None, by_year: bool = False) -> pd.DataFrame:
+        """Fraction of existing woreda-months with a value, overall or by calendar year."""
+        features = [f for f in (features or self.features) if f in self]
+        present = self.present_mask()
+        if not by_year:
+            n = present.sum()
+            return pd.DataFrame({f: [self.valid_mask(f).sum() / n if n else np.nan] for f in features},
+                                index=["coverage_fraction"])
+        years = self.months.year.to_numpy()
+        uy, yi = np.unique(years, return_inverse=True)
+        rows = np.zeros(len(uy))
+        np.add.at(rows, yi, present.sum(axis=0))
+        out = {}
+        for f in features:
+            per_month = self.valid_mask(f).sum(axis=0)
+            num = np.zeros(len(uy))
+            np.add.at(num, yi, per_month)
+            with np.errstate(all="ignore"):
+                out[f] = num / rows
+        return pd.DataFrame(out, index=pd.Index(uy, name="year"))[rows > 0]
+
+    def nunique(self, name: str) -> int:
+        v = self.feature(name)
+        return len(np.unique(v[np.isfinite(v)]))
@@ -0,0 +1,92 @@
+# prefix_cube.py
+# Cumulative-sum cube over a woreda-month panel for date-range totals.
+# For each measure (and the row count) it keeps
+#   month prefix   woreda x (months + 1): a woreda's total over months m0..m1 is
+#                  P[w, m1 + 1] - P[w, m0]
+#   grid prefix    (woredas + 1) x (months + 1), also summed over woredas in panel order;
+#                  regions own contiguous woreda ranges, so a region's or the nation's
+#                  total is four lookups
+# Built once per timeseries; KPIs, the bubble map and the matrix heatmap all read it
+# instead of re-aggregating the filtered rows.
+
+import numpy as np
+import pandas as pd
+
+from panel_index import PanelIndex
+
+ROWS = "rows"                      # pseudo-measure: number of panel rows
+
+
+class PrefixCube:
+    """Date-range sums per woreda, region or nation in O(1) lookups each."""
+
+    def __init__(self, idx: PanelIndex, measures=("acute_cases",)):
+        self.month_min, self.n_months = idx.month_min, idx.n_months
+        self.woreda_names, self.woreda_regions = idx.woreda_names, idx.woreda_regions
+        self.region_names, self.region_start, self.region_end = idx.region_names, idx.region_start, idx.region_end
+        W, T = idx.n_woredas, idx.n_months
+        rows = np.zeros((W, T))
+        np.add.at(rows, (idx.row_woreda, idx.month - idx.month_min), 1.0)
+        grids = {ROWS: rows}
+        for m in measures:
+            if m in idx.frame.columns:
+                # Sub-monthly / duplicate rows add up, as in a groupby sum
+                grids[m] = np.nan_to_num(idx.dense(m, how="sum"))
+        self.measures = [m for m in grids if m != ROWS]
+        self._month, self._grid = {}, {}
+        for m, g in grids.items():
+            p = np.zeros((W, T + 1))
+            np.cumsum(g, axis=1, out=p[:, 1:])
+            q = np.zeros((W + 1, T + 1))
+            np.cumsum(p, axis=0, out=q[1:])
+            self._month[m], self._grid[m] = p, q
+
+    @classmethod
+    def from_index(cls, idx: PanelIndex, measures=("acute_cases",)) -> "PrefixCube":
+        return cls(idx, measures)
+
+    def _span(self, m0: int | None, m1: int | None):
+        """Prefix columns (a, b) for month ordinals m0..m1, or None if the range is empty."""
+        a = 0 if m0 is None else min(max(m0 - self.month_min, 0), self.n_months)
+        b = self.n_months if m1 is None else min(max(m1 - self.month_min + 1, 0), self.n_months)
+        return (a, b) if b > a else None
+
+    def woreda_totals(self, measure: str, m0: int | None = None, m1: int | None = None, ids=None) -> np.ndarray:
+        ids = np.arange(len(self.woreda_names)) if ids is None else np.asarray(ids, dtype="int64")
+        span = self._span(m0, m1)
+        if span is None:
+            return np.zeros(len(ids))
+        p = self._month[measure]
+        return p[ids, span[1]] - p[ids, span[0]]
+
+    def block_total(self, measure: str, w0: int, w1: int, m0: int | None = None, m1: int | None = None) -> float:
+        """Total over woredas w0..w1-1 (panel order) and months m0..m1."""
+        span = self._span(m0, m1)
+        if span is None or w1 <= w0:
+            return 0.0
+        q, (a, b) = self._grid[measure], span
+        return float(q[w1, b] - q[w0, b] - q[w1, a] + q[w0, a])
+
+    def region_totals(self, measure: str, m0: int | None = None, m1: int | None = None) -> np.ndarray:
+        return np.array([self.block_total(measure, s, e, m0, m1) for s, e in zip(self.region_start, self.region_end)])
+
+    def total(self, measure: str, m0: int | None = None, m1: int | None = None, ids=None) -> float:
+        """Total over a woreda selection: four lookups when the ids are contiguous (nation, region)."""
+        if ids is None:
+            return self.block_total(measure, 0, len(self.woreda_names), m0, m1)
+        ids = np.asarray(ids, dtype="int64")
+        if len(ids) == 0:
+            return 0.0
+        if ids[-1] - ids[0] + 1 == len(ids):
+            return self.block_total(measure, int(ids[0]), int(ids[-1]) + 1, m0, m1)
+        return float(self.woreda_totals(measure, m0, m1, ids).sum())
+
+    def frame(self, m0: int | None = None, m1: int | None = None, ids=None, measures=None) -> pd.DataFrame:
+        """region, woreda, rows and measure totals for selected woredas with rows in the range."""
+        ids = np.arange(len(self.woreda_names)) if ids is None else np.asarray(ids, dtype="int64")
+        rows = self.woreda_totals(ROWS, m0, m1, ids)
+        out = pd.DataFrame({"region": self.woreda_regions[ids], "woreda": self.woreda_names[ids],
+                            ROWS: rows.astype("int64")})
+        for m in (self.measures if measures is None else measures):
+            out[m] = self.woreda_totals(m, m0, m1, ids)
+        return out[rows > 0].reset_index(drop=True)
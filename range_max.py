@@ -0,0 +1,61 @@
+# range_max.py
+# Per-woreda range maximum over month ordinals (sparse table).
+# Level k holds, for every woreda and month t, the max over months t .. t + 2^k - 1, so
+# the peak of any [m0, m1] range is the max of two precomputed columns: O(woredas)
+# per query however long the range, with no pass over the panel rows. Top-k then
+# partitions that one vector.
+
+import numpy as np
+
+from panel_index import PanelIndex
+
+
+class RangeMax:
+    """Sparse table over a woreda x month array (NaN = missing month)."""
+
+    def __init__(self, values: np.ndarray, month_min: int = 0):
+        values = np.asarray(values, dtype="float64")
+        self.month_min = month_min
+        self.n_woredas, self.n_months = values.shape
+        level = np.where(np.isfinite(values), values, -np.inf)
+        self.levels = [level]
+        span = 1
+        while 2 * span <= self.n_months:
+            level = np.maximum(level[:, :-span], level[:, span:])
+            self.levels.append(level)
+            span *= 2
+
+    @classmethod
+    def from_index(cls, idx: PanelIndex, col: str) -> "RangeMax":
+        # Several rows in one woreda-month: keep their peak, as groupby().max() does
+        return cls(idx.dense(col, how="max"), idx.month_min)
+
+    def query(self, m0: int | None = None, m1: int | None = None, ids=None) -> np.ndarray:
+        """Max per woreda (NaN if nothing reported) over month ordinals m0..m1 inclusive."""
+        ids = np.arange(self.n_woredas) if ids is None else np.asarray(ids, dtype="int64")
+        lo = 0 if m0 is None else max(m0 - self.month_min, 0)
+        hi = self.n_months - 1 if m1 is None else min(m1 - self.month_min, self.n_months - 1)
+        if hi < lo or len(ids) == 0:
+            return np.full(len(ids), np.nan)
+        k = int(hi - lo + 1).bit_length() - 1
+        lvl = self.levels[k]
+        peak = np.maximum(lvl[ids, lo], lvl[ids, hi - (1 << k) + 1])
+        return np.where(np.isfinite(peak), peak, np.nan)
+
+    def top_k(self, k: int, m0: int | None = None, m1: int | None = None, ids=None, names=None) -> tuple:
+        """(woreda ids, peaks) of the k highest peaks in m0..m1, highest first.
+
+        Woredas with no data in the range are left out; ties go to the name (or id) that sorts first.
+        """
+        ids = np.arange(self.n_woredas) if ids is None else np.asarray(ids, dtype="int64")
+        peak = self.query(m0, m1, ids)
+        ok = np.isfinite(peak)
+        ids, peak = ids[ok], peak[ok]
+        if k < len(ids):
+            # Everything tied with the k-th value stays in, so the tie-break below is exact
+            kth = np.partition(-peak, k - 1)[k - 1]
+            keep = -peak <= kth
+            ids, peak = ids[keep], peak[keep]
+        tie = ids if names is None else np.asarray(names)[ids]
+        order = np.lexsort((tie, -peak))[:k]
+        return ids[order], peak[order]
@@ -0,0 +1,107 @@
+# reconcile.py
+# Coherent woreda -> region -> national forecasts.
+# The hierarchy is a sparse summing matrix S (series x woredas): one national row, one
+# row per region and an identity block for the woredas. Base forecasts for every series
+# (columns = horizons, models, ... stacked side by side) are reconciled in one pass:
+#   bottom_up  S @ woreda forecasts
+#   top_down   national forecast split by historical woreda shares, then S @ shares
+#   mint       minimum-trace (GLS) projection with a diagonal error covariance W, written
+#              with the aggregation constraints U'y = 0 so the only dense solve is the
+#              (regions + 1) x (regions + 1) system U'WU
+# Weights for mint: "ols" (identity), "structural" (number of woredas under each series)
+# or per-series error variances (e.g. the base models' one-step sigma squared).
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+METHODS = ("bottom_up", "top_down", "mint")
+
+
+class Hierarchy:
+    """National / region / woreda summing structure for a set of woredas."""
+
+    def __init__(self, woredas, regions, national: str = "national"):
+        self.woredas = np.asarray(woredas, dtype=object)
+        woreda_regions = np.asarray(regions, dtype=object)
+        self.region_names, r = np.unique(woreda_regions.astype(str), return_inverse=True)
+        W, R = len(self.woredas), len(self.region_names)
+        cols = np.arange(W)
+        self.S = sp.vstack([
+            sp.csr_matrix(np.ones((1, W))),
+            sp.csr_matrix((np.ones(W), (r, cols)), shape=(R, W)),
+            sp.identity(W, format="csr"),
+        ]).tocsr()                                                    # (1 + R + W) x W
+        self.names = np.concatenate([[national], self.region_names, self.woredas]).astype(object)
+        self.levels = np.array(["national"] + ["region"] * R + ["woreda"] * W, dtype=object)
+        self.region_of = np.concatenate([[None], self.region_names, self.region_names[r]]).astype(object)
+        self.n_aggregate = 1 + R
+
+    def __len__(self) -> int:
+        return self.S.shape[0]
+
+    @property
+    def C(self) -> sp.csr_matrix:
+        """Aggregate rows of S (national and regions) x woredas."""
+        return self.S[:self.n_aggregate]
+
+    def aggregate(self, bottom: np.ndarray, how: str = "sum") -> np.ndarray:
+        """Every series from woreda-level values (woreda x ...): sums (NaN only if all missing) or means."""
+        flat = np.asarray(bottom, dtype="float64").reshape(len(self.woredas), -1)
+        ok = np.isfinite(flat)
+        total = self.S @ np.where(ok, flat, 0.0)
+        count = self.S @ ok.astype("float64")
+        with np.errstate(all="ignore"):
+            out = np.where(count > 0, total / count if how == "mean" else total, np.nan)
+        return out.reshape((len(self),) + np.shape(bottom)[1:])
+
+    # -- reconciliation (base is series x k; returns series x k)
+    def bottom_up(self, base: np.ndarray) -> np.ndarray:
+        return self.S @ base[self.n_aggregate:]
+
+    def top_down(self, base: np.ndarray, history: np.ndarray) -> np.ndarray:
+        """Split the national forecast by average historical shares (history is woreda x months)."""
+        with np.errstate(all="ignore"):
+            avg = np.nan_to_num(np.nanmean(np.where(np.isfinite(history), history, np.nan), axis=1))
+        share = avg / avg.sum() if avg.sum() > 0 else np.full(len(avg), 1.0 / max(len(avg), 1))
+        return self.S @ (share[:, None] * base[:1])
+
+    def mint(self, base: np.ndarray, weights="structural") -> np.ndarray:
+        """GLS projection onto coherent forecasts: y - W U (U'WU)^-1 U'y with U' = [I, -C]."""
+        if isinstance(weights, str):
+            w = np.ones(len(self)) if weights == "ols" else np.asarray(self.S.sum(axis=1)).ravel()
+        else:
+            w = np.asarray(weights, dtype="float64")
+            w = np.where(np.isfinite(w) & (w > 0), w, np.nanmedian(w[w > 0]) if (w > 0).any() else 1.0)
+        A = self.n_aggregate
+        Ut = sp.hstack([sp.identity(A, format="csr"), -self.C]).tocsr()     # A x n
+        Wd = sp.diags(w)
+        M = (Ut @ Wd @ Ut.T).toarray()                                     # A x A
+        gap = Ut @ base                                                     # incoherence, A x k
+        return base - Wd @ (Ut.T @ np.linalg.solve(M, gap))
+
+    def reconcile(self, base: np.ndarray, method: str = "mint", weights="structural",
+                  history: np.ndarray | None = None) -> np.ndarray:
+        base = np.asarray(base, dtype="float64")
+        flat = base.reshape(len(self), -1)
+        if method == "bottom_up":
+            out = self.bottom_up(flat)
+        elif method == "top_down":
+            if history is None:
+                raise ValueError("top_down reconciliation needs woreda history")
+            out = self.top_down(flat, history)
+        elif method == "mint":
+            out = self.mint(flat, weights)
+        else:
+            raise ValueError(f"unknown reconciliation method: {method}")
+        return np.asarray(out).reshape(base.shape)
+
+    def incoherence(self, values: np.ndarray) -> float:
+        """Largest |aggregate - sum of its woredas| (0 for coherent forecasts)."""
+        flat = np.asarray(values, dtype="float64").reshape(len(self), -1)
+        gap = flat[:self.n_aggregate] - self.C @ flat[self.n_aggregate:]
+        return float(np.nanmax(np.abs(gap))) if gap.size else 0.0
+
+    def frame(self) -> pd.DataFrame:
+        """One row per series: level, name and region."""
+        return pd.DataFrame({"level": self.levels, "name": self.names, "region": self.region_of})
@@ -0,0 +1,110 @@
+# rolling_stats.py
+# Rolling mean / std / variability factor for every woreda at once.
+# Keeps running prefix sums (count, sum, sum of squares) along the month axis of the
+# woreda x month panel, so any window is two column lookups per month, and appending
+# a month extends the prefix sums by one column in O(woredas).
+
+import numpy as np
+import pandas as pd
+
+from panel_index import PanelIndex
+
+# Definition used for the roll_mean / roll_std / variability_factor columns shipped
+# with the forecast CSVs: 6-month window, at least 3 months, sample std (ddof=1).
+ROLL_WINDOW = 6
+ROLL_MIN_PERIODS = 3
+
+
+class RollingPanel:
+    """Prefix sums over a woreda x month array (NaN = missing month)."""
+
+    def __init__(self, values: np.ndarray, capacity: int | None = None):
+        values = np.asarray(values, dtype="float64")
+        n_w, n_t = values.shape
+        # Per-woreda shift keeps the sum-of-squares well conditioned for large counts
+        with np.errstate(all="ignore"):
+            self.offset = np.nan_to_num(np.nanmean(values, axis=1)) if n_t else np.zeros(n_w)
+        cap = max(capacity or 0, n_t + 1, 2 * n_t)
+        self._n = np.zeros((n_w, cap), dtype="int32")
+        self._s1 = np.zeros((n_w, cap))
+        self._s2 = np.zeros((n_w, cap))
+        self.n_months = 0
+        self._extend(values)
+
+    @classmethod
+    def from_index(cls, idx: PanelIndex, col: str) -> "RollingPanel":
+        return cls(idx.dense(col))
+
+    # -- updates
+    def _extend(self, block: np.ndarray):
+        k = block.shape[1]
+        need = self.n_months + 1 + k
+        if need > self._n.shape[1]:
+            cap = max(need, 2 * self._n.shape[1])
+            for name in ("_n", "_s1", "_s2"):
+                old = getattr(self, name)
+                grown = np.zeros((old.shape[0], cap), dtype=old.dtype)
+                grown[:, :old.shape[1]] = old
+                setattr(self, name, grown)
+        ok = np.isfinite(block)
+        x = np.where(ok, block - self.offset[:, None], 0.0)
+        t0 = self.n_months
+        self._n[:, t0 + 1:t0 + 1 + k] = self._n[:, t0:t0 + 1] + np.cumsum(ok, axis=1)
+        self._s1[:, t0 + 1:t0 + 1 + k] = self._s1[:, t0:t0 + 1] + np.cumsum(x, axis=1)
+        self._s2[:, t0 + 1:t0 + 1 + k] = self._s2[:, t0:t0 + 1] + np.cumsum(x * x, axis=1)
+        self.n_months += k
+
+    def append(self, column) -> None:
+        """Add the next month for every woreda (NaN where not reported); O(woredas)."""
+        self._extend(np.asarray(column, dtype="float64").reshape(-1, 1))
+
+    # -- queries
+    def _window(self, window: int, t0: int = 0, t1: int | None = None):
+        """Count, shifted sum and shifted sum of squares for windows ending at months t0..t1-1."""
+        t1 = self.n_months if t1 is None else t1
+        hi = np.arange(t0, t1) + 1
+        lo = np.maximum(hi - window, 0)
+        n = self._n[:, hi] - self._n[:, lo]
+        s1 = self._s1[:, hi] - self._s1[:, lo]
+        s2 = self._s2[:, hi] - self._s2[:, lo]
+        return n, s1, s2
+
+    def stats(self, window: int, min_periods: int | None = None, ddof: int = 1,
+              t0: int = 0, t1: int | None = None) -> dict:
+        """{'mean', 'std', 'variability_factor'} arrays (woreda x month) for windows ending at t0..t1-1."""
+        min_periods = window if min_periods is None else min_periods
+        n, s1, s2 = self._window(window, t0, t1)
+        with np.errstate(all="ignore"):
+            mean_c = s1 / n
+            var = np.maximum(s2 - s1 * mean_c, 0.0) / (n - ddof)
+            mean = mean_c + self.offset[:, None]
+            # Undo the shift's roundoff so all-zero windows give exactly 0 (vf is NaN there)
+            mean[np.abs(mean) <= 1e-12 * (1 + np.abs(self.offset[:, None]))] = 0.0
+            std = np.sqrt(var)
+            # Cancellation noise left when every value in the window is identical
+            std[var * (n - ddof) <= 1e-10 * s2] = 0.0
+        ok = n >= max(min_periods, 1)
+        mean = np.where(ok, mean, np.nan)
+        std = np.where(ok & (n > ddof), std, np.nan)
+        with np.errstate(all="ignore"):
+            vf = np.where(mean != 0, std / mean, np.nan)
+        return {"mean": mean, "std": std, "variability_factor": vf}
+
+    def mean(self, window: int, min_periods: int | None = None) -> np.ndarray:
+        return self.stats(window, min_periods)["mean"]
+
+    def latest(self, window: int, min_periods: int | None = None, ddof: int = 1) -> dict:
+        """Stats for the most recent month only: one column per statistic, O(woredas)."""
+        out = self.stats(window, min_periods, ddof, t0=self.n_months - 1)
+        return {k: v[:, 0] for k, v in out.items()}
+
+
+def rolling_columns(idx: PanelIndex, col: str, window: int = ROLL_WINDOW,
+                    min_periods: int | None = ROLL_MIN_PERIODS) -> pd.DataFrame:
+    """roll_mean / roll_std / variability_factor aligned to idx.frame rows."""
+    stats = RollingPanel.from_index(idx, col).stats(window, min_periods)
+    return pd.DataFrame({
+        "roll_mean": idx.gather(stats["mean"]),
+        "roll_std": idx.gather(stats["std"]),
+        "variability_factor": idx.gather(stats["variability_factor"]),
+    }, index=idx.frame.index)
@@ -0,0 +1,237 @@
+# spatial_join.py
+# Raw point events (ACLED-style CSV / Parquet exports) -> woreda and zone months.
+# Woreda polygons go into one shapely STRtree; each chunk of events becomes a single
+# bulk point-in-polygon query. Event counts and fatality sums are folded into
+# polygon x month arrays with bincount, so memory depends only on the number of
+# woredas and months, never on the size of the input file. The totals (and the zone
+# totals broadcast back to every woreda in the zone) are written into the feature
+# panel as a patch version, where conflict_events_3m / events_3m_sum are re-derived.
+#
+#   python spatial_join.py events.csv [ethiopia_woreda.geojson] [woreda_month_features]
+
+import sys
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import shapely
+
+from features import DATE_COL, KEY_COL, STORE_PATH, append_months, read_features, store_versions
+from name_resolver import norm_names
+from panel_index import month_ordinal, ordinal_to_timestamp
+
+BOUNDARY_PATH = "ethiopia_woreda.geojson"
+CHUNK_ROWS = 500_000
+
+# Attribute / column names tried in order (first present wins)
+NAME_COLS = ("woreda", "Woreda", "NAME_2", "ADM2_EN", "admin2Name", "DIST_NAME", "WOREDANAME")
+CODE_COLS = ("ADM2_PCODE", "admin2Pcode", "ADM3_PCODE", "pcode")
+ZONE_COLS = ("zone", "Zone", "ZONE", "ZONENAME", "ZONE_NAME", "Z_NAME")
+LAT_COLS = ("latitude", "lat", "LATITUDE", "Latitude")
+LON_COLS = ("longitude", "lon", "lng", "LONGITUDE", "Longitude")
+EVENT_DATE_COLS = ("event_date", "EVENT_DATE", "date", "Date")
+FATALITY_COLS = ("fatalities", "FATALITIES", "Fatalities", "deaths")
+
+
+def _first(columns, candidates, required: bool = True) -> str | None:
+    for c in candidates:
+        if c in columns:
+            return c
+    if required:
+        raise KeyError(f"none of {candidates} found in columns")
+    return None
+
+
+# -----------------------------
+# Polygon index
+class PolygonIndex:
+    """Woreda polygons in an STRtree with their panel key, zone and pcode."""
+
+    def __init__(self, gdf: gpd.GeoDataFrame, key_col: str | None = None, zone_col: str | None = None,
+                 code_col: str | None = None):
+        gdf = gdf.to_crs(4326) if gdf.crs is not None else gdf.set_crs(4326)
+        gdf = gdf[gdf.geometry.notna() & ~gdf.geometry.is_empty].reset_index(drop=True)
+        key_col = key_col or _first(gdf.columns, NAME_COLS)
+        zone_col = zone_col or _first(gdf.columns, ZONE_COLS, required=False)
+        code_col = code_col or _first(gdf.columns, CODE_COLS, required=False)
+        self.geoms = gdf.geometry.to_numpy()
+        shapely.prepare(self.geoms)
+        self.tree = shapely.STRtree(self.geoms)
+        self.keys = norm_names(gdf[key_col]).to_numpy(dtype=object)
+        self.zones = norm_names(gdf[zone_col]).to_numpy(dtype=object) if zone_col else None
+        self.codes = gdf[code_col].astype(str).str.strip().str.upper().to_numpy(dtype=object) if code_col else None
+
+    @classmethod
+    def from_file(cls, path: str = BOUNDARY_PATH, **kwargs) -> "PolygonIndex":
+        """GeoJSON / shapefile, or a GeoParquet boundary cache level."""
+        gdf = gpd.read_parquet(path) if str(path).lower().endswith(".parquet") else gpd.read_file(path)
+        return cls(gdf, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.geoms)
+
+    def locate(self, lon, lat) -> np.ndarray:
+        """Polygon position for every point (-1 outside all polygons or missing coordinates).
+
+        Points on a shared border match both neighbours; the lower polygon position wins.
+        """
+        lon = np.asarray(lon, dtype="float64")
+        lat = np.asarray(lat, dtype="float64")
+        out = np.full(len(lon), len(self.geoms), dtype="int64")
+        ok = np.flatnonzero(np.isfinite(lon) & np.isfinite(lat))
+        if len(ok) and len(self.geoms):
+            pt, poly = self.tree.query(shapely.points(lon[ok], lat[ok]), predicate="intersects")
+            np.minimum.at(out, ok[pt], poly)
+        out[out == len(self.geoms)] = -1
+        return out
+
+    def nearest(self, lon, lat, max_distance: float | None = None) -> tuple:
+        """(polygon position, distance in degrees) of the closest polygon; -1 / inf beyond max_distance."""
+        lon = np.asarray(lon, dtype="float64")
+        lat = np.asarray(lat, dtype="float64")
+        pos = np.full(len(lon), -1, dtype="int64")
+        dist = np.full(len(lon), np.inf)
+        ok = np.flatnonzero(np.isfinite(lon) & np.isfinite(lat))
+        if len(ok) and len(self.geoms):
+            (pt, poly), d = self.tree.query_nearest(shapely.points(lon[ok], lat[ok]), max_distance=max_distance,
+                                                    return_distance=True, all_matches=False)
+            pos[ok[pt]], dist[ok[pt]] = poly, d
+        return pos, dist
+
+
+# -----------------------------
+# Streaming aggregation
+def iter_event_chunks(path, chunk_rows: int = CHUNK_ROWS):
+    """(lon, lat, dates, fatalities) arrays for each chunk of a CSV or Parquet event file."""
+    if str(path).lower().endswith(".parquet"):
+        pf = pq.ParquetFile(path)
+        names = pf.schema_arrow.names
+        cols = [_first(names, LON_COLS), _first(names, LAT_COLS), _first(names, EVENT_DATE_COLS),
+                _first(names, FATALITY_COLS, required=False)]
+        batches = (b.to_pandas() for b in pf.iter_batches(batch_size=chunk_rows, columns=[c for c in cols if c]))
+    else:
+        names = pd.read_csv(path, nrows=0).columns
+        cols = [_first(names, LON_COLS), _first(names, LAT_COLS), _first(names, EVENT_DATE_COLS),
+                _first(names, FATALITY_COLS, required=False)]
+        batches = pd.read_csv(path, usecols=[c for c in cols if c], chunksize=chunk_rows)
+    lon_c, lat_c, date_c, fat_c = cols
+    for chunk in batches:
+        fat = pd.to_numeric(chunk[fat_c], errors="coerce").to_numpy(dtype="float64") if fat_c else None
+        yield (pd.to_numeric(chunk[lon_c], errors="coerce").to_numpy(dtype="float64"),
+               pd.to_numeric(chunk[lat_c], errors="coerce").to_numpy(dtype="float64"),
+               chunk[date_c], fat)
+
+
+class EventAggregator:
+    """Event counts and fatality sums per polygon x month, grown as new months arrive."""
+
+    def __init__(self, index: PolygonIndex):
+        self.index = index
+        self.month_min = 0
+        self.counts = np.zeros((len(index), 0), dtype="int64")
+        self.fatalities = np.zeros((len(index), 0), dtype="float64")
+        self.n_read = self.n_unmatched = self.n_undated = 0
+
+    @property
+    def n_months(self) -> int:
+        return self.counts.shape[1]
+
+    def _grow(self, lo: int, hi: int) -> None:
+        """Pad the month axis so it spans ordinals lo..hi."""
+        if self.n_months == 0:
+            self.month_min = lo
+            self.counts = np.zeros((len(self.index), hi - lo + 1), dtype="int64")
+            self.fatalities = np.zeros((len(self.index), hi - lo + 1))
+            return
+        before = max(self.month_min - lo, 0)
+        after = max(hi - (self.month_min + self.n_months - 1), 0)
+        if before or after:
+            self.counts = np.pad(self.counts, ((0, 0), (before, after)))
+            self.fatalities = np.pad(self.fatalities, ((0, 0), (before, after)))
+            self.month_min -= before
+
+    def add(self, lon, lat, dates, fatalities=None) -> None:
+        poly = self.index.locate(lon, lat)
+        months = month_ordinal(dates)
+        dated = months >= 0
+        ok = (poly >= 0) & dated
+        self.n_read += len(poly)
+        self.n_undated += int((~dated).sum())
+        self.n_unmatched += int(((poly < 0) & dated).sum())
+        if not ok.any():
+            return
+        self._grow(int(months[ok].min()), int(months[ok].max()))
+        T = self.n_months
+        flat = poly[ok] * T + (months[ok] - self.month_min)
+        size = len(self.index) * T
+        self.counts += np.bincount(flat, minlength=size).reshape(-1, T)
+        if fatalities is not None:
+            w = np.nan_to_num(np.asarray(fatalities, dtype="float64")[ok])
+            self.fatalities += np.bincount(flat, weights=w, minlength=size).reshape(-1, T)
+
+    def add_file(self, path, chunk_rows: int = CHUNK_ROWS) -> "EventAggregator":
+        for chunk in iter_event_chunks(path, chunk_rows):
+            self.add(*chunk)
+        return self
+
+    def panel_rows(self) -> pd.DataFrame:
+        """One row per woreda x month: woreda totals and, when zones are known, zone totals."""
+        keys, inv = np.unique(self.index.keys.astype(str), return_inverse=True)
+        K, T = len(keys), self.n_months
+        # Multi-part woredas stored as several polygons collapse onto their key
+        events = np.zeros((K, T), dtype="int64")
+        fatal = np.zeros((K, T))
+        np.add.at(events, inv, self.counts)
+        np.add.at(fatal, inv, self.fatalities)
+        out = {
+            KEY_COL: np.repeat(keys, T),
+            DATE_COL: np.tile(ordinal_to_timestamp(self.month_min + np.arange(T)).to_numpy(), K),
+            "conflict_events": events.ravel().astype("float64"),
+            "conflict_fatalities": fatal.ravel(),
+        }
+        if self.index.zones is not None:
+            zone_of = np.empty(K, dtype=object)
+            zone_of[inv] = self.index.zones
+            zones, z = np.unique(zone_of.astype(str), return_inverse=True)
+            ze = np.zeros((len(zones), T))
+            zf = np.zeros((len(zones), T))
+            np.add.at(ze, z, events)
+            np.add.at(zf, z, fatal)
+            out["conflict_events_zone"] = ze[z].ravel()
+            out["conflict_fatalities_zone"] = zf[z].ravel()
+        return pd.DataFrame(out)
+
+
+def aggregate_events(path, boundaries=BOUNDARY_PATH, chunk_rows: int = CHUNK_ROWS) -> EventAggregator:
+    index = boundaries if isinstance(boundaries, PolygonIndex) else PolygonIndex.from_file(boundaries)
+    return EventAggregator(index).add_file(path, chunk_rows)
+
+
+def write_to_panel(agg: EventAggregator, root: str = STORE_PATH) -> tuple:
+    """Patch the conflict columns into the feature store; (version, rows).
+
+    Only the panel's woredas are written, from its first month onward.
+    """
+    rows = agg.panel_rows()
+    keys = read_features(root, columns=[KEY_COL, DATE_COL])
+    rows = rows[rows[KEY_COL].isin(keys[KEY_COL].astype(str).unique()) & (rows[DATE_COL] >= keys[DATE_COL].min())]
+    if rows.empty:
+        return store_versions(root)[-1], 0
+    return append_months(rows, root, patch=True)
+
+
+if __name__ == "__main__":
+    src = sys.argv[1]
+    boundaries = sys.argv[2] if len(sys.argv) > 2 else BOUNDARY_PATH
+    root = sys.argv[3] if len(sys.argv) > 3 else STORE_PATH
+    agg = aggregate_events(src, boundaries)
+    print(f"{agg.n_read} events read, {agg.n_unmatched} outside every woreda, {agg.n_undated} without a date")
+    if store_versions(root):
+        v, n = write_to_panel(agg, root)
+        print(f"✅ {root} version {v}: {n} woreda-months patched")
+    else:
+        out = Path(src).stem + "_woreda_month.csv"
+        agg.panel_rows().to_csv(out, index=False)
+        print(f"✅ {len(agg.index)} woredas × {agg.n_months} months -> {out}")
@@ -0,0 +1,157 @@
+# spi.py
+# Standardised Precipitation Index for every woreda, calendar month and accumulation window.
+# Rainfall is laid out as a woreda x month array; k-month totals for all windows come
+# from one cumulative sum. The gamma climatology (shape, scale and probability of zero
+# rain per window x woreda x calendar month) is fitted in closed form (Thom's maximum
+# likelihood approximation) over all cells at once and saved to .npz, so a new month
+# only needs the vectorised gamma CDF -> normal quantile transform.
+#
+#   python spi.py woreda_month_features_v2.parquet [rain column]
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.special import gammainc, ndtri
+
+from panel_index import PanelIndex
+
+SPI_WINDOWS = (1, 3, 6, 12)
+CLIM_PATH = "spi_climatology.npz"
+RAIN_COL = "monthly_rain"
+MIN_SAMPLES = 8                   # non-zero totals needed per woreda and calendar month
+P_CLIP = 1e-6                     # keep probabilities off 0 / 1 (SPI within about +-4.75)
+
+
+def accumulate(rain: np.ndarray, windows=SPI_WINDOWS) -> np.ndarray:
+    """windows x woreda x month k-month totals (NaN unless all k months are present)."""
+    W, T = rain.shape
+    ok = np.isfinite(rain)
+    cs = np.concatenate([np.zeros((W, 1)), np.cumsum(np.where(ok, rain, 0.0), axis=1)], axis=1)
+    cn = np.concatenate([np.zeros((W, 1)), np.cumsum(ok, axis=1)], axis=1)
+    out = np.full((len(windows), W, T), np.nan)
+    for i, k in enumerate(windows):
+        if k > T:
+            continue
+        total = cs[:, k:] - cs[:, :-k]
+        full = (cn[:, k:] - cn[:, :-k]) == k
+        out[i, :, k - 1:] = np.where(full, total, np.nan)
+    return out
+
+
+def by_calendar_month(x: np.ndarray, month0: int) -> np.ndarray:
+    """... x T -> ... x 12 x years (NaN-padded), calendar month 0 = January."""
+    T = x.shape[-1]
+    lead = month0 % 12
+    n_years = -(-(lead + T) // 12)
+    pad = np.full(x.shape[:-1] + (n_years * 12,), np.nan)
+    pad[..., lead:lead + T] = x
+    return np.swapaxes(pad.reshape(x.shape[:-1] + (n_years, 12)), -1, -2)
+
+
+def fit_gamma(samples: np.ndarray, min_samples: int = MIN_SAMPLES):
+    """Gamma shape, scale and P(zero) along the last axis (Thom's approximation); NaN if too few."""
+    ok = np.isfinite(samples)
+    pos = ok & (samples > 0)
+    n, n_pos = ok.sum(axis=-1), pos.sum(axis=-1)
+    with np.errstate(all="ignore"):
+        mean = np.where(pos, samples, 0.0).sum(axis=-1) / n_pos
+        mean_log = np.where(pos, np.log(np.where(pos, samples, 1.0)), 0.0).sum(axis=-1) / n_pos
+        A = np.log(mean) - mean_log
+        shape = (1 + np.sqrt(1 + 4 * A / 3)) / (4 * A)
+        scale = mean / shape
+        q = (n - n_pos) / n
+    good = (n_pos >= min_samples) & (A > 0)
+    return np.where(good, shape, np.nan), np.where(good, scale, np.nan), np.where(good, q, np.nan)
+
+
+def spi_transform(totals: np.ndarray, shape, scale, q) -> np.ndarray:
+    """SPI from totals and broadcastable gamma parameters: Phi^-1(q + (1 - q) G(x))."""
+    with np.errstate(all="ignore"):
+        g = np.where(totals > 0, gammainc(shape, np.where(totals > 0, totals, 0.0) / scale), 0.0)
+        p = q + (1 - q) * g
+    p = np.where(np.isfinite(totals) & np.isfinite(shape), np.clip(p, P_CLIP, 1 - P_CLIP), np.nan)
+    return ndtri(p)
+
+
+class SPIClimatology:
+    """Gamma parameters per window x woreda x calendar month, fitted once and reused."""
+
+    def __init__(self, windows, woredas, shape: np.ndarray, scale: np.ndarray, q: np.ndarray,
+                 base_period: tuple = (None, None), rain_col: str = RAIN_COL):
+        self.windows = tuple(int(k) for k in windows)
+        self.woredas = np.asarray(woredas, dtype=object)
+        self.shape, self.scale, self.q = shape, scale, q          # K x W x 12
+        self.base_period = base_period                            # month ordinals (first, last)
+        self.rain_col = rain_col
+
+    @classmethod
+    def fit(cls, rain: np.ndarray, month0: int, woredas, windows=SPI_WINDOWS,
+            rain_col: str = RAIN_COL) -> "SPIClimatology":
+        """Fit every window, woreda and calendar month from a woreda x month rainfall array."""
+        totals = by_calendar_month(accumulate(rain, windows), month0)        # K x W x 12 x years
+        shape, scale, q = fit_gamma(totals)
+        return cls(windows, woredas, shape, scale, q, (month0, month0 + rain.shape[1] - 1), rain_col)
+
+    def _rows(self, woredas) -> np.ndarray:
+        pos = {w: i for i, w in enumerate(self.woredas)}
+        return np.array([pos.get(w, -1) for w in woredas], dtype="int64")
+
+    def transform(self, rain: np.ndarray, month0: int, woredas, windows=None) -> np.ndarray:
+        """windows x woreda x month SPI for a rainfall array (woredas without a climatology -> NaN)."""
+        windows = self.windows if windows is None else tuple(windows)
+        ki = [self.windows.index(k) for k in windows]
+        rows = self._rows(woredas)
+        cal = (month0 + np.arange(rain.shape[1])) % 12
+        totals = accumulate(rain, windows)                                    # k x W x T
+        params = [np.where((rows >= 0)[None, :, None], p[ki][:, np.clip(rows, 0, None)][:, :, cal], np.nan)
+                  for p in (self.shape, self.scale, self.q)]
+        return spi_transform(totals, *params)
+
+    def save(self, path: str = CLIM_PATH) -> bool:
+        first, last = self.base_period
+        try:
+            np.savez_compressed(path, windows=np.array(self.windows), woredas=self.woredas,
+                                shape=self.shape, scale=self.scale, q=self.q, rain_col=np.array(self.rain_col),
+                                base_period=np.array([-1 if first is None else first, -1 if last is None else last]))
+        except OSError:
+            return False
+        return True
+
+    @classmethod
+    def load(cls, path: str = CLIM_PATH) -> "SPIClimatology | None":
+        if not Path(path).exists():
+            return None
+        z = np.load(path, allow_pickle=True)
+        first, last = (int(v) if v >= 0 else None for v in z["base_period"])
+        rain_col = str(z["rain_col"]) if "rain_col" in z.files else RAIN_COL
+        return cls(z["windows"].tolist(), z["woredas"], z["shape"], z["scale"], z["q"], (first, last), rain_col)
+
+    def covers(self, woredas, windows) -> bool:
+        return set(windows) <= set(self.windows) and bool((self._rows(woredas) >= 0).all())
+
+
+def add_spi(df: pd.DataFrame, rain_col: str = RAIN_COL, woreda_col: str = "woreda_key", date_col: str = "ym",
+            windows=SPI_WINDOWS, clim: SPIClimatology | None = None) -> pd.DataFrame:
+    """df sorted by woreda and month with SPI_<k> columns; fits the climatology from df if none is given."""
+    idx = PanelIndex(df, woreda_col=woreda_col, date_col=date_col, region_col=None)
+    rain = idx.dense(rain_col)
+    clim = clim or SPIClimatology.fit(rain, idx.month_min, idx.woreda_names, windows, rain_col)
+    spi = clim.transform(rain, idx.month_min, idx.woreda_names, windows)
+    out = idx.frame.copy()
+    for i, k in enumerate(windows):
+        out[f"SPI_{k}"] = idx.gather(spi[i])
+    return out
+
+
+if __name__ == "__main__":
+    src = sys.argv[1]
+    rain_col = sys.argv[2] if len(sys.argv) > 2 else RAIN_COL
+    df = pd.read_parquet(src) if src.lower().endswith(".parquet") else pd.read_csv(src, parse_dates=["ym"])
+    idx = PanelIndex(df, woreda_col="woreda_key", date_col="ym", region_col=None)
+    clim = SPIClimatology.fit(idx.dense(rain_col), idx.month_min, idx.woreda_names, rain_col=rain_col)
+    clim.save(CLIM_PATH)
+    fitted = np.isfinite(clim.shape).mean()
+    print(f"✅ climatology for {len(clim.woredas)} woredas × 12 months × windows {clim.windows} "
+          f"({fitted:.0%} cells fitted) -> {CLIM_PATH}")
@@ -0,0 +1,128 @@
+# upload_cache.py
+# Disk cache for files uploaded through the dashboards' sidebars.
+# An upload is keyed by the SHA-1 of its bytes plus a cache / cleaner version. The first time a file is seen it is
+# parsed and validated chunk by chunk, cleaned, and written to upload_cache/ as Parquet
+# (GeoParquet for boundaries); every later rerun, session or server process that gets
+# the same bytes reads the columnar copy instead of re-parsing the CSV / GeoJSON. A new
+# version (CACHE_VERSION here, or the caller's cleaner version) gets a new key, so copies
+# written by older validation or cleaning code are never served.
+
+import hashlib
+import io
+import os
+from pathlib import Path
+
+import geopandas as gpd
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+UPLOAD_CACHE = "upload_cache"
+CHUNK_ROWS = 200_000
+MAX_ENTRIES = 32                  # oldest cached uploads beyond this are removed
+REQUIRED_CSV_COLUMNS = ("date", "woreda")
+CACHE_VERSION = 2                 # bump when validation or the cached layout changes
+
+
+def upload_digest(raw: bytes) -> str:
+    return hashlib.sha1(raw).hexdigest()
+
+
+def _cached(digest: str, kind: str, root: str, version: str = "") -> Path:
+    key = ".".join(p for p in (digest, f"v{CACHE_VERSION}", version, kind) if p)
+    return Path(root) / f"{key}.parquet"
+
+
+def _prune(root: str, keep: int = MAX_ENTRIES) -> None:
+    files = sorted(Path(root).glob("*.parquet"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for p in files[keep:]:
+        try:
+            p.unlink()
+        except OSError:
+            pass
+
+
+def _publish(tmp: Path, path: Path, root: str) -> None:
+    """Move a finished file into place atomically, so readers never see a partial one."""
+    os.replace(tmp, path)
+    _prune(root)
+
+
+def read_upload_csv(raw: bytes, clean=None, digest: str | None = None, root: str = UPLOAD_CACHE,
+                    chunk_rows: int = CHUNK_ROWS, version: str = "") -> pd.DataFrame:
+    """Cleaned frame for uploaded CSV bytes; parsed once per distinct file, then read from Parquet.
+
+    `clean` is applied to each chunk, so it must work row by row (the dashboards' cleaners do).
+    `version` identifies the cleaner; change it whenever `clean` would produce different output.
+    Raises ValueError if a required column is missing or no row has a usable date.
+    """
+    digest = digest or upload_digest(raw)
+    path = _cached(digest, "csv", root, version)
+    if path.exists():
+        try:
+            return pd.read_parquet(path)
+        except Exception:
+            pass
+    parts, writer, schema = [], None, None
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    writing = True
+    for i, chunk in enumerate(pd.read_csv(io.BytesIO(raw), chunksize=chunk_rows)):
+        if i == 0:
+            missing = [c for c in REQUIRED_CSV_COLUMNS if c not in chunk.columns]
+            if missing:
+                raise ValueError(f"uploaded CSV is missing column(s): {', '.join(missing)}")
+        chunk = clean(chunk) if clean is not None else chunk
+        parts.append(chunk)
+        if not writing:
+            continue
+        try:
+            table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            if writer is None:
+                Path(root).mkdir(parents=True, exist_ok=True)
+                schema = table.schema
+                writer = pq.ParquetWriter(tmp, schema)
+            writer.write_table(table)
+        except (OSError, pa.ArrowInvalid, pa.ArrowTypeError):
+            # Read-only disk or a column whose type changes between chunks: just don't cache
+            writing = False
+    if writer is not None:
+        writer.close()
+    if not writing:
+        tmp.unlink(missing_ok=True)
+    df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=list(REQUIRED_CSV_COLUMNS))
+    if "date" in df.columns and not pd.to_datetime(df["date"], errors="coerce").notna().any():
+        tmp.unlink(missing_ok=True)
+        raise ValueError("uploaded CSV has no parseable dates")
+    if tmp.exists():
+        try:
+            _publish(tmp, path, root)
+        except OSError:
+            pass
+    return df
+
+
+def read_upload_geojson(raw: bytes, digest: str | None = None, root: str = UPLOAD_CACHE) -> gpd.GeoDataFrame:
+    """Validated boundaries (EPSG:4326, no empty geometries) for uploaded GeoJSON bytes, cached as GeoParquet."""
+    digest = digest or upload_digest(raw)
+    path = _cached(digest, "geo", root)
+    if path.exists():
+        try:
+            return gpd.read_parquet(path)
+        except Exception:
+            pass
+    gdf = gpd.read_file(io.BytesIO(raw))
+    if gdf.empty or gdf.geometry.isna().all():
+        raise ValueError("uploaded GeoJSON has no features with a geometry")
+    gdf = gdf.to_crs(4326) if gdf.crs is not None else gdf.set_crs(4326)
+    gdf = gdf[gdf.geometry.notna() & ~gdf.geometry.is_empty].reset_index(drop=True)
+    invalid = ~gdf.geometry.is_valid
+    if invalid.any():
+        gdf.loc[invalid, "geometry"] = gdf.geometry[invalid].make_valid()
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        Path(root).mkdir(parents=True, exist_ok=True)
+        gdf.to_parquet(tmp)
+        _publish(tmp, path, root)
+    except OSError:
+        pass
+    return gdf